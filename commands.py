@@ -0,0 +1,679 @@
+import click
+from flask.cli import with_appcontext
+
+
+def register_commands(app):
+    """Registers the project's `flask <command>` CLI commands on the app."""
+    app.cli.add_command(import_sales)
+    app.cli.add_command(rebuild_kitchen_metrics)
+    app.cli.add_command(process_inventory_outbox)
+    app.cli.add_command(rebuild_sales_rollups)
+    app.cli.add_command(init_db)
+    app.cli.add_command(seed_db)
+    app.cli.add_command(startup_benchmark)
+    app.cli.add_command(db_benchmark)
+    app.cli.add_command(stock_benchmark)
+    app.cli.add_command(ingest_benchmark)
+    app.cli.add_command(report_benchmark)
+    app.cli.add_command(export_benchmark)
+    app.cli.add_command(customer_lookup_benchmark)
+    app.cli.add_command(index_advisor)
+
+
+INITIAL_REVISION = '6d3a81315d48'
+
+
+def _initial_schema():
+    """{table: column names} the initial migration creates, read back from an in-memory SQLite run of it."""
+    import importlib.util
+    import os
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from flask import current_app
+    from sqlalchemy import create_engine, inspect
+
+    directory = os.path.join(current_app.root_path, current_app.extensions['migrate'].directory, 'versions')
+    path = next(os.path.join(directory, name) for name in os.listdir(directory) if name.startswith(INITIAL_REVISION))
+    spec = importlib.util.spec_from_file_location('initial_schema', path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with create_engine('sqlite://').begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+        inspector = inspect(conn)
+        return {table: {column['name'] for column in inspector.get_columns(table)} for table in inspector.get_table_names()}
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Creates or upgrades the database schema (same as `flask db upgrade`).
+
+    A database created before migrations were added (tables but no
+    alembic_version) is checked against the initial schema and stamped with it
+    first, so only the later migrations run on it.
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+    from extensions import db
+
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    if tables and 'alembic_version' not in tables:
+        missing = []
+        for table, columns in sorted(_initial_schema().items()):
+            if table not in tables:
+                missing.append(table)
+            else:
+                present = {column['name'] for column in inspector.get_columns(table)}
+                missing += [f"{table}.{column}" for column in sorted(columns - present)]
+        if missing:
+            raise click.ClickException(
+                "The database has tables but no migration history, and lacks part of the initial schema: "
+                f"{', '.join(missing)}. Add them (or start from a new database), then run "
+                f"`flask db stamp {INITIAL_REVISION}` and `flask init-db`.")
+        stamp(revision=INITIAL_REVISION)
+        click.echo(f"Existing database without migration history: stamped as the initial schema ({INITIAL_REVISION}).")
+    upgrade()
+    click.echo("Database schema is up to date.")
+
+
+@click.command('seed-db')
+@click.option('--reset', is_flag=True, help='Delete all existing data first.')
+@with_appcontext
+def seed_db(reset):
+    """Loads the sample users, menu, inventory, customers and orders."""
+    from models import Product
+    from seed_data import clear_data, seed_data
+
+    if reset:
+        click.confirm('This deletes all orders, products, customers and users. Continue?', abort=True)
+        clear_data()
+    elif Product.query.first() is not None:
+        raise click.ClickException('The database already has data; use --reset to replace it with the sample data.')
+    seed_data()
+
+
+@click.command('index-advisor')
+@click.option('--strict', is_flag=True, help='Exit with an error if any hot query does a full table scan (for CI).')
+@click.option('--verbose', is_flag=True, help='Print every query plan, not only the ones with scans.')
+@with_appcontext
+def index_advisor(strict, verbose):
+    """Runs EXPLAIN QUERY PLAN on the app's hot queries and flags full table scans."""
+    from services.index_advisor import advise
+
+    try:
+        results = advise()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    flagged = 0
+    for name, plan, scans in results:
+        if scans:
+            flagged += 1
+            click.echo(f"SCAN  {name}: full scan of {', '.join(scans)}")
+        else:
+            click.echo(f"ok    {name}")
+        if scans or verbose:
+            for detail in plan:
+                click.echo(f"        {detail}")
+    click.echo(f"{flagged} of {len(results)} hot queries do a full table scan.")
+    if strict and flagged:
+        raise SystemExit(1)
+
+
+@click.command('startup-benchmark')
+@click.option('--runs', default=5, show_default=True, help='Fresh interpreter starts to time.')
+@click.option('--path', 'url_path', default='/login', show_default=True, help='Page requested as the first request.')
+@with_appcontext
+def startup_benchmark(runs, url_path):
+    """Times import-to-first-request in fresh processes (what a new worker pays before serving)."""
+    import statistics
+    import subprocess
+    import sys
+    from flask import current_app
+
+    # Each run is a new interpreter: import the app module, then serve one request through the test client
+    script = (
+        "import time; start = time.perf_counter()\n"
+        "from app import app\n"
+        "imported = time.perf_counter()\n"
+        f"status = app.test_client().get({url_path!r}).status_code\n"
+        "done = time.perf_counter()\n"
+        "print(imported - start, done - imported, done - start, status)\n"
+    )
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                cwd=current_app.root_path).stdout
+        import_time, request_time, total, status = output.split()[-4:]
+        timings.append((float(import_time), float(request_time), float(total)))
+        click.echo(f"import {float(import_time) * 1000:7.1f} ms   first request {float(request_time) * 1000:7.1f} ms"
+                   f"   total {float(total) * 1000:7.1f} ms   (HTTP {status})")
+    click.echo(f"Median import-to-first-request: {statistics.median(t[2] for t in timings) * 1000:.1f} ms over {runs} runs")
+
+
+@click.command('import-sales')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=1000, show_default=True, help='Orders per transaction.')
+@click.option('--deduct-inventory', is_flag=True, help='Apply recipe usage to ingredient stock (off for historical data).')
+@click.option('--checkpoint', 'checkpoint_path', default=None, help='Checkpoint file (default: PATH.checkpoint).')
+@click.option('--resume', is_flag=True, help='Skip lines already committed according to the checkpoint.')
+@with_appcontext
+def import_sales(path, chunk_size, deduct_inventory, checkpoint_path, resume):
+    """Bulk-imports legacy sales lines from a CSV or JSONL file."""
+    from services.sales_import import SalesImporter
+
+    importer = SalesImporter(
+        chunk_size=chunk_size,
+        deduct_inventory=deduct_inventory,
+        checkpoint_path=checkpoint_path or path + '.checkpoint',
+        echo=click.echo
+    )
+    try:
+        stats = importer.run(path, resume=resume)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Done: {stats['orders']} orders imported, {stats['skipped']} skipped.")
+
+
+@click.command('rebuild-kitchen-metrics')
+@with_appcontext
+def rebuild_kitchen_metrics():
+    """Recomputes the ticket time histogram and throughput windows from completed orders."""
+    from services.kitchen import rebuild_metrics
+
+    click.echo(f"Rebuilt kitchen metrics from {rebuild_metrics()} completed orders.")
+
+
+@click.command('rebuild-sales-rollups')
+@with_appcontext
+def rebuild_sales_rollups():
+    """Recomputes the hourly sales rollups from orders (backfill, or repair after direct SQL edits)."""
+    from services.sales_rollup import rebuild_rollups
+
+    click.echo(f"Rebuilt sales rollups from {rebuild_rollups()} orders.")
+
+
+@click.command('process-inventory-outbox')
+@click.option('--retry-failed', is_flag=True, help='Requeue failed deductions (e.g. after correcting stock) before processing.')
+@with_appcontext
+def process_inventory_outbox(retry_failed):
+    """Applies pending inventory deductions now, without the background worker."""
+    from flask import current_app
+    from services.inventory_outbox import process_pending, retry_failed as requeue_failed
+
+    if retry_failed:
+        click.echo(f"Requeued {requeue_failed()} failed deductions.")
+    max_attempts = current_app.config.get('INVENTORY_OUTBOX_MAX_ATTEMPTS', 5)
+    totals = {}
+    while True:
+        outcome = process_pending(max_attempts)
+        if not outcome:
+            break
+        for status, count in outcome.items():
+            totals[status] = totals.get(status, 0) + count
+    click.echo(f"Processed outbox: {totals.get('done', 0)} done, {totals.get('pending', 0)} to retry, "
+               f"{totals.get('failed', 0)} failed.")
+
+
+@click.command('db-benchmark')
+@click.option('--orders', default=50000, show_default=True, help='Orders (3 lines each) preloaded for the report queries to scan.')
+@click.option('--seconds', default=5.0, show_default=True, help='How long checkouts and reports run concurrently.')
+@click.option('--readers', default=2, show_default=True, help='Threads running report queries back to back.')
+@with_appcontext
+def db_benchmark(orders, seconds, readers):
+    """Checkout commit latency while reports run: default SQLite settings vs SQLITE_PRAGMAS.
+
+    Runs against throwaway database files, never the app's database.
+    """
+    import os
+    import tempfile
+    import threading
+    import time
+    from datetime import datetime
+    from flask import current_app
+    from sqlalchemy import create_engine, select, func
+    from sqlalchemy.exc import OperationalError
+    from extensions import db, apply_sqlite_pragmas
+    from models import User, Category, Product, Order, OrderItem
+
+    def run(label, pragmas, workdir):
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, label + '.db')}")
+        apply_sqlite_pragmas(engine, pragmas)
+        db.metadata.create_all(engine)
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), {'username': 'bench', 'password': '-', 'name': 'Bench', 'role': 'cashier'})
+            conn.execute(Category.__table__.insert(), {'name': 'Bench'})
+            conn.execute(Product.__table__.insert(), [{'name': f'Item {i}', 'price': 100.0, 'category_id': 1} for i in range(20)])
+            conn.execute(Order.__table__.insert(), [{
+                'order_number': f'PRE-{i}', 'order_type': 'dine-in', 'status': 'completed', 'user_id': 1, 'created_at': now,
+                'subtotal': 300.0, 'tax': 0.0, 'total_amount': 300.0, 'payment_method': 'cash'} for i in range(orders)])
+            conn.execute(OrderItem.__table__.insert(), [{
+                'order_id': i // 3 + 1, 'product_id': i % 20 + 1, 'quantity': 1, 'price': 100.0} for i in range(orders * 3)])
+
+        # A report-style scan: every line of every order, grouped by product
+        report = select(OrderItem.product_id, func.sum(OrderItem.quantity * OrderItem.price), func.count(func.distinct(Order.id)))\
+            .join(Order, Order.id == OrderItem.order_id).group_by(OrderItem.product_id)
+        deadline = time.perf_counter() + seconds
+        latencies, errors, reads = [], [0], [0]
+
+        def reader():
+            while time.perf_counter() < deadline:
+                with engine.connect() as conn:
+                    conn.execute(report).all()
+                reads[0] += 1
+
+        def writer():
+            n = 0
+            while time.perf_counter() < deadline:
+                n += 1
+                start = time.perf_counter()
+                try:
+                    # A checkout: one order row and its lines in one transaction
+                    with engine.begin() as conn:
+                        order_id = conn.execute(Order.__table__.insert(), {
+                            'order_number': f'{label[:3].upper()}-{n}', 'order_type': 'take-out', 'status': 'pending', 'user_id': 1,
+                            'created_at': datetime.utcnow(), 'subtotal': 300.0, 'tax': 0.0, 'total_amount': 300.0,
+                            'payment_method': 'cash'}).inserted_primary_key[0]
+                        conn.execute(OrderItem.__table__.insert(), [
+                            {'order_id': order_id, 'product_id': p, 'quantity': 1, 'price': 100.0} for p in (1, 2, 3)])
+                    latencies.append(time.perf_counter() - start)
+                except OperationalError:
+                    errors[0] += 1 # 'database is locked'
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+        latencies.sort()
+        pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else float('nan')
+        click.echo(f"{label:<11} checkouts {len(latencies):6d}  p50 {pick(0.5):8.2f} ms  p99 {pick(0.99):8.2f} ms  "
+                   f"max {pick(1.0):8.2f} ms  locked errors {errors[0]:4d}  report queries {reads[0]:5d}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        click.echo(f"{orders} orders preloaded, {readers} report threads, 1 checkout thread, {seconds:g} s each")
+        run('default', {}, workdir)
+        run('production', current_app.config['SQLITE_PRAGMAS'], workdir)
+
+
+def _benchmark_app(path, **config):
+    """A copy of the app on a fresh SQLite file at `path` with the schema created, plus a user and a product.
+
+    The product uses one unit of a single ingredient ('Stock') per portion.
+    Benchmarks run against it instead of the app's database.
+    """
+    from app import create_app
+    from extensions import db
+    from models import User, Category, Product, Ingredient, ProductIngredient
+    from services.recipe_cache import invalidate_recipes
+
+    bench_app = create_app(dict(config, SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}"))
+    with bench_app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(User(username='bench', password='-', name='Bench', role='cashier'))
+        db.session.add(Category(name='Bench'))
+        db.session.add(Ingredient(name='Stock', quantity=0, unit='pcs'))
+        db.session.flush()
+        db.session.add(Product(name='Bench Meal', price=100.0, category_id=1))
+        db.session.flush()
+        db.session.add(ProductIngredient(product_id=1, ingredient_id=1, quantity_needed=1))
+        db.session.commit()
+    invalidate_recipes() # The recipe matrix is per process; recompile it from this database
+    return bench_app
+
+
+def _latency_summary(latencies):
+    latencies = sorted(latencies)
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else float('nan')
+    return f"p50 {pick(0.5):7.2f} ms  p99 {pick(0.99):7.2f} ms  max {pick(1.0):8.2f} ms"
+
+
+@click.command('stock-benchmark')
+@click.option('--threads', default='1,2,4,8', show_default=True, help='Comma-separated concurrent checkout thread counts.')
+@click.option('--stock', default=1000, show_default=True, help='Portions in stock at the start of each run.')
+@click.option('--orders', default=1500, show_default=True, help='Checkouts attempted per run (more than the stock, so some are rejected).')
+@click.option('--mode', 'modes', multiple=True, type=click.Choice(['atomic', 'session']), help='STOCK_RESERVATION_MODE to test (default: both).')
+@with_appcontext
+def stock_benchmark(threads, stock, orders, modes):
+    """Concurrent checkouts against limited stock: oversells (expected 0), rejections and latency.
+
+    Runs against throwaway database files, never the app's database.
+    """
+    import os
+    import tempfile
+    import threading
+    import time
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+    from extensions import db
+    from models import Ingredient, OrderItem
+    from services.order_placement import place_order, InsufficientStockError
+
+    cart = {'orderType': 'take-out', 'paymentMethod': 'cash', 'subtotal': 100.0, 'tax': 0.0, 'totalAmount': 100.0,
+            'items': [{'productId': 1, 'quantity': 1, 'price': 100.0}]}
+
+    def run(mode, workers, workdir):
+        bench_app = _benchmark_app(os.path.join(workdir, f'{mode}-{workers}.db'), STOCK_RESERVATION_MODE=mode)
+        with bench_app.app_context():
+            db.session.get(Ingredient, 1).quantity = stock
+            db.session.commit()
+        latencies, outcomes = [], []
+
+        def checkout(count):
+            accepted = rejected = errors = 0
+            with bench_app.app_context():
+                for _ in range(count):
+                    start = time.perf_counter()
+                    try:
+                        place_order(cart, 1)
+                        db.session.commit()
+                        latencies.append(time.perf_counter() - start)
+                        accepted += 1
+                    except InsufficientStockError:
+                        db.session.rollback()
+                        rejected += 1
+                    except OperationalError:
+                        db.session.rollback()
+                        errors += 1 # 'database is locked', or a stale read upgraded to a write
+                db.session.remove()
+            outcomes.append((accepted, rejected, errors))
+
+        pool = [threading.Thread(target=checkout, args=(orders // workers + (i < orders % workers),)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with bench_app.app_context():
+            sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar()
+            remaining = db.session.get(Ingredient, 1).quantity
+            db.engine.dispose()
+        accepted, rejected, errors = (sum(column) for column in zip(*outcomes))
+        # Oversold: more portions sold than were in stock. Drift: stock left beyond what was not sold (lost updates)
+        click.echo(f"{mode:<8}{workers:3d} threads  {accepted / elapsed:7.0f} orders/s  accepted {accepted:5d}  "
+                   f"rejected {rejected:5d}  errors {errors:4d}  oversold {max(0, sold - stock):4d}  "
+                   f"drift {remaining - (stock - sold):+6g}  {_latency_summary(latencies)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        click.echo(f"{orders} checkouts of 1 portion against {stock} in stock per run")
+        for mode in modes or ('atomic', 'session'):
+            for workers in (int(n) for n in threads.split(',')):
+                run(mode, workers, workdir)
+
+
+@click.command('ingest-benchmark')
+@click.option('--threads', default=16, show_default=True, help='Concurrent checkout threads (terminals).')
+@click.option('--orders', default=2000, show_default=True, help='Checkouts per run.')
+@click.option('--synchronous', multiple=True, type=click.Choice(['NORMAL', 'FULL']),
+              help="SQLite synchronous setting to test (default: both; FULL fsyncs every commit, the app uses NORMAL).")
+@with_appcontext
+def ingest_benchmark(threads, orders, synchronous):
+    """Orders/sec with the group-commit ingest queue vs a commit per checkout.
+
+    Runs against throwaway database files, never the app's database.
+    """
+    import os
+    import tempfile
+    import threading
+    import time
+    from flask import current_app
+    from extensions import db
+    from models import Ingredient, Order
+    from services.order_placement import place_order
+    from services.order_ingest import OrderIngestQueue
+
+    cart = {'orderType': 'take-out', 'paymentMethod': 'cash', 'subtotal': 300.0, 'tax': 0.0, 'totalAmount': 300.0,
+            'items': [{'productId': 1, 'quantity': 3, 'price': 100.0}]}
+
+    def run(label, sync, workdir):
+        pragmas = dict(current_app.config['SQLITE_PRAGMAS'], synchronous=sync)
+        bench_app = _benchmark_app(os.path.join(workdir, f'{label}-{sync}.db'), SQLITE_PRAGMAS=pragmas)
+        with bench_app.app_context():
+            db.session.get(Ingredient, 1).quantity = orders * 3
+            db.session.commit()
+        ingest = None
+        if label == 'group':
+            ingest = OrderIngestQueue(bench_app, batch_size=current_app.config['ORDER_INGEST_BATCH_SIZE'],
+                                      max_latency_ms=current_app.config['ORDER_INGEST_MAX_LATENCY_MS'])
+        latencies = []
+
+        def checkout(count):
+            with bench_app.app_context():
+                for _ in range(count):
+                    start = time.perf_counter()
+                    if ingest:
+                        ingest.submit(cart, 1).result(timeout=30)
+                    else:
+                        place_order(cart, 1)
+                        db.session.commit()
+                    latencies.append(time.perf_counter() - start)
+                db.session.remove()
+
+        pool = [threading.Thread(target=checkout, args=(orders // threads + (i < orders % threads),)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        with bench_app.app_context():
+            placed = Order.query.count()
+        click.echo(f"{label:<7}{sync:<8}{placed / elapsed:7.0f} orders/s  placed {placed:5d}  {_latency_summary(latencies)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        click.echo(f"{orders} checkouts from {threads} threads; group commit batches up to "
+                   f"{current_app.config['ORDER_INGEST_BATCH_SIZE']} orders / {current_app.config['ORDER_INGEST_MAX_LATENCY_MS']} ms")
+        for sync in synchronous or ('NORMAL', 'FULL'):
+            run('direct', sync, workdir)
+            run('group', sync, workdir)
+
+
+def _bulk_load_orders(orders):
+    """Inserts `orders` synthetic orders (3 lines each) spread over the year up to today, 4 more staff and 19 more products.
+
+    Runs in the current app context with bulk Core inserts, so the ORM listeners
+    (rollups, dashboard, search) never see them; rebuild what a benchmark needs.
+    """
+    import random
+    from datetime import datetime, timedelta
+    from extensions import db
+    from models import User, Product, Order, OrderItem
+
+    rng = random.Random(42)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    first = today - timedelta(days=364)
+    step = timedelta(days=365) / orders
+    conn = db.session.connection()
+    conn.execute(User.__table__.insert(), [
+        {'username': f'staff{i}', 'password': '-', 'name': f'Staff {i}', 'role': 'cashier'} for i in range(4)])
+    conn.execute(Product.__table__.insert(), [{'name': f'Item {i}', 'price': 100.0, 'category_id': 1} for i in range(19)])
+    for chunk in range(0, orders, 50000):
+        ids = range(chunk + 1, min(orders, chunk + 50000) + 1)
+        conn.execute(Order.__table__.insert(), [{
+            'id': i, 'order_number': f'BENCH-{i}', 'order_type': 'dine-in', 'user_id': rng.randint(1, 5),
+            'status': 'completed' if rng.random() < 0.95 else 'cancelled', 'created_at': first + step * i,
+            'subtotal': 300.0, 'tax': 0.0, 'total_amount': 300.0,
+            'payment_method': rng.choice(('cash', 'card', 'gcash'))} for i in ids])
+        conn.execute(OrderItem.__table__.insert(), [{
+            'order_id': i, 'product_id': rng.randint(1, 20), 'quantity': 1, 'price': 100.0} for i in ids for _ in range(3)])
+    db.session.commit()
+
+
+@click.command('report-benchmark')
+@click.option('--orders', default=1000000, show_default=True, help='Orders (3 lines each) spread over the last year.')
+@click.option('--repeat', default=3, show_default=True, help='Timed runs per backend and range (the best is shown).')
+@with_appcontext
+def report_benchmark(orders, repeat):
+    """Sales report time per range: the rollup backend vs the single-scan backend (REPORT_BACKEND).
+
+    Bulk-loads synthetic orders into a throwaway database file, never the app's database.
+    """
+    import os
+    import tempfile
+    import time
+    from datetime import datetime, timedelta
+    from extensions import db
+    from services.reports import build_report
+    from services.sales_rollup import rebuild_rollups
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_app = _benchmark_app(os.path.join(workdir, 'reports.db'))
+        with bench_app.app_context():
+            started = time.perf_counter()
+            _bulk_load_orders(orders)
+            loaded = time.perf_counter()
+            rebuild_rollups()
+            click.echo(f"Loaded {orders} orders in {loaded - started:.1f} s, rebuilt rollups in {time.perf_counter() - loaded:.1f} s")
+
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+            for label, days in (('last 7 days', 7), ('last 30 days', 30), ('last year', 365)):
+                start_dt, end_dt = today - timedelta(days=days - 1), today + timedelta(days=1) - timedelta(microseconds=1)
+                timings, totals = {}, {}
+                for backend in ('rollup', 'scan'):
+                    best = float('inf')
+                    for _ in range(repeat):
+                        begin = time.perf_counter()
+                        report = build_report(start_dt, end_dt, backend)
+                        best = min(best, time.perf_counter() - begin)
+                        db.session.rollback() # Fresh transaction per run, like separate requests
+                    timings[backend], totals[backend] = best, report['summary']['orders_count']
+                click.echo(f"{label:<13} rollup {timings['rollup'] * 1000:9.1f} ms   scan {timings['scan'] * 1000:9.1f} ms   "
+                           f"orders {totals['scan']:8d}" + ('' if totals['rollup'] == totals['scan'] else '  (backends disagree!)'))
+            db.session.remove()
+            db.engine.dispose()
+
+
+@click.command('export-benchmark')
+@click.option('--lines', default=500000, show_default=True, help='Order lines in the exported range (3 per order).')
+@with_appcontext
+def export_benchmark(lines):
+    """Peak RSS and time of the CSV and Excel report exports over a large range.
+
+    Each export runs in a fresh process, so its peak RSS is its own. Bulk-loads
+    synthetic orders into a throwaway database file, never the app's database.
+    """
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    from flask import current_app
+
+    # Child process: the app on the benchmark database, then one export of the whole year
+    script = (
+        "import resource, sys, time\n"
+        "from datetime import datetime, timedelta\n"
+        "from app import create_app\n"
+        "bench_app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})\n"
+        "from services.report_export import order_lines_csv, write_excel_report\n"
+        "from services.reports import build_report\n"
+        "end_dt = datetime.utcnow().replace(hour=23, minute=59, second=59)\n"
+        "start_dt = end_dt - timedelta(days=366)\n"
+        "with bench_app.app_context():\n"
+        "    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "    start = time.perf_counter()\n"
+        "    if sys.argv[2] == 'csv':\n"
+        "        with open(sys.argv[3], 'w', newline='') as f:\n"
+        "            for chunk in order_lines_csv(start_dt, end_dt):\n"
+        "                f.write(chunk)\n"
+        "    else:\n"
+        "        write_excel_report(sys.argv[3], start_dt, end_dt, build_report(start_dt, end_dt, 'scan'))\n"
+        "    elapsed = time.perf_counter() - start\n"
+        "print(elapsed, baseline, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+    )
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'export.db')
+        bench_app = _benchmark_app(path)
+        with bench_app.app_context():
+            _bulk_load_orders(max(1, lines // 3))
+            bench_app.extensions['sqlalchemy'].engines[None].dispose()
+        click.echo(f"{max(1, lines // 3) * 3} order lines, one process per export")
+        for export, suffix in (('csv', '.csv'), ('excel', '.xlsx')):
+            output = os.path.join(workdir, 'export' + suffix)
+            result = subprocess.run([sys.executable, '-c', script, f"sqlite:///{path}", export, output],
+                                    capture_output=True, text=True, check=True, cwd=current_app.root_path).stdout
+            elapsed, baseline, peak = result.split()[-3:]
+            click.echo(f"{export:<6} {float(elapsed):7.1f} s   peak RSS {int(peak) / unit:7.1f} MiB "
+                       f"(+{(int(peak) - int(baseline)) / unit:6.1f} MiB over the idle app)   "
+                       f"file {os.path.getsize(output) / (1024 * 1024):6.1f} MiB")
+
+
+@click.command('customer-lookup-benchmark')
+@click.option('--customers', default=200000, show_default=True, help='Customers in the benchmark database.')
+@click.option('--lookups', default=2000, show_default=True, help='Typeahead requests to time.')
+@click.option('--target-ms', default=5.0, show_default=True, help='p99 response time the typeahead must stay under.')
+@click.option('--strict', is_flag=True, help='Exit with an error if the p99 response time misses the target (for CI).')
+@with_appcontext
+def customer_lookup_benchmark(customers, lookups, target_ms, strict):
+    """Response time of the POS customer typeahead (/api/customers/lookup) against its target.
+
+    Times the index lookup alone and the whole request through the test
+    client, for name and phone prefixes of 1-4 characters. Bulk-loads
+    synthetic customers into a throwaway database file, never the app's database.
+    """
+    import os
+    import random
+    import tempfile
+    import time
+    from sqlalchemy import insert
+    from extensions import db
+    from models import Customer
+    from services.customer_index import get_customer_index
+
+    rng = random.Random(42)
+    first = ['Maria', 'Jose', 'Juan', 'Ana', 'Hiroshi', 'Yuki', 'Kenji', 'Sakura', 'Miguel', 'Rosa', 'Carlo', 'Liza']
+    last = ['Santos', 'Reyes', 'Cruz', 'Garcia', 'Tanaka', 'Sato', 'Suzuki', 'Mendoza', 'Torres', 'Ramos', 'Aquino']
+    rows = [{'name': f"{rng.choice(first)} {rng.choice(last)} {i}", 'phone': f"09{i:09d}"} for i in range(customers)]
+    queries = []
+    for _ in range(lookups):
+        row = rng.choice(rows)
+        key = row['phone'][:rng.randint(1, 4)] if rng.random() < 0.5 else rng.choice(row['name'].split())[:rng.randint(1, 4)]
+        queries.append(key)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_app = _benchmark_app(os.path.join(workdir, 'lookup.db'))
+        with bench_app.app_context():
+            for i in range(0, customers, 50000):
+                db.session.execute(insert(Customer), rows[i:i + 50000])
+            db.session.commit()
+            index = get_customer_index(bench_app)
+            start = time.perf_counter()
+            index.lookup('warm-up') # Builds the index; the POS pays this once per process
+            click.echo(f"{customers} customers, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+            index_latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                index.lookup(query)
+                index_latencies.append(time.perf_counter() - start)
+            db.session.remove()
+
+        client = bench_app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1' # The benchmark cashier, without a password round trip
+        request_latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            response = client.get('/api/customers/lookup', query_string={'q': query})
+            request_latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise click.ClickException(f"Lookup of {query!r} failed with HTTP {response.status_code}")
+        with bench_app.app_context():
+            db.engine.dispose()
+
+    click.echo(f"index lookup   {_latency_summary(index_latencies)}")
+    click.echo(f"whole request  {_latency_summary(request_latencies)}")
+    p99 = sorted(request_latencies)[min(len(request_latencies) - 1, int(0.99 * len(request_latencies)))] * 1000
+    met = p99 < target_ms
+    click.echo(f"Target p99 < {target_ms:g} ms: {'met' if met else 'MISSED'} ({p99:.2f} ms)")
+    if strict and not met:
+        raise SystemExit(1)
@@ -1,7 +1,98 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
+from flask_migrate import Migrate
+from sqlalchemy import event, orm
+from sqlalchemy.engine import make_url
+
+
+class RoutingSession(Session):
+    """Session that sends everything done in a read-only view to the 'read_only' engine.
+
+    Views opt in with the routes.read_only decorator and report job workers by
+    setting g.read_only in their app context; all other requests, CLI commands
+    and background workers keep the primary (read-write) engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('read_only'):
+            engine = self._db.engines.get('read_only')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
+migrate = Migrate()
 login_manager.login_view = 'routes.login'
+
+
+def is_memory_database(url):
+    """True for an in-memory SQLite URL (each connection to it opens a new, empty database)."""
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Runs the given PRAGMAs on every new connection of a SQLite engine (no-op for other databases)."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def begin_savepoint(session):
+    """session.begin_nested(), with the database transaction begun first on SQLite.
+
+    pysqlite only sends BEGIN before the first INSERT/UPDATE/DELETE, so a SAVEPOINT
+    issued before that opens the transaction itself and releasing it commits.
+    IMMEDIATE takes the write lock up front (waiting busy_timeout for it).
+    """
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+    return session.begin_nested()
+
+
+# The commit listeners collect changes in session.info and skip savepoint commits/rollbacks
+# (session.in_nested_transaction()). What they collected is copied when a savepoint starts
+# and put back if it is rolled back, so only that savepoint's changes are dropped.
+SAVEPOINT_STATE = 'savepoint_state'
+
+
+def _copy_collected(value):
+    if isinstance(value, dict):
+        return {key: _copy_collected(item) for key, item in value.items()}
+    if isinstance(value, (list, set)):
+        return type(value)(value)
+    return value
+
+
+@event.listens_for(orm.Session, 'after_transaction_create')
+def _remember_collected(session, transaction):
+    if transaction.nested:
+        session.info.setdefault(SAVEPOINT_STATE, {})[transaction] = {
+            key: _copy_collected(value) for key, value in session.info.items() if key != SAVEPOINT_STATE}
+
+
+@event.listens_for(orm.Session, 'after_soft_rollback')
+def _restore_collected(session, previous_transaction):
+    collected = session.info.get(SAVEPOINT_STATE, {}).pop(previous_transaction, None) if previous_transaction.nested else None
+    if collected is not None:
+        for key in [key for key in session.info if key != SAVEPOINT_STATE]:
+            del session.info[key]
+        session.info.update(collected)
+
+
+@event.listens_for(orm.Session, 'after_transaction_end')
+def _forget_collected(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(SAVEPOINT_STATE, None)
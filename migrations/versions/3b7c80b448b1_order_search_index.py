@@ -0,0 +1,83 @@
+"""Order search index
+
+SQLite FTS5 table (trigram tokenizer, so partial order numbers and phone
+numbers match) over order number, customer name/phone and item notes, kept in
+sync by triggers. rowid is the order id.
+
+The triggers belong to the order, order_item and customer tables: a later batch
+migration that recreates one of those tables must create them again.
+
+Revision ID: 3b7c80b448b1
+Revises: d8285232b2c8
+Create Date: 2026-10-18 20:20:15.392506
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c80b448b1'
+down_revision = 'd8285232b2c8'
+branch_labels = None
+depends_on = None
+
+
+def index_rows(where):
+    # The search row of each order matching `where` (o = order)
+    return f"""
+        INSERT INTO order_search (rowid, order_number, customer_name, customer_phone, notes)
+        SELECT o.id, o.order_number, coalesce(c.name, ''), coalesce(c.phone, ''),
+               coalesce((SELECT group_concat(i.notes, ' ') FROM order_item i
+                         WHERE i.order_id = o.id AND i.notes IS NOT NULL AND i.notes != ''), '')
+        FROM "order" o LEFT JOIN customer c ON c.id = o.customer_id
+        WHERE {where};"""
+
+
+def reindex_order(order_id):
+    return f"DELETE FROM order_search WHERE rowid = {order_id};" + index_rows(f"o.id = {order_id}")
+
+
+TRIGGERS = {
+    'order_search_order_insert': f"""
+        AFTER INSERT ON "order" BEGIN {index_rows('o.id = NEW.id')} END""",
+    'order_search_order_update': f"""
+        AFTER UPDATE OF order_number, customer_id ON "order" BEGIN
+            DELETE FROM order_search WHERE rowid = OLD.id; {index_rows('o.id = NEW.id')} END""",
+    'order_search_order_delete': """
+        AFTER DELETE ON "order" BEGIN DELETE FROM order_search WHERE rowid = OLD.id; END""",
+    # Lines without notes (most of them) leave the search row unchanged
+    'order_search_item_insert': f"""
+        AFTER INSERT ON order_item WHEN NEW.notes IS NOT NULL AND NEW.notes != '' BEGIN
+            {reindex_order('NEW.order_id')} END""",
+    'order_search_item_update': f"""
+        AFTER UPDATE OF notes, order_id ON order_item
+        WHEN OLD.notes IS NOT NEW.notes OR OLD.order_id != NEW.order_id BEGIN
+            {reindex_order('OLD.order_id')} {reindex_order('NEW.order_id')} END""",
+    'order_search_item_delete': f"""
+        AFTER DELETE ON order_item WHEN OLD.notes IS NOT NULL AND OLD.notes != '' BEGIN
+            {reindex_order('OLD.order_id')} END""",
+    'order_search_customer_update': f"""
+        AFTER UPDATE OF name, phone ON customer BEGIN
+            DELETE FROM order_search WHERE rowid IN (SELECT id FROM "order" WHERE customer_id = NEW.id);
+            {index_rows('o.customer_id = NEW.id')} END""",
+}
+
+
+def upgrade():
+    # Other databases search with LIKE instead (services.order_search)
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE order_search USING fts5("
+               "order_number, customer_name, customer_phone, notes, tokenize='trigram')")
+    op.execute(index_rows('1'))
+    for name, body in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS order_search")
@@ -3,13 +3,22 @@ from .category import Category
 from .product import Product
 from .ingredient import Ingredient
 from .product_ingredient import ProductIngredient
+from .recipe_version import RecipeVersion
 from .supplier import Supplier
 from .order import Order
 from .order_item import OrderItem
 from .customer import Customer
 from .inventory_log import InventoryLog
+from .order_status_event import OrderStatusEvent
+from .ticket_time_bucket import TicketTimeBucket
+from .kitchen_throughput import KitchenThroughput
+from .inventory_outbox import InventoryOutbox
+from .sales_rollup import SalesRollup
+from .product_sales_rollup import ProductSalesRollup
 
 __all__ = [
-    'User', 'Category', 'Product', 'Ingredient', 'ProductIngredient',
-    'Supplier', 'Order', 'OrderItem', 'Customer', 'InventoryLog'
+    'User', 'Category', 'Product', 'Ingredient', 'ProductIngredient', 'RecipeVersion',
+    'Supplier', 'Order', 'OrderItem', 'Customer', 'InventoryLog', 'OrderStatusEvent',
+    'TicketTimeBucket', 'KitchenThroughput', 'InventoryOutbox',
+    'SalesRollup', 'ProductSalesRollup'
 ]
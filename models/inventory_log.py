@@ -10,5 +10,11 @@ class InventoryLog(db.Model):
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True) # Link to order if usage
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_inventory_log_timestamp', 'timestamp'), # Latest movements on the inventory page
+        db.Index('ix_inventory_log_ingredient_timestamp', 'ingredient_id', 'timestamp'), # History of one ingredient
+        db.Index('ix_inventory_log_order_id', 'order_id'), # Usage logged for an order
+    )
+
     def __repr__(self):
         return f"InventoryLog(Ingredient: {self.ingredient_id}, Change: {self.quantity_change}, Reason: {self.reason})"
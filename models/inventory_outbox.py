@@ -0,0 +1,18 @@
+from extensions import db
+from datetime import datetime
+
+class InventoryOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow) # Pushed back after a failed attempt
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    order = db.relationship('Order', backref=db.backref('inventory_outbox', uselist=False, cascade="all, delete-orphan"))
+
+    __table_args__ = (db.Index('ix_inventory_outbox_status_next_attempt', 'status', 'next_attempt_at'),)
+
+    def __repr__(self):
+        return f"InventoryOutbox(Order: {self.order_id}, Status: {self.status}, Attempts: {self.attempts})"
@@ -0,0 +1,9 @@
+from extensions import db
+
+class KitchenThroughput(db.Model):
+    # Orders completed per 15-minute window
+    window_start = db.Column(db.DateTime, primary_key=True)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"KitchenThroughput('{self.window_start}', {self.completed})"
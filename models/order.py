@@ -15,6 +15,15 @@ class Order(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(50))
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=True) # Made nullable
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=True) # Client-supplied key, dedupes retried submissions
+
+    __table_args__ = (
+        db.Index('ix_order_status_created_at', 'status', 'created_at'), # Kitchen queue, reports and order list by status
+        db.Index('ix_order_created_at', 'created_at'), # Date ranges and newest-first lists (read backwards for DESC)
+        db.Index('ix_order_type_created_at', 'order_type', 'created_at'), # Order list filtered by type
+        db.Index('ix_order_customer_created_at', 'customer_id', 'created_at'), # Customer order history
+        db.Index('ix_order_user_created_at', 'user_id', 'created_at'), # Orders by staff member
+    )
 
     def __repr__(self):
         return f"Order('{self.order_number}', '{self.status}', '{self.total_amount}')"
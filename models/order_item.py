@@ -8,5 +8,10 @@ class OrderItem(db.Model):
     price = db.Column(db.Float, nullable=False) # Price per unit at the time of order
     notes = db.Column(db.Text, nullable=True) # Special instructions
 
+    __table_args__ = (
+        db.Index('ix_order_item_order_id', 'order_id'), # Lines of an order (receipts, rollups, exports)
+        db.Index('ix_order_item_product_id', 'product_id'), # Sales of a product
+    )
+
     def __repr__(self):
         return f"OrderItem(Order: {self.order_id}, Product: {self.product_id}, Qty: {self.quantity})"
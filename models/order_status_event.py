@@ -0,0 +1,14 @@
+from extensions import db
+from datetime import datetime
+
+class OrderStatusEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    from_status = db.Column(db.String(20), nullable=True) # None when the order was created
+    to_status = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Staff who changed it, if known
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    order = db.relationship('Order', backref=db.backref('status_events', lazy=True, cascade="all, delete-orphan"))
+
+    def __repr__(self):
+        return f"OrderStatusEvent(Order: {self.order_id}, {self.from_status} -> {self.to_status})"
@@ -0,0 +1,16 @@
+from extensions import db
+
+class ProductSalesRollup(db.Model):
+    # Item quantities and revenue per hour, product and dimension, kept current by services.sales_rollup
+    hour = db.Column(db.DateTime, primary_key=True) # Order created_at truncated to the hour
+    status = db.Column(db.String(20), primary_key=True)
+    order_type = db.Column(db.String(20), primary_key=True)
+    payment_method = db.Column(db.String(50), primary_key=True) # '' when the order has none
+    user_id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0) # Orders containing the product
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0) # quantity * price at the time of order
+
+    def __repr__(self):
+        return f"ProductSalesRollup('{self.hour}', Product: {self.product_id}, Qty: {self.quantity})"
@@ -0,0 +1,9 @@
+from extensions import db
+
+class RecipeVersion(db.Model):
+    # A single row (id 1) bumped by every transaction that changes a recipe, so each process can tell its compiled recipes are stale
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"RecipeVersion({self.version})"
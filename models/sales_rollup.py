@@ -0,0 +1,14 @@
+from extensions import db
+
+class SalesRollup(db.Model):
+    # Orders and sales per hour and dimension, kept current by services.sales_rollup
+    hour = db.Column(db.DateTime, primary_key=True) # created_at truncated to the hour
+    status = db.Column(db.String(20), primary_key=True)
+    order_type = db.Column(db.String(20), primary_key=True)
+    payment_method = db.Column(db.String(50), primary_key=True) # '' when the order has none
+    user_id = db.Column(db.Integer, primary_key=True) # Staff who took the orders
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    total_sales = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"SalesRollup('{self.hour}', '{self.status}', Orders: {self.order_count}, Sales: {self.total_sales})"
@@ -0,0 +1,10 @@
+from extensions import db
+
+class TicketTimeBucket(db.Model):
+    # Streaming histogram of created_at -> completed_at, one row per (day, log-scaled bucket)
+    day = db.Column(db.Date, primary_key=True) # Day the order was completed
+    bucket = db.Column(db.Integer, primary_key=True) # See services.kitchen.bucket_for
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"TicketTimeBucket('{self.day}', {self.bucket}, {self.count})"
@@ -1 +1,16 @@
-# This file can remain empty or be used for common route utilities if needed.
+# Common route utilities.
+from functools import wraps
+from flask import g
+
+
+def read_only(view):
+    """Declares a view read-only: its queries run on the read-only engine (see extensions.RoutingSession).
+
+    Reports and listings then never hold the primary's locks or pool slots
+    that checkouts need. Anything the view tries to write fails.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
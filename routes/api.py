@@ -1,12 +1,25 @@
-from flask import Blueprint, request, jsonify, abort, send_file
+from flask import Blueprint, request, jsonify, abort, send_file, Response, current_app, stream_with_context, url_for
 from flask_login import login_required, current_user
+from routes import read_only
 from werkzeug.security import generate_password_hash
 from werkzeug.utils import secure_filename
 from extensions import db
 from models import User, Category, Product, Ingredient, Supplier, Order, OrderItem, Customer, InventoryLog, ProductIngredient
+from services import order_events
+from services.kitchen import open_tickets, ticket_data, ticket_time_percentiles, completed_per_window, window_start, WINDOW_MINUTES
+from services.inventory_outbox import reconciliation_report, retry_failed, get_inventory_worker
+from services.reports import build_report
+from services.report_cache import get_report_cache
+from services.report_export import order_lines_csv, write_excel_report, stream_and_remove
+from services.report_jobs import get_report_jobs
+from services.sales_store import get_sales_store, DIMENSIONS
+from services.order_search import search_orders, search_terms, MIN_TERM_LENGTH
+from services.customer_index import get_customer_index
 from datetime import datetime, date, timedelta
 import os
+import json
 import io # For file export later if needed
+import tempfile
 from sqlalchemy import func, desc, cast, Date as SQLDate, extract # Import extract
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
@@ -158,6 +171,20 @@ def get_customer(customer_id):
         'orders': orders_data
     })
 
+@api_bp.route('/customers/lookup', methods=['GET'])
+@login_required
+@read_only
+def lookup_customers():
+    # POS typeahead: customers whose phone or name starts with q, served from the in-memory index
+    if current_user.role not in ['manager', 'cashier']: abort(403)
+
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    if not query:
+        return jsonify({'success': True, 'results': []})
+
+    return jsonify({'success': True, 'results': get_customer_index(current_app).lookup(query, limit)})
+
 @api_bp.route('/customers', methods=['POST'])
 @login_required
 def add_customer():
@@ -483,11 +510,41 @@ def get_order_details(order_id):
         'customer_id': order.customer_id
     })
 
+@api_bp.route('/orders/search')
+@login_required
+@read_only
+def search_orders_api():
+    # Ranked search over order number, customer name/phone and item notes (partial matches)
+    if current_user.role != 'manager': abort(403)
+
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    if not search_terms(query):
+        return jsonify({'success': False, 'message': f'Enter at least {MIN_TERM_LENGTH} characters to search'}), 400
+
+    return jsonify({'success': True, 'results': search_orders(query, limit)})
+
+@api_bp.route('/orders/stream')
+@login_required
+def stream_order_events():
+    # Server-Sent Events: order_created / status_changed pushed from the in-process broker
+    # Used by the dashboard, orders and kitchen pages (cashiers only have the POS screen)
+    if current_user.role not in ['manager', 'kitchen']: abort(403)
+
+    # '<epoch>-<n>'; the broker sends a reset for ids it did not issue (restart, another worker)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    return Response(
+        order_events.stream(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'} # Stop proxies buffering the stream
+    )
+
 @api_bp.route('/orders/<int:order_id>/status', methods=['POST'])
 @login_required
 def update_order_status(order_id):
-     # Allow managers or cashiers
-    if current_user.role not in ['manager', 'cashier']: abort(403)
+     # Allow managers, cashiers and kitchen staff (who move tickets through the queue)
+    if current_user.role not in ['manager', 'cashier', 'kitchen']: abort(403)
 
     order = Order.query.get_or_404(order_id)
     data = request.get_json()
@@ -508,18 +565,66 @@ def update_order_status(order_id):
     return jsonify({'success': True, 'new_status': order.status})
 
 
+# --- Kitchen API ---
+@api_bp.route('/kitchen/queue', methods=['GET'])
+@login_required
+def get_kitchen_queue():
+    if current_user.role not in ['manager', 'kitchen']: abort(403)
+    return jsonify({'success': True, 'tickets': [ticket_data(order) for order in open_tickets()]})
+
+@api_bp.route('/kitchen/metrics', methods=['GET'])
+@login_required
+@read_only
+def get_kitchen_metrics():
+    if current_user.role not in ['manager', 'kitchen']: abort(403)
+    from routes.dashboard import get_date_range # Same range keys as the dashboard
+    start_date, end_date, selected_range = get_date_range(request.args.get('range', 'today'))
+
+    # Percentiles come from the maintained histogram tables, not from scanning orders
+    percentiles, completed = ticket_time_percentiles(start_date.date(), end_date.date())
+    end_window = min(end_date, datetime.utcnow())
+    return jsonify({
+        'success': True,
+        'range': selected_range,
+        'completed_orders': completed,
+        'ticket_time_seconds': percentiles,
+        # Only windows with completions; the rest of the range between them had none
+        'completed_per_window': completed_per_window(start_date, end_window),
+        'window_minutes': WINDOW_MINUTES,
+        'current_window': window_start(end_window).isoformat()
+    })
+
+
 # --- Inventory & Supplier API ---
 # Add POST, PUT, DELETE for Ingredients and Suppliers as needed
 # Add POST for InventoryLog (manual adjustments, receiving stock)
 
-# --- Report API ---
-@api_bp.route('/reports/generate', methods=['POST'])
+@api_bp.route('/inventory/outbox', methods=['GET'])
 @login_required
-def generate_report_data():
-    if current_user.role not in ['manager']: abort(403) # Only managers for reports
+@read_only
+def get_inventory_outbox_report():
+    # Reconciliation: orders whose deferred ingredient deduction failed or is overdue
+    if current_user.role not in ['manager']: abort(403)
+    report = reconciliation_report()
+    return jsonify({'success': True, **report})
+
+@api_bp.route('/inventory/outbox/retry', methods=['POST'])
+@login_required
+def retry_inventory_outbox():
+    if current_user.role not in ['manager']: abort(403)
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get('order_ids') # Optional, defaults to every failed entry
+    if order_ids is not None and (not isinstance(order_ids, list) or not all(isinstance(i, int) for i in order_ids)):
+        return jsonify({'success': False, 'message': 'order_ids must be a list of order IDs.'}), 400
+
+    count = retry_failed(order_ids)
+    if count:
+        get_inventory_worker(current_app._get_current_object()).notify()
+    return jsonify({'success': True, 'requeued': count})
 
-    filters = request.get_json()
-    report_type = filters.get('report_type', 'sales')
+# --- Report API ---
+def parse_report_range(filters):
+    """Returns (start_date, end_date) for the report filters; raises ValueError for a bad custom range."""
     date_range = filters.get('date_range', 'today')
     start_date_str = filters.get('date_start')
     end_date_str = filters.get('date_end')
@@ -549,153 +654,142 @@ def generate_report_data():
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             if start_date > end_date: raise ValueError("Start date cannot be after end date.")
         except ValueError as e:
-            return jsonify({'success': False, 'message': f'Invalid custom date range: {e}'}), 400
-    
+            raise ValueError(f'Invalid custom date range: {e}')
+    return start_date, end_date
+
+def wants_async(filters):
+    return str(filters.get('async', '')).lower() in ('1', 'true', 'yes')
+
+def submit_report_job(kind, params):
+    # Identical requests (same parameters, same sales data) share one job
+    job = get_report_jobs(current_app._get_current_object()).submit(kind, params)
+    return jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': url_for('api.get_report_job', job_id=job['id'])
+    }), 202
+
+@api_bp.route('/reports/generate', methods=['GET', 'POST'])
+@login_required
+@read_only
+def generate_report_data():
+    if current_user.role not in ['manager']: abort(403) # Only managers for reports
+
+    # GET (query string) lets the browser revalidate with If-None-Match; POST (JSON body) is kept for API clients
+    filters = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    report_type = filters.get('report_type', 'sales')
+    try:
+        start_date, end_date = parse_report_range(filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
     # Convert dates to datetimes for filtering
     start_dt = datetime.combine(start_date, datetime.min.time())
     end_dt = datetime.combine(end_date, datetime.max.time())
 
-    # --- Fetch Data Based on Report Type ---
-    # This is a simplified example. Real reports would be more complex.
-    
-    # Base query for orders in range
-    orders_in_range = Order.query.filter(
-        Order.created_at >= start_dt, 
-        Order.created_at <= end_dt,
-        Order.status == 'completed' # Usually only completed orders for sales reports
-    )
+    # 'rollup' reads the hourly rollup tables; 'scan' computes every section from one pass over the raw rows
+    backend = current_app.config.get('REPORT_BACKEND', 'rollup')
+    if wants_async(filters):
+        return submit_report_job('generate', {'report_type': report_type, 'start': start_date.isoformat(),
+                                              'end': end_date.isoformat(), 'backend': backend})
+    cache_key = (report_type, start_date.isoformat(), end_date.isoformat(), backend)
+    cache = get_report_cache(current_app._get_current_object())
+    report_data, etag = cache.get_or_build(cache_key, start_dt, end_dt, lambda: build_report(start_dt, end_dt, backend))
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify({'success': True, 'data': report_data})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache' # Always revalidate; unchanged reports cost a 304
+    return response
 
-    total_sales = orders_in_range.with_entities(db.func.sum(Order.total_amount)).scalar() or 0
-    orders_count = orders_in_range.count()
-    avg_order_value = total_sales / orders_count if orders_count > 0 else 0
-
-    # Top Items
-    top_items_query = db.session.query(
-        Product.name, 
-        db.func.sum(OrderItem.quantity).label('total_quantity'),
-        db.func.sum(OrderItem.quantity * OrderItem.price).label('total_revenue')
-    ).join(OrderItem, OrderItem.product_id == Product.id)\
-     .join(Order, Order.id == OrderItem.order_id)\
-     .filter(Order.created_at >= start_dt, Order.created_at <= end_dt, Order.status == 'completed')\
-     .group_by(Product.name)\
-     .order_by(db.desc('total_revenue'))\
-     .limit(5)
-    top_items = [{'name': i[0], 'quantity': int(i[1]), 'revenue': float(i[2])} for i in top_items_query.all()]
-
-    # Payment Methods
-    payment_methods_query = db.session.query(
-        Order.payment_method,
-        db.func.count(Order.id).label('count'),
-        db.func.sum(Order.total_amount).label('total_amount')
-    ).filter(Order.created_at >= start_dt, Order.created_at <= end_dt, Order.status == 'completed')\
-     .group_by(Order.payment_method)\
-     .order_by(db.desc('total_amount'))
-    payment_methods = [{'method': p[0], 'count': p[1], 'amount': float(p[2])} for p in payment_methods_query.all()]
-
-    # Staff Performance
-    staff_perf_query = db.session.query(
-        User.name,
-        db.func.count(Order.id).label('order_count'),
-        db.func.sum(Order.total_amount).label('total_sales')
-    ).join(Order, Order.user_id == User.id)\
-     .filter(Order.created_at >= start_dt, Order.created_at <= end_dt, Order.status == 'completed')\
-     .group_by(User.name)\
-     .order_by(db.desc('total_sales'))
-    staff_performance = [{'name': s[0], 'orders': s[1], 'sales': float(s[2])} for s in staff_perf_query.all()]
-
-    # Sales Trend (Example: Daily sales for the period)
-    sales_trend_query = db.session.query(
-        db.func.date(Order.created_at).label('sale_date'),
-        db.func.sum(Order.total_amount).label('daily_total')
-    ).filter(Order.created_at >= start_dt, Order.created_at <= end_dt, Order.status == 'completed')\
-     .group_by('sale_date')\
-     .order_by('sale_date')
-    sales_trend = [{'date': d[0].isoformat() if isinstance(d[0], date) else d[0], 'sales': float(d[1])} for d in sales_trend_query.all()]
-
-    # --- Calculate Hourly Sales Data ---
-    hourly_sales_query = db.session.query(
-        extract('hour', Order.created_at).label('hour'), # Extract hour
-        func.count(Order.id).label('order_count'),
-        func.sum(Order.total_amount).label('total_sales')
-    ).filter(
-        Order.created_at >= start_dt, 
-        Order.created_at <= end_dt,
-        Order.status == 'completed'
-    ).group_by(extract('hour', Order.created_at))\
-     .order_by(extract('hour', Order.created_at))
-    
-    # Initialize hourly data structure (0-23 hours)
-    hourly_sales_dict = {hour: {'orders': 0, 'sales': 0.0} for hour in range(24)}
-    for h in hourly_sales_query.all():
-        if h.hour is not None: # Ensure hour is not null
-            hourly_sales_dict[int(h.hour)] = {'orders': h.order_count, 'sales': float(h.total_sales or 0)}
-            
-    # Convert dict to list format suitable for charts
-    hourly_sales = [{'hour': hour, 'orders': data['orders'], 'sales': data['sales']} for hour, data in hourly_sales_dict.items()]
-    # --- End Hourly Sales Data ---
-
-    # --- Assemble Response ---
-    report_data = {
-        'summary': {
-            'total_sales': total_sales,
-            'orders_count': orders_count,
-            'avg_order_value': avg_order_value,
-            # Add top category calculation if needed
-        },
-        'top_items': top_items,
-        'payment_methods': payment_methods,
-        'staff_performance': staff_performance,
-        'sales_trend': sales_trend,
-        'hourly_sales': hourly_sales, # Add hourly data to response
-    }
-
-    return jsonify({'success': True, 'data': report_data})
 
+@api_bp.route('/reports/pivot', methods=['GET'])
+@login_required
+@read_only
+def pivot_report():
+    if current_user.role != 'manager': abort(403)
+
+    # e.g. ?rows=category&columns=weekday&measure=revenue&date_range=this_month
+    # Drill down by passing a key from a previous answer: ?rows=product&category=3
+    filters = request.args
+    try:
+        start_date, end_date = parse_report_range(filters)
+        drill = {name: int(filters[name]) for name in DIMENSIONS if name != 'status' and filters.get(name, '') != ''}
+        result = get_sales_store(current_app._get_current_object()).pivot(
+            filters.get('rows', 'category'),
+            filters.get('columns') or None,
+            measure=filters.get('measure', 'revenue'),
+            start_dt=datetime.combine(start_date, datetime.min.time()),
+            end_dt=datetime.combine(end_date, datetime.max.time()),
+            status=filters.get('status', 'completed') or None,
+            filters=drill
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, **result})
 
 @api_bp.route('/reports/export/<format>', methods=['POST'])
 @login_required
+@read_only
 def export_report(format):
     if current_user.role != 'manager': abort(403)
-    
-    # Get filters from form data (similar to generate_report_data)
-    filters = request.form 
-    # ... parse filters ...
+    if format not in ('csv', 'excel', 'pdf'):
+        return jsonify({'success': False, 'message': 'Invalid export format'}), 400
 
-    # --- Generate Report Data (again, or reuse logic) ---
-    # ... fetch data based on filters ...
-    report_data = { # Example structure
-        'summary': {'total_sales': 1234.56}, 
-        'details': [{'item': 'A', 'qty': 10}] 
-    } 
+    # Filters come from the reports page form (or JSON from API clients), parsed like generate_report_data
+    filters = request.form if request.form else (request.get_json(silent=True) or {})
+    try:
+        start_date, end_date = parse_report_range(filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    start_dt = datetime.combine(start_date, datetime.min.time())
+    end_dt = datetime.combine(end_date, datetime.max.time())
 
-    # --- Generate File Content ---
     filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    if wants_async(filters) and format in ('csv', 'excel'):
+        # Built by a worker process; the client polls the job and downloads the file when it is done
+        return submit_report_job(format, {'report_type': filters.get('report_type', 'sales'), 'start': start_date.isoformat(),
+                                          'end': end_date.isoformat(), 'backend': current_app.config.get('REPORT_BACKEND', 'rollup')})
+
+    if format == 'csv':
+        # Streamed straight from a server-side cursor; the file is never held in memory
+        return Response(
+            stream_with_context(order_lines_csv(start_dt, end_dt)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
+        )
+
+    # The summary sheets use the same (cached) data as the on-screen report
+    backend = current_app.config.get('REPORT_BACKEND', 'rollup')
+    cache_key = (filters.get('report_type', 'sales'), start_date.isoformat(), end_date.isoformat(), backend)
+    cache = get_report_cache(current_app._get_current_object())
+    report_data, _ = cache.get_or_build(cache_key, start_dt, end_dt, lambda: build_report(start_dt, end_dt, backend))
+
+    # --- Generate File Content ---
     mimetype = None
     file_content = None
 
-    if format == 'csv':
-        filename += ".csv"
-        mimetype = 'text/csv'
-        # Use io.StringIO and csv module to generate CSV content
-        output = io.StringIO()
-        # writer = csv.writer(output)
-        # writer.writerow(['Header1', 'Header2'])
-        # writer.writerow(['Data1', 'Data2'])
-        # file_content = output.getvalue().encode('utf-8')
-        file_content = b"Header1,Header2\nData1,Data2" # Placeholder
-
-    elif format == 'excel':
-        filename += ".xlsx"
-        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        # Use pandas or openpyxl to generate Excel content in memory (io.BytesIO)
-        output = io.BytesIO()
-        # import pandas as pd
-        # df = pd.DataFrame(report_data['details'])
-        # df.to_excel(output, index=False)
-        # file_content = output.getvalue()
-        file_content = b"Excel Content Placeholder" # Placeholder
+    if format == 'excel':
+        # Written to a temporary file (xlsx is a zip and cannot be produced as a forward-only stream)
+        # and removed once the response has been sent
+        tmp = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+        tmp.close()
+        try:
+            write_excel_report(tmp.name, start_dt, end_dt, report_data)
+        except Exception:
+            os.remove(tmp.name)
+            raise
+        return stream_and_remove(
+            tmp.name,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={'Content-Disposition': f'attachment; filename={filename}.xlsx'}
+        )
 
-    elif format == 'pdf':
+    if format == 'pdf':
         filename += ".pdf"
         mimetype = 'application/pdf'
         # Use libraries like ReportLab or WeasyPrint to generate PDF content in memory (io.BytesIO)
@@ -706,8 +800,6 @@ def export_report(format):
         # c.save()
         # file_content = output.getvalue()
         file_content = b"%PDF-1.4\n..." # Placeholder
-    else:
-        return jsonify({'success': False, 'message': 'Invalid export format'}), 400
 
     if file_content:
         return send_file(
@@ -718,3 +810,36 @@ def export_report(format):
         )
     else:
          return jsonify({'success': False, 'message': 'Failed to generate report content'}), 500
+
+@api_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_report_job(job_id):
+    if current_user.role != 'manager': abort(403)
+    job = get_report_jobs(current_app._get_current_object()).status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Report job not found or expired.'}), 404
+
+    data = {'success': True, 'job_id': job['id'], 'kind': job['kind'], 'status': job['status']}
+    if job['status'] == 'done':
+        data['download_url'] = url_for('api.download_report_job', job_id=job['id'])
+    elif job['status'] == 'failed':
+        data['message'] = job.get('error')
+    return jsonify(data)
+
+@api_bp.route('/reports/jobs/<job_id>/download', methods=['GET'])
+@login_required
+def download_report_job(job_id):
+    if current_user.role != 'manager': abort(403)
+    jobs = get_report_jobs(current_app._get_current_object())
+    job = jobs.status(job_id)
+    if job is None or job['status'] != 'done':
+        return jsonify({'success': False, 'message': 'Report is not ready.'}), 404
+
+    path = jobs.artifact_path(job)
+    if job['kind'] == 'generate':
+        with open(path) as f:
+            return jsonify({'success': True, 'data': json.load(f)})
+    mimetypes = {'csv': 'text/csv', 'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'}
+    extension = os.path.splitext(path)[1]
+    return send_file(path, mimetype=mimetypes[job['kind']], as_attachment=True,
+                     download_name=f"report_{job['params']['start']}_{job['params']['end']}{extension}")
@@ -15,6 +15,8 @@ def index():
     if current_user.is_authenticated:
         if current_user.role == 'cashier':
             return redirect(url_for('pos.new_order')) # Reference blueprint name
+        elif current_user.role == 'kitchen':
+            return redirect(url_for('kitchen.view_queue'))
         else:
             return redirect(url_for('dashboard.view')) # Reference blueprint name
     return redirect(url_for('auth.login'))
@@ -25,6 +27,8 @@ def login():
         # Redirect based on role if already logged in
         if current_user.role == 'cashier':
             return redirect(url_for('pos.new_order'))
+        elif current_user.role == 'kitchen':
+            return redirect(url_for('kitchen.view_queue'))
         else:
             return redirect(url_for('dashboard.view'))
 
@@ -41,6 +45,8 @@ def login():
             # Redirect cashiers directly to the POS screen
             if user.role == 'cashier':
                 return redirect(url_for('pos.new_order'))
+            elif user.role == 'kitchen':
+                return redirect(url_for('kitchen.view_queue'))
             else:
                 # Redirect other roles to dashboard
                 return redirect(url_for('dashboard.view'))
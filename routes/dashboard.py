@@ -1,9 +1,8 @@
-from flask import Blueprint, render_template, redirect, url_for, request # Import request
+from flask import Blueprint, render_template, redirect, url_for, request, jsonify, abort, current_app # Import request
 from flask_login import login_required, current_user
-from extensions import db
-from models import Order, OrderItem, Product, User, Ingredient # Import necessary models
+from routes import read_only
+from services.dashboard_snapshot import get_dashboard_snapshots
 from datetime import datetime, date, timedelta # Import date, timedelta
-from sqlalchemy import func, desc, cast, Date as SQLDate # Import cast, SQLDate
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
@@ -51,6 +50,7 @@ def get_date_range(range_str):
 
 @dashboard_bp.route('/')
 @login_required
+@read_only
 def view():
     # Redirect cashier away from dashboard
     if current_user.role == 'cashier':
@@ -60,89 +60,30 @@ def view():
     selected_range = request.args.get('range', 'today')
     start_date, end_date, selected_range = get_date_range(selected_range)
 
-    # Base query for orders within the selected date range
-    orders_in_range_query = Order.query.filter(
-        Order.created_at >= start_date,
-        Order.created_at <= end_date
-    )
-    
-    # Calculate total sales for the range
-    total_sales = orders_in_range_query.with_entities(func.sum(Order.total_amount)).scalar() or 0
-    
-    # Calculate Orders Count for the range
-    total_orders_count = orders_in_range_query.count()
-
-    # Get best selling items in the range
-    best_sellers = db.session.query(
-        Product.name, func.sum(OrderItem.quantity).label('total')
-    ).join(OrderItem, OrderItem.product_id == Product.id)\
-     .join(Order, Order.id == OrderItem.order_id)\
-     .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-     .group_by(Product.name)\
-     .order_by(desc('total'))\
-     .limit(5).all()
-    
-    # Calculate Staff Performance in the range
-    staff_performance = db.session.query(
-        User.name,
-        func.count(Order.id).label('order_count')
-    ).join(Order, User.id == Order.user_id)\
-    .filter(
-        Order.created_at >= start_date,
-        Order.created_at <= end_date
-    )\
-    .group_by(User.name)\
-    .order_by(func.count(Order.id).desc())\
-    .all()
-
-    # Get low stock ingredients (not date-dependent)
-    low_stock = Ingredient.query.filter(
-        Ingredient.quantity <= Ingredient.threshold
-    ).order_by(Ingredient.name).all()
-    
-    # Get recent orders (still shows last 5 within the range)
-    recent_orders = orders_in_range_query.order_by(Order.created_at.desc()).limit(5).all()
-
-    # Get count of staff who took orders in the range
-    staff_on_duty_count = db.session.query(func.count(Order.user_id.distinct()))\
-        .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-        .scalar() or 0
-        
-    # --- Sales Trend Data for Chart ---
-    # Group by day using func.date()
-    sales_trend_query = db.session.query(
-        func.date(Order.created_at).label('date'), # Use func.date() for grouping
-        func.sum(Order.total_amount).label('daily_sales')
-    ).filter(
-        Order.created_at >= start_date,
-        Order.created_at <= end_date
-    ).group_by(func.date(Order.created_at))\
-     .order_by(func.date(Order.created_at))\
-     .all()
-
-    # Process results (assuming 'date' is now a date object or string 'YYYY-MM-DD')
-    sales_trend_labels = []
-    sales_trend_values = []
-    for item in sales_trend_query:
-        # Handle potential date object or string from func.date()
-        if isinstance(item.date, date):
-            sales_trend_labels.append(item.date.strftime('%Y-%m-%d'))
-        else: # Assume it's a string 'YYYY-MM-DD'
-            sales_trend_labels.append(item.date) 
-        sales_trend_values.append(float(item.daily_sales) if item.daily_sales is not None else 0.0)
-        
-    # --- End Sales Trend Data ---
+    # Figures come from the in-memory snapshot, kept current as orders are placed and change status
+    snapshot = get_dashboard_snapshots(current_app._get_current_object()).get(selected_range, start_date, end_date)
 
     return render_template(
         'dashboard.html', 
-        total_sales=total_sales, 
-        today_orders=total_orders_count, # Renamed from today_orders_count for consistency with template
-        best_sellers=best_sellers,
-        staff_on_duty_count=staff_on_duty_count, 
-        low_stock=low_stock,
-        orders=recent_orders, 
-        staff_performance=staff_performance,
+        total_sales=snapshot['total_sales'], 
+        today_orders=snapshot['total_orders'], # Renamed from today_orders_count for consistency with template
+        best_sellers=snapshot['best_sellers'],
+        staff_on_duty_count=snapshot['staff_on_duty_count'], 
+        low_stock=snapshot['low_stock'],
+        orders=snapshot['recent_orders'], 
+        staff_performance=snapshot['staff_performance'],
         selected_range=selected_range, # Pass the selected range string
-        sales_trend_labels=sales_trend_labels, # Pass chart labels
-        sales_trend_values=sales_trend_values # Pass chart values
+        sales_trend_labels=snapshot['sales_trend_labels'], # Pass chart labels
+        sales_trend_values=snapshot['sales_trend_values'] # Pass chart values
     )
+
+
+@dashboard_bp.route('/data')
+@login_required
+@read_only
+def data():
+    # Same figures as the page, for refreshing it without a full render
+    if current_user.role == 'cashier': abort(403)
+    start_date, end_date, selected_range = get_date_range(request.args.get('range', 'today'))
+    snapshot = get_dashboard_snapshots(current_app._get_current_object()).get(selected_range, start_date, end_date)
+    return jsonify({'success': True, **snapshot})
@@ -0,0 +1,20 @@
+from flask import Blueprint, render_template, redirect, url_for, abort
+from flask_login import login_required, current_user
+from services.kitchen import open_tickets, ticket_data
+
+kitchen_bp = Blueprint('kitchen', __name__, url_prefix='/kitchen')
+
+@kitchen_bp.route('/')
+@login_required
+def view_queue():
+    # Kitchen staff and managers only
+    if current_user.role == 'cashier':
+        return redirect(url_for('pos.new_order'))
+    if current_user.role not in ['kitchen', 'manager']:
+        abort(403)
+
+    tickets = [ticket_data(order) for order in open_tickets()]
+    return render_template('kitchen.html', tickets=tickets)
+
+# Note: API endpoints for the kitchen queue and its metrics
+# are in routes/api.py
@@ -1,22 +1,27 @@
 from flask import Blueprint, render_template, request, redirect, url_for, abort
 from flask_login import login_required, current_user
+from routes import read_only
 from extensions import db
-from models import Order, OrderItem, Product, User, Customer # Import Customer
+from models import Order, OrderItem, Product, User, Customer, SalesRollup # Import Customer
+from sqlalchemy import tuple_, func
+from datetime import datetime
 
 orders_bp = Blueprint('orders', __name__, url_prefix='/orders')
 
 @orders_bp.route('/')
 @login_required
+@read_only
 def list_orders():
     # Redirect cashier away
     if current_user.role == 'cashier':
         return redirect(url_for('pos.new_order'))
 
     # Get filters from query parameters
-    page = request.args.get('page', 1, type=int)
     per_page = 15 # Number of orders per page
     status_filter = request.args.get('status', 'all')
     type_filter = request.args.get('type', 'all')
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before')) if after is None else None
     
     # Base query - Join User and optionally Customer
     query = db.session.query(
@@ -32,10 +37,29 @@ def list_orders():
     if type_filter != 'all':
         query = query.filter(Order.order_type == type_filter)
     
-    # Get paginated orders
-    pagination = query.order_by(Order.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    # orders_data now contains tuples: (Order object, staff_name, customer_name)
-    orders_data = pagination.items 
+    # Keyset pagination on (created_at, id), newest first: each page seeks past the previous page's
+    # last row in the created_at index, so deep pages cost the same as the first (no OFFSET scan)
+    position = tuple_(Order.created_at, Order.id)
+    if before is not None:
+        rows = query.filter(position > before)\
+            .order_by(Order.created_at.asc(), Order.id.asc()).limit(per_page + 1).all()
+        has_prev, has_next = len(rows) > per_page, True
+        orders_data = rows[:per_page][::-1]
+    else:
+        if after is not None:
+            query = query.filter(position < after)
+        rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(per_page + 1).all()
+        has_prev, has_next = after is not None, len(rows) > per_page
+        orders_data = rows[:per_page]
+    # orders_data contains tuples: (Order object, staff_name, customer_name)
+
+    pagination = {
+        'has_prev': has_prev and bool(orders_data),
+        'has_next': has_next and bool(orders_data),
+        'prev_cursor': encode_cursor(orders_data[0][0]) if orders_data else None,
+        'next_cursor': encode_cursor(orders_data[-1][0]) if orders_data else None,
+        'total': order_count(status_filter, type_filter)
+    }
     
     return render_template(
         'orders.html', 
@@ -45,6 +69,28 @@ def list_orders():
         type_filter=type_filter
     )
 
+def encode_cursor(order):
+    return f"{order.created_at.isoformat()}_{order.id}"
+
+def decode_cursor(cursor):
+    """Parses a page cursor into (created_at, id); None when missing or malformed."""
+    if not cursor:
+        return None
+    created_at, _, order_id = cursor.rpartition('_')
+    try:
+        return datetime.fromisoformat(created_at), int(order_id)
+    except ValueError:
+        return None
+
+def order_count(status_filter, type_filter):
+    # Read from the hourly rollups instead of COUNT(*) over the orders join
+    query = db.session.query(func.sum(SalesRollup.order_count))
+    if status_filter != 'all':
+        query = query.filter(SalesRollup.status == status_filter)
+    if type_filter != 'all':
+        query = query.filter(SalesRollup.order_type == type_filter)
+    return query.scalar() or 0
+
 @orders_bp.route('/<int:order_id>/receipt')
 @login_required
 def view_receipt(order_id):
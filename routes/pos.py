@@ -1,91 +1,88 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from extensions import db
-from models import Category, Product, Order, OrderItem, Ingredient, ProductIngredient, InventoryLog # Import necessary models
-from datetime import datetime
-import uuid
+from models import Category, Product, Ingredient, Order # Import necessary models
+from services import place_order, sync_orders, get_recipe_matrix, get_ingest_queue, get_idempotency_index
 
 pos_bp = Blueprint('pos', __name__, url_prefix='/pos') # Added url_prefix
 
+def submit_order(order_data, user_id):
+    """Places one order and returns (response payload, status code)."""
+    key = order_data.get('idempotencyKey')
+    if key:
+        # The in-memory index can miss (other worker, restart, eviction); the key is also stored on the order
+        existing = Order.query.filter_by(idempotency_key=key).first()
+        if existing:
+            return {'success': True, 'order_number': existing.order_number}, 200
+
+    # Create the order, its items and ingredient deductions in one batched pass
+    try:
+        if current_app.config.get('ORDER_INGEST_ENABLED'):
+            # Hand the order to the group-commit writer and wait for its own result
+            ingest = get_ingest_queue(current_app._get_current_object())
+            order_number = ingest.submit(order_data, user_id).result(timeout=30)
+        else:
+            new_order = place_order(order_data, user_id)
+            db.session.commit()
+            order_number = new_order.order_number
+        # Optionally update order status to 'in-progress' or 'completed' based on workflow
+        # new_order.status = 'in-progress'
+        # db.session.commit()
+        return {'success': True, 'order_number': order_number}, 200
+
+    except ValueError as ve:
+        db.session.rollback()
+        return {'success': False, 'message': str(ve)}, 400
+    except Exception as e:
+        db.session.rollback()
+        if key:
+            # Lost a race with a retry of the same order on another worker
+            existing = Order.query.filter_by(idempotency_key=key).first()
+            if existing:
+                return {'success': True, 'order_number': existing.order_number}, 200
+        # Log the detailed error e
+        print(f"Error placing order: {e}")
+        return {'success': False, 'message': 'An internal error occurred while processing the order.'}, 500
+
+@pos_bp.route('/orders/sync', methods=['POST'])
+@login_required
+def sync_offline_orders():
+    # Terminals that took orders while offline send the whole queue in one request
+    data = request.get_json(silent=True) or {}
+    orders = data.get('orders')
+    if not isinstance(orders, list) or not orders or not all(isinstance(o, dict) for o in orders):
+        return jsonify({'success': False, 'message': 'No orders to sync.'}), 400
+    max_batch = current_app.config.get('ORDER_SYNC_MAX_BATCH', 1000)
+    if len(orders) > max_batch:
+        return jsonify({'success': False, 'message': f'Too many orders in one sync (max {max_batch}).'}), 400
+
+    results = sync_orders(orders, current_user.id, commit_every=current_app.config.get('ORDER_SYNC_COMMIT_EVERY', 100))
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'success': True, 'results': results, 'summary': summary})
+
 @pos_bp.route('/new-order', methods=['GET', 'POST'])
 @login_required
 def new_order():
     if request.method == 'POST':
         order_data = request.get_json()
-        
-        # Generate unique order number
-        order_number = f"ORD-{datetime.now().strftime('%y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
-        
-        # Create new order
-        new_order = Order(
-            order_number=order_number,
-            order_type=order_data['orderType'],
-            status='pending', # Start as pending
-            user_id=current_user.id,
-            subtotal=order_data['subtotal'],
-            tax=order_data['tax'],
-            total_amount=order_data['totalAmount'],
-            payment_method=order_data['paymentMethod'],
-            customer_id=order_data.get('customerId') # Optional customer ID
-        )
-        
-        db.session.add(new_order)
-        db.session.flush()  # Get the order ID before commit
-
-        # Add order items and deduct ingredients
-        try:
-            for item_data in order_data['items']:
-                product = Product.query.get(item_data['productId'])
-                if not product:
-                    raise ValueError(f"Product ID {item_data['productId']} not found.")
-
-                order_item = OrderItem(
-                    order_id=new_order.id,
-                    product_id=item_data['productId'],
-                    quantity=item_data['quantity'],
-                    price=item_data['price'], # Price at time of order
-                    notes=item_data.get('notes', '')
-                )
-                db.session.add(order_item)
+        user_id = current_user.id
 
-                # Deduct ingredients
-                for prod_ing in product.ingredients:
-                    ingredient = prod_ing.ingredient
-                    quantity_to_deduct = prod_ing.quantity_needed * item_data['quantity']
-                    
-                    if ingredient.quantity < quantity_to_deduct:
-                        # Not enough stock - rollback and inform user
-                        db.session.rollback()
-                        return jsonify({'success': False, 'message': f'Insufficient stock for {ingredient.name} to make {product.name}.'}), 400
-
-                    ingredient.quantity -= quantity_to_deduct
-                    
-                    # Log inventory change
-                    log_entry = InventoryLog(
-                        ingredient_id=ingredient.id,
-                        quantity_change=-quantity_to_deduct,
-                        reason='order_usage',
-                        user_id=current_user.id,
-                        order_id=new_order.id
-                    )
-                    db.session.add(log_entry)
-
-            db.session.commit()
-            # Optionally update order status to 'in-progress' or 'completed' based on workflow
-            # new_order.status = 'in-progress'
-            # db.session.commit()
-            return jsonify({'success': True, 'order_number': order_number})
-        
-        except ValueError as ve:
-             db.session.rollback()
-             return jsonify({'success': False, 'message': str(ve)}), 400
-        except Exception as e:
-            db.session.rollback()
-            # Log the detailed error e
-            print(f"Error placing order: {e}") 
-            return jsonify({'success': False, 'message': 'An internal error occurred while processing the order.'}), 500
+        # Retries of the same submission carry the same key and get the original result back
+        key = request.headers.get('Idempotency-Key') or order_data.get('idempotencyKey')
+        if key:
+            key = order_data['idempotencyKey'] = key[:64]
+            index = get_idempotency_index(current_app._get_current_object())
+            payload, status = index.run(key, lambda: submit_order(order_data, user_id))
+        else:
+            payload, status = submit_order(order_data, user_id)
+        return jsonify(payload), status
 
     # GET request - show POS screen
     categories = Category.query.order_by(Category.name).all()
     products = Product.query.filter_by(available=True).order_by(Product.name).all() # Only show available products
-    return render_template('new_order.html', categories=categories, products=products)
+    # Units of each product the current stock can cover, from the cached recipe matrix
+    stock = dict(db.session.query(Ingredient.id, Ingredient.quantity).all())
+    makeable = get_recipe_matrix().makeable_quantities(stock)
+    return render_template('new_order.html', categories=categories, products=products, makeable=makeable)
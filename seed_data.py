@@ -6,7 +6,7 @@ from werkzeug.security import generate_password_hash
 # Import db directly from extensions instead of from app
 from extensions import db
 # Import models directly
-from models import User, Supplier, Category, Product, Ingredient, ProductIngredient, Customer, Order, OrderItem, InventoryLog
+from models import User, Supplier, Category, Product, Ingredient, ProductIngredient, Customer, Order, OrderItem, InventoryLog, OrderStatusEvent, TicketTimeBucket, KitchenThroughput, InventoryOutbox, SalesRollup, ProductSalesRollup
 
 def clear_data():
     """Clears data from tables in an order that respects foreign keys."""
@@ -14,6 +14,12 @@ def clear_data():
     # Delete in reverse order of dependencies or disable FK checks temporarily
     # This order might need adjustment based on exact FK constraints and cascade settings
     db.session.query(InventoryLog).delete()
+    db.session.query(OrderStatusEvent).delete()
+    db.session.query(InventoryOutbox).delete()
+    db.session.query(TicketTimeBucket).delete()
+    db.session.query(KitchenThroughput).delete()
+    db.session.query(SalesRollup).delete()
+    db.session.query(ProductSalesRollup).delete()
     db.session.query(OrderItem).delete()
     db.session.query(Order).delete()
     db.session.query(ProductIngredient).delete()
@@ -0,0 +1,14 @@
+# Shared business logic used by the route blueprints.
+from .order_placement import place_order, sync_orders, InsufficientStockError
+from .recipe_cache import get_recipe_matrix, invalidate_recipes
+from .order_ingest import OrderIngestQueue, get_ingest_queue
+from .idempotency import IdempotencyIndex, get_idempotency_index
+from .order_events import broker as order_events
+from .inventory_outbox import InventoryOutboxWorker, get_inventory_worker
+from . import status_history, kitchen, sales_rollup, dashboard_snapshot, customer_index # Registers the status history / ticket time / rollup / dashboard / customer lookup listeners
+
+__all__ = [
+    'place_order', 'sync_orders', 'InsufficientStockError', 'get_recipe_matrix', 'invalidate_recipes',
+    'OrderIngestQueue', 'get_ingest_queue', 'IdempotencyIndex', 'get_idempotency_index',
+    'order_events', 'InventoryOutboxWorker', 'get_inventory_worker'
+]
@@ -0,0 +1,244 @@
+from extensions import db
+from models import Customer
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from bisect import bisect_left
+import heapq
+import re
+import threading
+import time
+import unicodedata
+import weakref
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+NON_DIGITS = re.compile(r'\D')
+PHONE_QUERY = re.compile(r'[\d\s()+\-.]+')
+SORT_CHUNK = 50000
+
+# Live CustomerIndexes, so the commit listeners can skip all work when no lookup was made
+_indexes = weakref.WeakSet()
+
+
+def normalize_name(name):
+    # Case and accent insensitive, punctuation dropped, single spaces
+    name = name or ''
+    if not name.isascii():
+        name = ''.join(c for c in unicodedata.normalize('NFKD', name) if not unicodedata.combining(c))
+    return ' '.join(PUNCTUATION.sub(' ', name.casefold()).split())
+
+
+def normalize_phone(phone):
+    if not phone or phone.isdigit():
+        return phone or ''
+    return NON_DIGITS.sub('', phone)
+
+
+def is_phone_query(query):
+    return bool(normalize_phone(query)) and PHONE_QUERY.fullmatch(query) is not None
+
+
+def name_keys(name):
+    # The full name and every later word onwards, so "smi" finds "Jane Smith"
+    words = normalize_name(name).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+def phone_keys(phone):
+    phone = normalize_phone(phone)
+    return {phone} if phone else set()
+
+
+class SortedKeys:
+    """Parallel sorted lists of (key, customer id) answering prefix queries with bisect."""
+
+    def __init__(self, keys=(), ids=()):
+        # Sorted in pieces and merged, so a background rebuild never holds the GIL for long
+        runs = [sorted(zip(keys[i:i + SORT_CHUNK], ids[i:i + SORT_CHUNK])) for i in range(0, len(keys), SORT_CHUNK)]
+        self.keys, self.ids = [], []
+        for key, customer_id in heapq.merge(*runs):
+            self.keys.append(key)
+            self.ids.append(customer_id)
+
+    def add(self, key, customer_id):
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == customer_id:
+                return # Already there (a change replayed after a rebuild)
+            i += 1
+        self.keys.insert(i, key)
+        self.ids.insert(i, customer_id)
+
+    def remove(self, key, customer_id):
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == customer_id:
+                del self.keys[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def prefix(self, prefix, limit):
+        """Ids of the first `limit` distinct customers with a key starting with `prefix`, in key order."""
+        found = []
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(found) < limit and self.keys[i].startswith(prefix):
+            if self.ids[i] not in found:
+                found.append(self.ids[i])
+            i += 1
+        return found
+
+
+class CustomerIndex:
+    """In-memory prefix index over customer names and phone numbers for the POS typeahead.
+
+    Holds only normalized keys and customer ids; the matching customers are then
+    read by primary key. Built once from the customer table, then kept current
+    from customer changes committed in this process. Rebuilt in a background
+    thread after `ttl_seconds` to pick up changes made by other processes;
+    lookups keep using the old index meanwhile.
+    """
+
+    def __init__(self, app, ttl_seconds=300):
+        self.app = app
+        self.ttl = ttl_seconds
+        self._names = None
+        self._phones = None
+        self._built_at = 0
+        self._pending = None # Changes committed while a rebuild reads the table
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        _indexes.add(self)
+
+    def lookup(self, query, limit=10):
+        """Customers whose phone (for digit queries) or any name word starts with `query`."""
+        self._ensure_current()
+        with self._lock:
+            if is_phone_query(query):
+                ids = self._phones.prefix(normalize_phone(query), limit)
+            else:
+                prefix = normalize_name(query)
+                ids = self._names.prefix(prefix, limit) if prefix else []
+        if not ids:
+            return []
+        customers = {c.id: c for c in Customer.query.filter(Customer.id.in_(ids))}
+        return [{'id': c.id, 'name': c.name, 'phone': c.phone, 'rewards_points': c.rewards_points}
+                for c in (customers.get(i) for i in ids) if c is not None]
+
+    def _ensure_current(self):
+        if self._names is not None:
+            if time.time() - self._built_at > self.ttl and self._build_lock.acquire(blocking=False):
+                threading.Thread(target=self._refresh, name='customer-index', daemon=True).start()
+            return
+        # No index yet: the first lookup builds it, concurrent ones wait for it
+        with self._build_lock:
+            if self._names is None:
+                self._rebuild()
+
+    def _refresh(self):
+        with self.app.app_context():
+            try:
+                self._rebuild()
+            except Exception as e:
+                print(f"Customer index rebuild error: {e}")
+            finally:
+                db.session.remove()
+                self._build_lock.release()
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending = []
+        try:
+            name_pairs, phone_pairs = ([], []), ([], [])
+            rows = db.session.connection().execute(select(Customer.id, Customer.name, Customer.phone))
+            for customer_id, name, phone in rows:
+                for pairs, keys in ((name_pairs, name_keys(name)), (phone_pairs, phone_keys(phone))):
+                    pairs[0].extend(keys)
+                    pairs[1].extend([customer_id] * len(keys))
+            names, phones = SortedKeys(*name_pairs), SortedKeys(*phone_pairs)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            self._names, self._phones = names, phones
+            for change in self._pending:
+                self._apply(*change)
+            self._pending = None
+            self._built_at = time.time()
+
+    def apply(self, changes):
+        """Applies committed changes: (customer id, old (name, phone), new (name, phone)), None for absent."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(changes)
+            if self._names is not None:
+                for change in changes:
+                    self._apply(*change)
+
+    def _apply(self, customer_id, old, new):
+        old_names, old_phones = (name_keys(old[0]), phone_keys(old[1])) if old else (set(), set())
+        new_names, new_phones = (name_keys(new[0]), phone_keys(new[1])) if new else (set(), set())
+        for keys, sorted_keys, new_keys in ((old_names, self._names, new_names), (old_phones, self._phones, new_phones)):
+            for key in keys - new_keys:
+                sorted_keys.remove(key, customer_id)
+            for key in new_keys - keys:
+                sorted_keys.add(key, customer_id)
+
+    def clear(self):
+        with self._lock:
+            self._names = self._phones = None
+
+
+_index_lock = threading.Lock()
+
+
+def get_customer_index(app):
+    """Returns the app's customer lookup index, creating it on first use."""
+    with _index_lock:
+        index = app.extensions.get('customer_index')
+        if index is None:
+            index = CustomerIndex(app, ttl_seconds=app.config.get('CUSTOMER_INDEX_TTL_SECONDS', 300))
+            app.extensions['customer_index'] = index
+        return index
+
+
+# Customer inserts, name/phone edits and deletes are collected at flush time and applied once committed
+@event.listens_for(Session, 'after_flush')
+def _collect_customer_changes(session, flush_context):
+    if not _indexes:
+        return
+    changes = session.info.setdefault('customer_index', [])
+    for obj in session.new:
+        if isinstance(obj, Customer):
+            changes.append((obj.id, None, (obj.name, obj.phone)))
+    for obj in session.dirty:
+        if isinstance(obj, Customer):
+            name, phone = inspect(obj).attrs.name.history, inspect(obj).attrs.phone.history
+            if name.has_changes() or phone.has_changes():
+                changes.append((obj.id, (previous_value(name), previous_value(phone)), (obj.name, obj.phone)))
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            changes.append((obj.id, (obj.name, obj.phone), None))
+
+
+def previous_value(history):
+    # The value before this flush: the replaced one if changed, else the unchanged one
+    values = history.deleted or history.unchanged
+    return values[0] if values else None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_customer_changes(session):
+    if session.in_nested_transaction():
+        return # A savepoint: applied with the real commit
+    changes = session.info.pop('customer_index', None)
+    if not changes:
+        return
+    for index in list(_indexes):
+        index.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_customer_changes(session):
+    if not session.in_nested_transaction():
+        session.info.pop('customer_index', None)
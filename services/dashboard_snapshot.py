@@ -0,0 +1,302 @@
+from extensions import db
+from models import Order, OrderItem, Product, User, Ingredient, InventoryOutbox, SalesRollup, ProductSalesRollup
+from sqlalchemy import event, inspect, func
+from sqlalchemy.orm import Session
+import threading
+import time
+import weakref
+
+RECENT_ORDERS = 5
+BEST_SELLERS = 5
+BUILD_ATTEMPTS = 3 # Reads repeated while orders keep being added during them
+# Writes to these may move ingredient stock, so the low stock list is re-read after them
+INVENTORY_MODELS = (Order, Ingredient, InventoryOutbox)
+
+# Live DashboardSnapshots, so the commit listeners can skip all work when no dashboard was opened
+_services = weakref.WeakSet()
+
+
+def recent_order_data(order_id, order_number, created_at, order_type, status, total_amount):
+    return {
+        'id': order_id,
+        'order_number': order_number,
+        'created_at': created_at.isoformat(),
+        'created_display': created_at.strftime('%Y-%m-%d %H:%M'),
+        'order_type': order_type,
+        'status': status,
+        'total_amount': total_amount
+    }
+
+
+def last_order_id():
+    return db.session.query(func.max(Order.id)).scalar() or 0
+
+
+def low_stock_data():
+    return [{'id': i.id, 'name': i.name, 'quantity': i.quantity, 'unit': i.unit, 'threshold': i.threshold}
+            for i in Ingredient.query.filter(Ingredient.quantity <= Ingredient.threshold).order_by(Ingredient.name).all()]
+
+
+class RangeSnapshot:
+    """Dashboard figures for one date range, kept as running totals.
+
+    Built once with the same queries the dashboard used to run on every load,
+    then moved forward by add_order / set_status as orders commit.
+    `last_order_id` is the newest order the reads counted; `consistent` is
+    False when orders were added while the queries ran (ids are assigned in
+    commit order on SQLite, so otherwise exactly the orders up to it count).
+    """
+
+    def __init__(self, range_key, start_date, end_date):
+        self.range_key = range_key
+        self.start_date = start_date
+        self.end_date = end_date
+        self.built_at = time.time()
+        first_order_id = last_order_id()
+        in_range = (SalesRollup.hour >= start_date, SalesRollup.hour <= end_date)
+
+        # Totals, best sellers, staff and the trend come from the hourly rollups (all statuses)
+        total_sales, total_orders = db.session.query(
+            func.sum(SalesRollup.total_sales), func.sum(SalesRollup.order_count)
+        ).filter(*in_range).one()
+        self.total_sales = total_sales or 0
+        self.total_orders = total_orders or 0
+
+        # Every product and staff member is kept (not only the top rows), so later orders can overtake
+        self.product_quantities = dict(db.session.query(
+            Product.name, func.sum(ProductSalesRollup.quantity)
+        ).join(ProductSalesRollup, ProductSalesRollup.product_id == Product.id)\
+         .filter(ProductSalesRollup.hour >= start_date, ProductSalesRollup.hour <= end_date)\
+         .group_by(Product.name).all())
+
+        self.staff_orders = dict(db.session.query(
+            User.name, func.sum(SalesRollup.order_count)
+        ).join(SalesRollup, User.id == SalesRollup.user_id)\
+         .filter(*in_range)\
+         .group_by(User.name).all())
+
+        self.daily_sales = {}
+        hourly_sales = db.session.query(SalesRollup.hour, func.sum(SalesRollup.total_sales))\
+            .filter(*in_range)\
+            .group_by(SalesRollup.hour)\
+            .having(func.sum(SalesRollup.order_count) > 0)\
+            .order_by(SalesRollup.hour).all()
+        for hour, sales in hourly_sales:
+            day = hour.strftime('%Y-%m-%d')
+            self.daily_sales[day] = self.daily_sales.get(day, 0.0) + float(sales or 0)
+
+        recent = db.session.query(Order.id, Order.order_number, Order.created_at, Order.order_type, Order.status, Order.total_amount)\
+            .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
+            .order_by(Order.created_at.desc())\
+            .limit(RECENT_ORDERS).all()
+        self.recent_orders = [recent_order_data(*row) for row in recent]
+        self.last_order_id = last_order_id()
+        self.consistent = first_order_id == self.last_order_id
+        self._data = None
+
+    def covers(self, created_at):
+        return self.start_date <= created_at <= self.end_date
+
+    def add_order(self, order, staff_name, items):
+        """Counts a newly committed order; items are (product name, quantity) pairs."""
+        self.total_sales += order['total_amount'] or 0
+        self.total_orders += 1
+        self.staff_orders[staff_name] = self.staff_orders.get(staff_name, 0) + 1
+        for name, quantity in items:
+            self.product_quantities[name] = self.product_quantities.get(name, 0) + quantity
+        day = order['created_at'][:10]
+        self.daily_sales[day] = self.daily_sales.get(day, 0.0) + float(order['total_amount'] or 0)
+        if len(self.recent_orders) < RECENT_ORDERS or order['created_at'] > self.recent_orders[-1]['created_at']:
+            self.recent_orders = sorted(self.recent_orders + [order], key=lambda o: o['created_at'], reverse=True)[:RECENT_ORDERS]
+        self._data = None
+
+    def set_status(self, order_id, status):
+        # Totals cover every status; only the recent orders table shows it
+        for order in self.recent_orders:
+            if order['id'] == order_id:
+                order['status'] = status
+                self._data = None
+
+    def data(self, low_stock):
+        if self._data is None:
+            best_sellers = sorted(((name, total) for name, total in self.product_quantities.items() if total > 0),
+                                  key=lambda item: item[1], reverse=True)[:BEST_SELLERS]
+            staff_performance = sorted(((name, count) for name, count in self.staff_orders.items() if count > 0),
+                                       key=lambda item: item[1], reverse=True)
+            days = sorted(self.daily_sales)
+            self._data = {
+                'range': self.range_key,
+                'total_sales': self.total_sales,
+                'total_orders': self.total_orders,
+                'best_sellers': [{'name': name, 'total': total} for name, total in best_sellers],
+                'staff_performance': [{'name': name, 'order_count': count} for name, count in staff_performance],
+                'staff_on_duty_count': len(staff_performance),
+                'recent_orders': [dict(order) for order in self.recent_orders],
+                'sales_trend_labels': days,
+                'sales_trend_values': [self.daily_sales[day] for day in days],
+            }
+        return dict(self._data, low_stock=low_stock)
+
+
+class DashboardSnapshots:
+    """In-memory dashboard snapshots, one per date range key.
+
+    A snapshot is built on first use and then updated from committed order
+    creations and status changes in this process, so rendering the dashboard
+    needs no queries. Snapshots are rebuilt when their range moves (a new day)
+    or after `ttl_seconds`, which picks up writes from other processes and bulk
+    imports.
+
+    Builds run outside the lock, so commits are never held up by them. Changes
+    committed meanwhile are logged with a version stamp and replayed onto the
+    new snapshot before it is swapped in, skipping orders its reads already
+    counted.
+    """
+
+    def __init__(self, ttl_seconds=60):
+        self.ttl = ttl_seconds
+        self._snapshots = {}
+        self._low_stock = None
+        self._version = 0 # Bumped by every apply()
+        self._inventory_version = 0 # Version of the last apply() that may have moved stock
+        self._building = 0
+        self._log = [] # (version, created, status changes) applied while a build is running
+        self._lock = threading.Lock()
+        _services.add(self)
+
+    def get(self, range_key, start_date, end_date):
+        """Returns the dashboard data for the range as a JSON-ready dict."""
+        with self._lock:
+            snapshot = self._snapshots.get(range_key)
+            if snapshot is None or (snapshot.start_date, snapshot.end_date) != (start_date, end_date) \
+                    or time.time() - snapshot.built_at > self.ttl:
+                snapshot = None
+            low_stock, version = self._low_stock, self._version
+        if snapshot is None:
+            snapshot = self._build(range_key, start_date, end_date)
+            low_stock = None # Re-read along with the new snapshot
+        if low_stock is None:
+            low_stock = low_stock_data()
+            with self._lock:
+                if self._inventory_version <= version:
+                    self._low_stock = low_stock
+        with self._lock:
+            return snapshot.data(low_stock)
+
+    def _build(self, range_key, start_date, end_date):
+        with self._lock:
+            started = self._version
+            self._building += 1
+        snapshot = None
+        try:
+            for _ in range(BUILD_ATTEMPTS):
+                snapshot = RangeSnapshot(range_key, start_date, end_date)
+                if snapshot.consistent:
+                    break
+        finally:
+            with self._lock:
+                self._building -= 1
+                if snapshot is not None:
+                    for version, created, status_changes in self._log:
+                        if version > started:
+                            self._apply_to(snapshot, [entry for entry in created if entry[0]['data']['id'] > snapshot.last_order_id],
+                                           status_changes)
+                    self._snapshots[range_key] = snapshot
+                if not self._building:
+                    self._log.clear()
+        return snapshot
+
+    def apply(self, created, status_changes, inventory_changed):
+        with self._lock:
+            self._version += 1
+            if self._building:
+                self._log.append((self._version, created, status_changes))
+            for snapshot in self._snapshots.values():
+                self._apply_to(snapshot, created, status_changes)
+            if inventory_changed:
+                self._low_stock = None # Re-read on the next view
+                self._inventory_version = self._version
+
+    @staticmethod
+    def _apply_to(snapshot, created, status_changes):
+        for order, staff_name, items in created:
+            if snapshot.covers(order['created_at_value']):
+                snapshot.add_order(order['data'], staff_name, items)
+        for order_id, status in status_changes:
+            snapshot.set_status(order_id, status)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._low_stock = None
+
+
+_snapshots_lock = threading.Lock()
+
+
+def get_dashboard_snapshots(app):
+    """Returns the app's dashboard snapshots, creating them on first use."""
+    with _snapshots_lock:
+        snapshots = app.extensions.get('dashboard_snapshots')
+        if snapshots is None:
+            snapshots = DashboardSnapshots(ttl_seconds=app.config.get('DASHBOARD_SNAPSHOT_TTL_SECONDS', 60))
+            app.extensions['dashboard_snapshots'] = snapshots
+        return snapshots
+
+
+# New orders and status changes are collected at flush time, their items and staff names are read
+# just before commit (items are bulk-inserted after the order row) and applied once committed
+@event.listens_for(Session, 'after_flush')
+def _collect_dashboard_changes(session, flush_context):
+    if not _services:
+        return
+    changes = session.info.setdefault('dashboard', {'created': [], 'orders': [], 'status': [], 'inventory': False})
+    for obj in session.new:
+        if isinstance(obj, Order):
+            changes['created'].append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Order) and inspect(obj).attrs.status.history.has_changes():
+            changes['status'].append((obj.id, obj.status))
+    if any(isinstance(obj, INVENTORY_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        changes['inventory'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _resolve_dashboard_changes(session):
+    changes = session.info.get('dashboard')
+    if not changes or not changes['created']:
+        return
+    session.flush()
+    orders = {order.id: order for order in changes.pop('created')}
+    changes['created'] = []
+    items = {}
+    rows = session.query(OrderItem.order_id, Product.name, func.sum(OrderItem.quantity))\
+        .join(Product, Product.id == OrderItem.product_id)\
+        .filter(OrderItem.order_id.in_(orders))\
+        .group_by(OrderItem.order_id, Product.name).all()
+    for order_id, name, quantity in rows:
+        items.setdefault(order_id, []).append((name, quantity))
+    staff_names = dict(session.query(User.id, User.name).filter(User.id.in_({o.user_id for o in orders.values()})).all())
+    changes['orders'] += [
+        ({'created_at_value': order.created_at,
+          'data': recent_order_data(order.id, order.order_number, order.created_at, order.order_type, order.status, order.total_amount)},
+         staff_names.get(order.user_id), items.get(order.id, []))
+        for order in orders.values()
+    ]
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_dashboard_changes(session):
+    if session.in_nested_transaction():
+        return # A savepoint: applied with the real commit
+    changes = session.info.pop('dashboard', None)
+    if not changes:
+        return
+    for service in list(_services):
+        service.apply(changes['orders'], changes['status'], changes['inventory'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_dashboard_changes(session):
+    if not session.in_nested_transaction():
+        session.info.pop('dashboard', None)
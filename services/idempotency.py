@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class _Entry:
+    __slots__ = ('result', 'expires', 'done')
+
+    def __init__(self):
+        self.result = None
+        self.expires = None
+        self.done = threading.Event()
+
+
+class IdempotencyIndex:
+    """In-memory map of idempotency key -> (payload, status) with TTL eviction.
+
+    The first request with a key runs the work; concurrent retries wait for it
+    and later retries get the stored result. Only successful (2xx) results are
+    kept, so a retry after a rejection (e.g. out of stock, since restocked) or
+    a server error runs the work again.
+    """
+
+    def __init__(self, ttl_seconds=600, max_keys=10000, wait_timeout=30):
+        self.ttl = ttl_seconds
+        self.max_keys = max_keys
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key, work):
+        """Returns the stored result for `key`, or calls `work()` and stores its (payload, status)."""
+        while True:
+            with self._lock:
+                self._evict()
+                entry = self._entries.get(key)
+                owner = entry is None
+                if owner:
+                    entry = self._entries[key] = _Entry()
+            if owner:
+                break
+            if not entry.done.wait(self.wait_timeout):
+                return {'success': False, 'message': 'An order with this idempotency key is still being processed.'}, 409
+            if entry.result is not None:
+                return entry.result
+            # The first attempt failed without a result worth keeping, try again
+
+        try:
+            result = work()
+        except BaseException:
+            self._discard(key, entry)
+            raise
+        if 200 <= result[1] < 300:
+            with self._lock:
+                entry.result = result
+                entry.expires = time.monotonic() + self.ttl
+            entry.done.set()
+        else:
+            self._discard(key, entry)
+        return result
+
+    def _discard(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def _evict(self):
+        # Entries are kept in claim order, so the first to expire sit at the front
+        now = time.monotonic()
+        stale = []
+        for key, entry in self._entries.items():
+            if entry.expires is None:
+                continue # Still in flight
+            if entry.expires > now and len(self._entries) - len(stale) <= self.max_keys:
+                break
+            stale.append(key)
+        for key in stale:
+            del self._entries[key]
+
+
+_index_lock = threading.Lock()
+
+
+def get_idempotency_index(app):
+    """Returns the app's idempotency index, creating it on first use."""
+    with _index_lock:
+        index = app.extensions.get('idempotency_index')
+        if index is None:
+            index = IdempotencyIndex(
+                ttl_seconds=app.config.get('IDEMPOTENCY_TTL_SECONDS', 600),
+                max_keys=app.config.get('IDEMPOTENCY_MAX_KEYS', 10000)
+            )
+            app.extensions['idempotency_index'] = index
+        return index
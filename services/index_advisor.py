@@ -0,0 +1,92 @@
+from extensions import db
+from models import (Order, OrderItem, OrderStatusEvent, User, Customer, Ingredient, InventoryLog, InventoryOutbox,
+                    SalesRollup, ProductSalesRollup, RecipeVersion)
+from sqlalchemy import select, func
+from datetime import datetime, timedelta
+
+
+def _hot_queries():
+    """(name, statement, tables allowed to be scanned) for the queries the app runs most.
+
+    Parameter values are placeholders; only the shape of each query matters for its plan.
+    """
+    now = datetime.utcnow()
+    start, end = now - timedelta(days=30), now
+    return [
+        ('orders list (newest first)',
+         select(Order, User.name, Customer.name).join(User, Order.user_id == User.id)
+         .outerjoin(Customer, Order.customer_id == Customer.id).order_by(Order.created_at.desc()).limit(15), ()),
+        ('orders list by status',
+         select(Order).where(Order.status == 'pending').order_by(Order.created_at.desc()).limit(15), ()),
+        ('orders list by type',
+         select(Order).where(Order.order_type == 'dine-in').order_by(Order.created_at.desc()).limit(15), ()),
+        ('dashboard recent orders',
+         select(Order.id, Order.order_number).where(Order.created_at >= start, Order.created_at <= end)
+         .order_by(Order.created_at.desc()).limit(5), ()),
+        ('customer order history',
+         select(Order).where(Order.customer_id == 1).order_by(Order.created_at.desc()).limit(10), ()),
+        ('recipe version check (every order)',
+         select(RecipeVersion.version).where(RecipeVersion.id == 1), ()),
+        ('order lines of an order',
+         select(OrderItem).where(OrderItem.order_id == 1), ()),
+        ('order lines of a batch of orders',
+         select(OrderItem.order_id, OrderItem.product_id, func.sum(OrderItem.quantity))
+         .where(OrderItem.order_id.in_([1, 2, 3])).group_by(OrderItem.order_id, OrderItem.product_id), ()),
+        ('kitchen queue',
+         select(Order).where(Order.status.in_(['pending', 'in-progress'])).order_by(Order.created_at), ()),
+        ('report scan (completed orders in range)',
+         select(Order.id, OrderItem.product_id).outerjoin(OrderItem, OrderItem.order_id == Order.id)
+         .where(Order.created_at >= start, Order.created_at <= end, Order.status == 'completed').order_by(Order.id), ()),
+        ('order line export',
+         select(Order.order_number, OrderItem.quantity).join(OrderItem, OrderItem.order_id == Order.id)
+         .where(Order.created_at >= start, Order.created_at <= end).order_by(Order.created_at, Order.id, OrderItem.id), ()),
+        ('sales rollup range',
+         select(SalesRollup.hour, func.sum(SalesRollup.total_sales)).where(SalesRollup.hour >= start, SalesRollup.hour <= end)
+         .group_by(SalesRollup.hour), ()),
+        ('product rollup range',
+         select(ProductSalesRollup.product_id, func.sum(ProductSalesRollup.quantity))
+         .where(ProductSalesRollup.hour >= start, ProductSalesRollup.hour <= end).group_by(ProductSalesRollup.product_id), ()),
+        ('report cache change check',
+         select(OrderStatusEvent.id).join(Order, Order.id == OrderStatusEvent.order_id)
+         .where(OrderStatusEvent.id > 1, Order.created_at >= start, Order.created_at <= end).limit(1), ()),
+        ('inventory recent movements',
+         select(InventoryLog).order_by(InventoryLog.timestamp.desc()).limit(20), ()),
+        ('ingredient history',
+         select(InventoryLog).where(InventoryLog.ingredient_id == 1).order_by(InventoryLog.timestamp.desc()).limit(50), ()),
+        ('inventory outbox due entries',
+         select(InventoryOutbox).where(InventoryOutbox.status == 'pending', InventoryOutbox.next_attempt_at <= now)
+         .order_by(InventoryOutbox.id).limit(100), ()),
+        # Compares two columns of the same row, which no index can answer; the ingredient list is small
+        ('low stock ingredients',
+         select(Ingredient).where(Ingredient.quantity <= Ingredient.threshold).order_by(Ingredient.name), ('ingredient',)),
+    ]
+
+
+def explain(statement):
+    """Returns the SQLite EXPLAIN QUERY PLAN detail lines for a statement."""
+    connection = db.session.connection()
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(value.isoformat(' ') if isinstance(value, datetime) else value
+                   for value in (compiled.params[name] for name in compiled.positiontup))
+    return [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params)]
+
+
+def full_scans(plan, allowed=()):
+    """Tables read with a full table scan in a plan ('SCAN t', not 'SCAN t USING INDEX ...')."""
+    scans = []
+    for detail in plan:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == 'SCAN' and 'USING' not in words:
+            table = words[1].strip('"')
+            if table not in allowed:
+                scans.append(table)
+    return scans
+
+
+def advise():
+    """Explains every hot query; returns [(name, plan lines, scanned tables)]."""
+    if db.session.connection().dialect.name != 'sqlite':
+        raise RuntimeError('The index advisor reads SQLite query plans; point DATABASE_URL at a SQLite copy of the schema.')
+    return [(name, plan, full_scans(plan, allowed))
+            for name, statement, allowed in _hot_queries()
+            for plan in [explain(statement)]]
@@ -0,0 +1,203 @@
+from extensions import db
+from models import OrderItem, Ingredient, InventoryLog, InventoryOutbox
+from .order_placement import load_products, reserve_stock, InsufficientStockError
+from .recipe_cache import get_recipe_matrix
+from flask import current_app, has_app_context
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+import threading
+
+# Orders still pending deduction this long after checkout show up in the reconciliation report
+OVERDUE_AFTER = timedelta(minutes=5)
+
+
+def order_usage(order):
+    """Returns (deductions, totals) for an order's items, as place_order builds them."""
+    lines = db.session.query(OrderItem.product_id, OrderItem.quantity).filter_by(order_id=order.id).all()
+    products = load_products({product_id for product_id, _ in lines})
+    recipes = get_recipe_matrix()
+    deductions = []
+    for product_id, quantity in lines:
+        for ingredient_id, quantity_needed in recipes.line_requirements(product_id):
+            deductions.append((ingredient_id, quantity_needed * quantity, products[product_id]))
+    return deductions, recipes.requirements(lines)
+
+
+def deduct_order(order):
+    """Deducts an order's ingredients and writes its usage logs in the current transaction."""
+    deductions, totals = order_usage(order)
+    reserve_stock(deductions, totals)
+    if deductions:
+        db.session.execute(insert(InventoryLog), [{
+            'ingredient_id': ingredient_id,
+            'quantity_change': -quantity,
+            'reason': 'order_usage',
+            'user_id': order.user_id,
+            'order_id': order.id,
+            'timestamp': order.created_at
+        } for ingredient_id, quantity, _ in deductions])
+
+
+def _finish(entry_id, **values):
+    """Moves a pending entry on; returns False if another worker already did."""
+    stmt = update(InventoryOutbox)\
+        .where(InventoryOutbox.id == entry_id, InventoryOutbox.status == 'pending')\
+        .values(**values)\
+        .execution_options(synchronize_session=False)
+    return db.session.execute(stmt).rowcount == 1
+
+
+def process_entry(entry, max_attempts=5):
+    """Applies one outbox entry and returns its new status ('done', 'pending', 'failed' or None if taken)."""
+    now = datetime.utcnow()
+    entry_id, attempts = entry.id, entry.attempts + 1
+    try:
+        deduct_order(entry.order)
+        # Deduction and the status change commit together, so an order is deducted exactly once
+        if not _finish(entry_id, status='done', attempts=attempts, last_error=None, processed_at=now):
+            db.session.rollback()
+            return None
+        db.session.commit()
+        return 'done'
+    except InsufficientStockError as e:
+        # Retrying cannot help until stock is corrected; leave it for the reconciliation report
+        db.session.rollback()
+        status, error = 'failed', str(e)
+    except Exception as e:
+        db.session.rollback()
+        status = 'failed' if attempts >= max_attempts else 'pending'
+        error = str(e)
+        print(f"Inventory deduction for outbox entry {entry_id} failed (attempt {attempts}): {e}")
+
+    # Back off 2, 4, 8... seconds between retries of a transient failure
+    _finish(entry_id, status=status, attempts=attempts, last_error=error[:1000],
+            next_attempt_at=now + timedelta(seconds=2 ** attempts))
+    db.session.commit()
+    return status
+
+
+def process_pending(max_attempts=5, limit=100):
+    """Processes up to `limit` due entries, oldest first. Returns {status: count}."""
+    entries = InventoryOutbox.query.options(db.joinedload(InventoryOutbox.order))\
+        .filter(InventoryOutbox.status == 'pending', InventoryOutbox.next_attempt_at <= datetime.utcnow())\
+        .order_by(InventoryOutbox.id).limit(limit).all()
+    outcome = {}
+    for entry in entries:
+        status = process_entry(entry, max_attempts)
+        if status:
+            outcome[status] = outcome.get(status, 0) + 1
+    return outcome
+
+
+def retry_failed(order_ids=None):
+    """Puts failed entries (optionally only for the given orders) back in the queue. Returns how many."""
+    stmt = update(InventoryOutbox)\
+        .where(InventoryOutbox.status == 'failed')\
+        .values(status='pending', attempts=0, next_attempt_at=datetime.utcnow())\
+        .execution_options(synchronize_session=False)
+    if order_ids:
+        stmt = stmt.where(InventoryOutbox.order_id.in_(order_ids))
+    count = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return count
+
+
+def reconciliation_report():
+    """Failed and overdue deductions, with the ingredients each order is still short of."""
+    counts = dict(db.session.query(InventoryOutbox.status, db.func.count(InventoryOutbox.id))
+                  .group_by(InventoryOutbox.status).all())
+    overdue = datetime.utcnow() - OVERDUE_AFTER
+    entries = InventoryOutbox.query.options(db.joinedload(InventoryOutbox.order))\
+        .filter(db.or_(InventoryOutbox.status == 'failed',
+                       db.and_(InventoryOutbox.status == 'pending', InventoryOutbox.created_at <= overdue)))\
+        .order_by(InventoryOutbox.id).all()
+
+    stock = dict(db.session.query(Ingredient.id, Ingredient.quantity).all())
+    names = dict(db.session.query(Ingredient.id, Ingredient.name).all())
+    rows = []
+    for entry in entries:
+        _, totals = order_usage(entry.order)
+        rows.append({
+            'order_id': entry.order_id,
+            'order_number': entry.order.order_number,
+            'order_status': entry.order.status,
+            'created_at': entry.created_at.isoformat(),
+            'status': entry.status,
+            'attempts': entry.attempts,
+            'last_error': entry.last_error,
+            'shortages': [{'ingredient': names[i], 'needed': needed, 'in_stock': stock.get(i, 0)}
+                          for i, needed in totals.items() if stock.get(i, 0) < needed]
+        })
+    return {'counts': counts, 'entries': rows}
+
+
+class InventoryOutboxWorker:
+    """Background thread that drains the inventory outbox.
+
+    It wakes up when an order with an outbox entry is committed, and polls every
+    `poll_seconds` so retries and entries left over from a restart are picked up.
+    """
+
+    def __init__(self, app, poll_seconds=5, max_attempts=5):
+        self.app = app
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='inventory-outbox', daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    while process_pending(self.max_attempts):
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Inventory outbox worker error: {e}")
+                finally:
+                    db.session.remove()
+
+
+_worker_lock = threading.Lock()
+
+
+def get_inventory_worker(app):
+    """Returns the app's outbox worker, starting its thread on first use."""
+    with _worker_lock:
+        worker = app.extensions.get('inventory_outbox')
+        if worker is None:
+            worker = InventoryOutboxWorker(
+                app,
+                poll_seconds=app.config.get('INVENTORY_OUTBOX_POLL_SECONDS', 5),
+                max_attempts=app.config.get('INVENTORY_OUTBOX_MAX_ATTEMPTS', 5)
+            )
+            app.extensions['inventory_outbox'] = worker
+        return worker
+
+
+# Wake the worker once a transaction that queued deductions has committed
+@event.listens_for(Session, 'after_flush')
+def _collect_outbox_entries(session, flush_context):
+    if any(isinstance(obj, InventoryOutbox) for obj in session.new):
+        session.info['inventory_outbox'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_outbox_worker(session):
+    if session.in_nested_transaction():
+        return
+    if session.info.pop('inventory_outbox', False) and has_app_context():
+        get_inventory_worker(current_app._get_current_object()).notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_outbox_entries(session):
+    if not session.in_nested_transaction():
+        session.info.pop('inventory_outbox', None)
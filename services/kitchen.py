@@ -0,0 +1,143 @@
+from extensions import db
+from models import Order, OrderItem, TicketTimeBucket, KitchenThroughput
+from .upsert import increment_rows
+from sqlalchemy import event, inspect, func
+from sqlalchemy.orm import Session
+from datetime import datetime
+import math
+
+OPEN_STATUSES = ('pending', 'in-progress')
+WINDOW_MINUTES = 15
+# Ticket time buckets grow by 5% each, so any reported percentile is within 5% of the true value
+GAMMA = 1.05
+
+
+def bucket_for(seconds):
+    """Log-scaled histogram bucket for a ticket time; bucket 0 holds everything under a second."""
+    if seconds < 1:
+        return 0
+    return 1 + int(math.log(seconds) / math.log(GAMMA))
+
+
+def bucket_value(bucket):
+    """Representative ticket time (seconds) for a bucket: the geometric middle of its range."""
+    if bucket == 0:
+        return 0.5
+    return GAMMA ** (bucket - 1) * math.sqrt(GAMMA)
+
+
+def window_start(moment):
+    return moment.replace(minute=moment.minute - moment.minute % WINDOW_MINUTES, second=0, microsecond=0)
+
+
+def open_tickets():
+    """Pending / in-progress orders oldest first, with items loaded (uses ix_order_status_created_at)."""
+    return Order.query.options(db.joinedload(Order.items).joinedload(OrderItem.product))\
+        .filter(Order.status.in_(OPEN_STATUSES))\
+        .order_by(Order.created_at, Order.id).all()
+
+
+def ticket_data(order, now=None):
+    now = now or datetime.utcnow()
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'order_type': order.order_type,
+        'status': order.status,
+        'created_at': order.created_at.isoformat(),
+        'age_seconds': int((now - order.created_at).total_seconds()),
+        'items': [{'name': item.product.name, 'quantity': item.quantity, 'notes': item.notes} for item in order.items]
+    }
+
+
+def ticket_time_percentiles(start_day, end_day, percentiles=(50, 90, 99)):
+    """Returns ({'p50': seconds, ...}, completed count) for orders completed between the two days."""
+    rows = db.session.query(TicketTimeBucket.bucket, func.sum(TicketTimeBucket.count))\
+        .filter(TicketTimeBucket.day >= start_day, TicketTimeBucket.day <= end_day)\
+        .group_by(TicketTimeBucket.bucket)\
+        .order_by(TicketTimeBucket.bucket).all()
+    total = sum(count for _, count in rows)
+    result = {f'p{p}': None for p in percentiles}
+    if total <= 0:
+        return result, 0
+    for p in percentiles:
+        rank = math.ceil(total * p / 100)
+        seen = 0
+        for bucket, count in rows:
+            seen += count
+            if seen >= rank:
+                result[f'p{p}'] = round(bucket_value(bucket), 1)
+                break
+    return result, total
+
+
+def completed_per_window(start, end):
+    """Returns [{'window_start', 'completed'}] for the 15-minute windows between start and end with completions.
+
+    Empty windows are left out (a year has ~35k windows, most of them closed
+    hours); clients fill the gaps with zeros.
+    """
+    rows = db.session.query(KitchenThroughput.window_start, KitchenThroughput.completed)\
+        .filter(KitchenThroughput.window_start >= window_start(start), KitchenThroughput.window_start <= end,
+                KitchenThroughput.completed != 0)\
+        .order_by(KitchenThroughput.window_start).all()
+    return [{'window_start': start_at.isoformat(), 'completed': completed} for start_at, completed in rows]
+
+
+def completion_deltas(created_at, completed_at, sign):
+    """Histogram and throughput rows that add (sign=1) or remove (sign=-1) one completion."""
+    seconds = max((completed_at - created_at).total_seconds(), 0)
+    return (
+        {'day': completed_at.date(), 'bucket': bucket_for(seconds), 'count': sign},
+        {'window_start': window_start(completed_at), 'completed': sign}
+    )
+
+
+def _sum_rows(rows, key_columns, counter):
+    totals = {}
+    for row in rows:
+        key = tuple(row[c] for c in key_columns)
+        totals[key] = totals.get(key, 0) + row[counter]
+    return [dict(zip(key_columns, key), **{counter: total}) for key, total in totals.items() if total]
+
+
+def apply_completions(connection, changes):
+    """Writes a list of completion_deltas() results with one upsert per table."""
+    if changes:
+        increment_rows(connection, TicketTimeBucket, ('day', 'bucket'), _sum_rows([c[0] for c in changes], ('day', 'bucket'), 'count'))
+        increment_rows(connection, KitchenThroughput, ('window_start',), _sum_rows([c[1] for c in changes], ('window_start',), 'completed'))
+
+
+def rebuild_metrics():
+    """Recomputes the histogram and throughput tables from completed orders (one full scan)."""
+    db.session.query(TicketTimeBucket).delete()
+    db.session.query(KitchenThroughput).delete()
+    rows = db.session.query(Order.created_at, Order.completed_at)\
+        .filter(Order.status == 'completed', Order.completed_at.isnot(None))\
+        .execution_options(yield_per=5000)
+    changes = [completion_deltas(created_at, completed_at, 1) for created_at, completed_at in rows]
+    apply_completions(db.session.connection(), changes)
+    db.session.commit()
+    return len(changes)
+
+
+# Keep the histogram current: every commit that completes (or un-completes) an order updates it
+@event.listens_for(Session, 'after_flush')
+def _track_completions(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Order) and obj.status == 'completed' and obj.completed_at and obj.created_at:
+            changes.append(completion_deltas(obj.created_at, obj.completed_at, 1))
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        status = inspect(obj).attrs.status.history
+        if not status.has_changes():
+            continue
+        completed_at = inspect(obj).attrs.completed_at.history
+        old_completed_at = completed_at.deleted[0] if completed_at.deleted else (completed_at.unchanged[0] if completed_at.unchanged else None)
+        if status.deleted and status.deleted[0] == 'completed' and old_completed_at:
+            changes.append(completion_deltas(obj.created_at, old_completed_at, -1))
+        if obj.status == 'completed' and obj.completed_at:
+            changes.append(completion_deltas(obj.created_at, obj.completed_at, 1))
+    apply_completions(session.connection(), changes)
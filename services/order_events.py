@@ -0,0 +1,122 @@
+from models import Order
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from collections import deque
+import itertools
+import json
+import threading
+import uuid
+
+
+class OrderEventBroker:
+    """In-process pub/sub for order events with a ring buffer of recent events.
+
+    Every event gets an increasing id, so a client that reconnects with its
+    last seen id receives what it missed as long as it is still buffered.
+    Ids sent to clients are prefixed with a per-process boot epoch
+    ('<epoch>-<n>'): an id from before a restart or from another worker does
+    not match, and the client is told to reset instead of waiting for this
+    process's counter to catch up with it.
+    """
+
+    def __init__(self, buffer_size=1000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+
+    def publish(self, event_type, data):
+        with self._condition:
+            event_id = next(self._ids)
+            self._events.append((event_id, event_type, data))
+            self._condition.notify_all()
+        return event_id
+
+    @property
+    def last_id(self):
+        with self._condition:
+            return self._events[-1][0] if self._events else 0
+
+    def events_since(self, last_id):
+        """Returns (events after last_id, whether some were already dropped from the buffer)."""
+        with self._condition:
+            missed = bool(self._events) and last_id < self._events[0][0] - 1
+            return [e for e in self._events if e[0] > last_id], missed
+
+    def wait(self, last_id, timeout):
+        """Blocks until there is an event after last_id or the timeout passes."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._events and self._events[-1][0] > last_id, timeout)
+        return self.events_since(last_id)
+
+    def event_id(self, number):
+        return f'{self.epoch}-{number}'
+
+    def parse_event_id(self, value):
+        """The event number of a client's Last-Event-ID, or None if this process did not issue it."""
+        epoch, _, number = (value or '').partition('-')
+        if epoch != self.epoch or not number.isdigit() or int(number) > self.last_id:
+            return None
+        return int(number)
+
+    def stream(self, last_event_id=None, heartbeat=15):
+        """Yields Server-Sent Events text, starting after the client's Last-Event-ID (or from now)."""
+        last_id = self.parse_event_id(last_event_id)
+        if last_id is None:
+            last_id = self.last_id
+            if last_event_id:
+                # Issued before a restart or by another worker: the events in between are unknown here
+                yield f'id: {self.event_id(last_id)}\nevent: reset\ndata: {{}}\n\n'
+        while True:
+            events, missed = self.wait(last_id, heartbeat)
+            if missed:
+                # Client was away too long; tell it to reload instead of replaying a partial history
+                yield 'event: reset\ndata: {}\n\n'
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event_id, event_type, data in events:
+                yield f'id: {self.event_id(event_id)}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+                last_id = event_id
+
+
+broker = OrderEventBroker()
+
+
+def order_event_data(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'order_type': order.order_type
+    }
+
+
+# Collect order changes at flush time and publish them only once the transaction commits
+@event.listens_for(Session, 'after_flush')
+def _collect_order_events(session, flush_context):
+    pending = session.info.setdefault('order_events', [])
+    for obj in session.new:
+        if isinstance(obj, Order):
+            pending.append(('order_created', order_event_data(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            history = inspect(obj).attrs.status.history
+            if history.has_changes():
+                data = order_event_data(obj)
+                data['previous_status'] = history.deleted[0] if history.deleted else None
+                pending.append(('status_changed', data))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_order_events(session):
+    if session.in_nested_transaction():
+        return # Published once the whole transaction commits
+    for event_type, data in session.info.pop('order_events', []):
+        broker.publish(event_type, data)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_order_events(session):
+    if not session.in_nested_transaction():
+        session.info.pop('order_events', None)
@@ -0,0 +1,95 @@
+from extensions import db
+from .order_placement import place_order
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+
+class OrderIngestQueue:
+    """Single writer thread that commits queued orders in small group-commit batches.
+
+    Each commit (and its fsync) is shared by up to `batch_size` orders; a batch
+    is closed early once the oldest order has waited `max_latency_ms`.
+    Callers get a Future per order that resolves to the order number or raises
+    the same ValueError the direct checkout path would have.
+    """
+
+    def __init__(self, app, batch_size=20, max_latency_ms=5):
+        self.app = app
+        self.batch_size = max(1, int(batch_size))
+        self.max_latency = max_latency_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='order-ingest', daemon=True)
+        self._thread.start()
+
+    def submit(self, order_data, user_id):
+        future = Future()
+        self._queue.put((order_data, user_id, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            with self.app.app_context():
+                try:
+                    self._commit_batch(batch)
+                finally:
+                    db.session.remove()
+
+    def _commit_batch(self, batch):
+        placed = []
+        try:
+            for order_data, user_id, future in batch:
+                try:
+                    order = place_order(order_data, user_id)
+                except ValueError as e:
+                    # Rejected orders leave nothing behind, the rest of the batch carries on
+                    future.set_exception(e)
+                    continue
+                placed.append((future, order.order_number))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Group commit failed, retrying {len(batch)} orders one by one: {e}")
+            self._commit_individually([entry for entry in batch if not entry[2].done()])
+            return
+
+        for future, order_number in placed:
+            future.set_result(order_number)
+
+    def _commit_individually(self, batch):
+        for order_data, user_id, future in batch:
+            try:
+                order = place_order(order_data, user_id)
+                db.session.commit()
+                future.set_result(order.order_number)
+            except Exception as e:
+                db.session.rollback()
+                future.set_exception(e)
+
+
+_lock = threading.Lock()
+
+
+def get_ingest_queue(app):
+    """Returns the app's ingest queue, starting its writer thread on first use."""
+    with _lock:
+        ingest = app.extensions.get('order_ingest')
+        if ingest is None:
+            ingest = OrderIngestQueue(
+                app,
+                batch_size=app.config.get('ORDER_INGEST_BATCH_SIZE', 20),
+                max_latency_ms=app.config.get('ORDER_INGEST_MAX_LATENCY_MS', 5)
+            )
+            app.extensions['order_ingest'] = ingest
+        return ingest
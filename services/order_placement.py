@@ -0,0 +1,253 @@
+from extensions import db, begin_savepoint
+from models import Product, Order, OrderItem, Ingredient, InventoryLog, InventoryOutbox
+from .recipe_cache import get_recipe_matrix
+from flask import current_app
+from datetime import datetime
+from sqlalchemy import insert, update, case
+from sqlalchemy.exc import SQLAlchemyError
+import uuid
+
+
+ORDER_FIELDS = ('orderType', 'paymentMethod', 'items', 'subtotal', 'tax', 'totalAmount')
+
+
+class InsufficientStockError(ValueError):
+    """Raised when an order needs more of an ingredient than is in stock."""
+
+
+def generate_order_number():
+    return f"ORD-{datetime.now().strftime('%y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+
+def load_products(product_ids):
+    """Returns {product_id: Product} for the given ids in one query."""
+    if not product_ids:
+        return {}
+    return {p.id: p for p in Product.query.filter(Product.id.in_(product_ids)).all()}
+
+
+def place_order(order_data, user_id, products=None):
+    """Creates an order with its items and deducts ingredients using a fixed number of queries.
+
+    Products for the whole cart are loaded in one query (or taken from
+    `products` when the caller already has them), recipes come from the
+    cached recipe matrix, and order items / inventory logs are inserted in bulk,
+    so the cost of a checkout does not grow with the number of cart lines.
+    The caller owns the transaction: nothing is committed here. Validation and
+    stock errors (ValueError) are raised before anything is left written, so
+    callers batching several orders in one transaction can simply skip them.
+    """
+    missing = [field for field in ORDER_FIELDS if field not in order_data]
+    if missing:
+        raise ValueError(f"Missing order fields: {', '.join(missing)}.")
+    items = order_data['items']
+    if not items or any('productId' not in item or 'quantity' not in item or 'price' not in item for item in items):
+        raise ValueError('Order items need a productId, quantity and price.')
+
+    created_at = datetime.utcnow()
+    if order_data.get('createdAt'):
+        # Orders queued offline keep the time they were taken at the counter
+        try:
+            created_at = datetime.fromisoformat(order_data['createdAt'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid createdAt: {order_data['createdAt']}.")
+
+    # 1 query: every product in the cart
+    if products is None:
+        products = load_products({int(item['productId']) for item in items})
+    for item in items:
+        if int(item['productId']) not in products:
+            raise ValueError(f"Product ID {item['productId']} not found.")
+
+    # In outbox mode the deduction is left to the background worker (services/inventory_outbox.py)
+    deduct_later = current_app.config.get('INVENTORY_DEDUCTION_MODE', 'inline') == 'outbox'
+    deductions = [] # (ingredient_id, quantity, product) - one per recipe row per line, in cart order
+    totals = {}
+    if not deduct_later:
+        # Recipes come from the precompiled matrix, so no per-checkout recipe queries
+        recipes = get_recipe_matrix()
+        for item in items:
+            product = products[int(item['productId'])]
+            for ingredient_id, quantity_needed in recipes.line_requirements(int(item['productId'])):
+                deductions.append((ingredient_id, quantity_needed * item['quantity'], product))
+        totals = recipes.requirements((int(item['productId']), item['quantity']) for item in items)
+
+    order = Order(
+        order_number=generate_order_number(),
+        order_type=order_data['orderType'],
+        status='pending', # Start as pending
+        user_id=user_id,
+        created_at=created_at,
+        subtotal=order_data['subtotal'],
+        tax=order_data['tax'],
+        total_amount=order_data['totalAmount'],
+        payment_method=order_data['paymentMethod'],
+        customer_id=order_data.get('customerId'), # Optional customer ID
+        idempotency_key=order_data.get('idempotencyKey') # Optional, set when the terminal sends one
+    )
+
+    if not deduct_later:
+        if current_app.config.get('STOCK_RESERVATION_MODE', 'atomic') == 'atomic':
+            reserve_stock(deductions, totals)
+        else:
+            deduct_stock_in_session(deductions, totals)
+
+    db.session.add(order)
+    db.session.flush()  # Get the order ID for the bulk inserts
+
+    # Bulk inserts: one executemany per table regardless of cart size
+    db.session.execute(insert(OrderItem), [{
+        'order_id': order.id,
+        'product_id': int(item['productId']),
+        'quantity': item['quantity'],
+        'price': item['price'], # Price at time of order
+        'notes': item.get('notes', '')
+    } for item in items])
+
+    if deduct_later:
+        db.session.add(InventoryOutbox(order_id=order.id))
+    elif deductions:
+        db.session.execute(insert(InventoryLog), [{
+            'ingredient_id': ingredient_id,
+            'quantity_change': -quantity,
+            'reason': 'order_usage',
+            'user_id': user_id,
+            'order_id': order.id,
+            'timestamp': created_at
+        } for ingredient_id, quantity, _ in deductions])
+
+    return order
+
+
+def sync_orders(orders, user_id, commit_every=100):
+    """Places a terminal's queued offline orders in order and returns one outcome per order.
+
+    Products for the whole batch and already-synced idempotency keys are looked
+    up once, and orders are committed in chunks of `commit_every`. Each order
+    is placed in its own savepoint, so a database error on one order is
+    reported for that order and the rest of the chunk is still committed.
+    Outcome statuses: accepted, duplicate, insufficient_stock, invalid, error.
+    """
+    keys = [o.get('idempotencyKey') for o in orders if o.get('idempotencyKey')]
+    synced = dict(db.session.query(Order.idempotency_key, Order.order_number)
+                  .filter(Order.idempotency_key.in_(keys)).all()) if keys else {}
+    product_ids = set()
+    for o in orders:
+        for item in o.get('items') or []:
+            try:
+                product_ids.add(int(item['productId']))
+            except (KeyError, TypeError, ValueError):
+                pass # Reported as invalid by place_order
+    products = load_products(product_ids)
+
+    results = []
+    pending = [] # Accepted but not yet committed: (result, key)
+    for index, order_data in enumerate(orders):
+        key = order_data.get('idempotencyKey')
+        result = {'index': index, 'idempotencyKey': key}
+        results.append(result)
+        if key and key in synced:
+            result.update(status='duplicate', order_number=synced[key])
+            continue
+        try:
+            with begin_savepoint(db.session):
+                order = place_order(order_data, user_id, products=products)
+        except InsufficientStockError as e:
+            result.update(status='insufficient_stock', message=str(e))
+            continue
+        except (ValueError, TypeError) as e:
+            result.update(status='invalid', message=str(e))
+            continue
+        except SQLAlchemyError as e:
+            print(f"Error placing synced order {index}: {e}")
+            result.update(status='error', message='Could not be saved, please resend.')
+            continue
+        result.update(status='accepted', order_number=order.order_number)
+        pending.append((result, key))
+        if key:
+            synced[key] = order.order_number
+
+        if len(pending) >= commit_every:
+            _commit_synced(pending, synced)
+            pending = []
+    if pending:
+        _commit_synced(pending, synced)
+    return results
+
+
+def _commit_synced(pending, synced):
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error committing synced orders: {e}")
+        # Nothing in this chunk was saved; the terminal resends them and the keys keep it safe
+        for result, key in pending:
+            result.update(status='error', message='Could not be saved, please resend.')
+            result.pop('order_number', None)
+            synced.pop(key, None)
+
+
+def deduct_stock_in_session(deductions, totals):
+    """Checks stock against the loaded ingredient rows and deducts it in Python.
+
+    Only safe when checkouts are serialized: two workers reading the same
+    quantity will each write back their own result (lost update).
+    """
+    ingredients = {ing.id: ing for ing in Ingredient.query.filter(Ingredient.id.in_(totals)).all()} if totals else {}
+    remaining = {ing_id: ing.quantity for ing_id, ing in ingredients.items()}
+    for ingredient_id, quantity, product in deductions:
+        if remaining[ingredient_id] < quantity:
+            raise InsufficientStockError(f'Insufficient stock for {ingredients[ingredient_id].name} to make {product.name}.')
+        remaining[ingredient_id] -= quantity
+    for ingredient_id, quantity in remaining.items():
+        ingredients[ingredient_id].quantity = quantity
+
+
+def reserve_stock(deductions, totals):
+    """Deducts every ingredient of the order with one conditional UPDATE.
+
+    Each row is only decremented if enough stock remains, so concurrent
+    checkouts can never oversell. If any ingredient falls short, the rows that
+    were reserved are released again before raising, so a failed order leaves
+    no partial deduction behind in the current transaction.
+    """
+    if not totals:
+        return
+
+    if db.engine.dialect.update_returning:
+        needed = case(totals, value=Ingredient.id)
+        stmt = update(Ingredient)\
+            .where(Ingredient.id.in_(totals), Ingredient.quantity >= needed)\
+            .values(quantity=Ingredient.quantity - needed)\
+            .execution_options(synchronize_session=False)
+        reserved = set(db.session.execute(stmt.returning(Ingredient.id)).scalars())
+    else:
+        # No RETURNING support: one conditional UPDATE per ingredient so each outcome is known
+        reserved = set()
+        for ingredient_id, quantity in totals.items():
+            stmt = update(Ingredient)\
+                .where(Ingredient.id == ingredient_id, Ingredient.quantity >= quantity)\
+                .values(quantity=Ingredient.quantity - quantity)\
+                .execution_options(synchronize_session=False)
+            if db.session.execute(stmt).rowcount == 1:
+                reserved.add(ingredient_id)
+
+    if len(reserved) != len(totals):
+        release_stock({ingredient_id: totals[ingredient_id] for ingredient_id in reserved})
+        # Report the first cart line that could not be covered
+        for ingredient_id, _, product in deductions:
+            if ingredient_id not in reserved:
+                ingredient = db.session.get(Ingredient, ingredient_id)
+                raise InsufficientStockError(f'Insufficient stock for {ingredient.name} to make {product.name}.')
+
+
+def release_stock(quantities):
+    """Gives back stock taken by reserve_stock, {ingredient_id: quantity}."""
+    if not quantities:
+        return
+    returned = case(quantities, value=Ingredient.id)
+    db.session.execute(update(Ingredient)
+        .where(Ingredient.id.in_(quantities))
+        .values(quantity=Ingredient.quantity + returned)
+        .execution_options(synchronize_session=False))
@@ -0,0 +1,87 @@
+from extensions import db
+from models import Order, User, Customer, OrderItem
+from sqlalchemy import text, or_
+import weakref
+
+MIN_TERM_LENGTH = 3 # The trigram index cannot match shorter terms
+# bm25 column weights: order_number, customer_name, customer_phone, notes
+RANK = 'bm25(order_search, 10.0, 4.0, 6.0, 1.0)'
+# Above this many matches (e.g. every order of a regular's phone number) results are newest first:
+# bm25 reads the whole match list for its statistics, which costs ~100 ms per broad term on 1M orders
+MAX_RANKED_MATCHES = 500
+
+
+def search_terms(query):
+    return [term for term in query.split() if len(term) >= MIN_TERM_LENGTH]
+
+
+def match_expression(terms):
+    # Each term as a quoted FTS5 string (a substring match with the trigram tokenizer), all required
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+# Engine -> whether its database has the order_search table, looked up once per engine
+_search_index = weakref.WeakKeyDictionary()
+
+
+def has_search_index():
+    """Whether the database has the order_search FTS table.
+
+    Only SQLite databases built by the migrations have it; one created with
+    db.create_all() does not.
+    """
+    engine = db.session.get_bind()
+    if engine not in _search_index:
+        _search_index[engine] = engine.dialect.name == 'sqlite' and db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_search'"
+        )).first() is not None
+    return _search_index[engine]
+
+
+def matching_order_ids(terms, limit):
+    """Best matching order ids, best first."""
+    if has_search_index():
+        match = match_expression(terms)
+        newest = [row[0] for row in db.session.execute(text(
+            "SELECT rowid FROM order_search WHERE order_search MATCH :match ORDER BY rowid DESC LIMIT :limit"
+        ), {'match': match, 'limit': MAX_RANKED_MATCHES + 1})]
+        if len(newest) > MAX_RANKED_MATCHES:
+            return newest[:limit]
+        rows = db.session.execute(text(
+            f"SELECT rowid FROM order_search WHERE order_search MATCH :match ORDER BY {RANK}, rowid DESC LIMIT :limit"
+        ), {'match': match, 'limit': limit})
+        return [row[0] for row in rows]
+
+    # Without the FTS table (other databases, or a SQLite file made by db.create_all()) fall back to unranked LIKE matching, newest first
+    query = db.session.query(Order.id).outerjoin(Customer, Order.customer_id == Customer.id)
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(or_(
+            Order.order_number.ilike(pattern), Customer.name.ilike(pattern), Customer.phone.ilike(pattern),
+            Order.items.any(OrderItem.notes.ilike(pattern))
+        ))
+    return [order_id for order_id, in query.order_by(Order.created_at.desc()).limit(limit)]
+
+
+def search_orders(query, limit=20):
+    """Orders matching every term of `query` in their number, customer name/phone or item notes."""
+    order_ids = matching_order_ids(search_terms(query), limit)
+    if not order_ids:
+        return []
+    rows = db.session.query(Order, User.name, Customer.name, Customer.phone)\
+        .join(User, Order.user_id == User.id)\
+        .outerjoin(Customer, Order.customer_id == Customer.id)\
+        .filter(Order.id.in_(order_ids)).all()
+    by_id = {order.id: (order, staff_name, customer_name, customer_phone)
+             for order, staff_name, customer_name, customer_phone in rows}
+    return [{
+        'id': order.id,
+        'order_number': order.order_number,
+        'created_at': order.created_at.isoformat(),
+        'order_type': order.order_type,
+        'status': order.status,
+        'total_amount': order.total_amount,
+        'staff_name': staff_name,
+        'customer_name': customer_name,
+        'customer_phone': customer_phone
+    } for order, staff_name, customer_name, customer_phone in (by_id[i] for i in order_ids if i in by_id)]
@@ -0,0 +1,107 @@
+from extensions import db
+from models import ProductIngredient, RecipeVersion
+from .upsert import increment_rows
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import threading
+import numpy as np
+
+
+class RecipeMatrix:
+    """Compiled bill of materials: one row per product, one column per ingredient."""
+
+    def __init__(self, version, product_ids, ingredient_ids, matrix):
+        self.version = version
+        self.product_ids = product_ids
+        self.ingredient_ids = ingredient_ids
+        self.product_index = {pid: i for i, pid in enumerate(product_ids)}
+        self.matrix = matrix
+
+    def line_requirements(self, product_id):
+        """Returns [(ingredient_id, quantity_needed)] for one unit of a product."""
+        row = self.product_index.get(product_id)
+        if row is None:
+            return []
+        cols = np.flatnonzero(self.matrix[row])
+        return [(self.ingredient_ids[c], float(self.matrix[row, c])) for c in cols]
+
+    def requirements(self, cart):
+        """Returns {ingredient_id: total quantity} for an iterable of (product_id, quantity)."""
+        quantities = np.zeros(len(self.product_ids))
+        for product_id, quantity in cart:
+            row = self.product_index.get(product_id)
+            if row is not None:
+                quantities[row] += quantity
+        needed = quantities @ self.matrix
+        return {self.ingredient_ids[c]: float(needed[c]) for c in np.flatnonzero(needed)}
+
+    def makeable_quantities(self, stock):
+        """Returns {product_id: units that can be made} from {ingredient_id: quantity on hand}.
+
+        Products without a recipe are not limited by stock and are left out.
+        """
+        on_hand = np.array([stock.get(ing_id, 0.0) for ing_id in self.ingredient_ids])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_ingredient = np.where(self.matrix > 0, np.floor(on_hand / self.matrix), np.inf)
+        makeable = per_ingredient.min(axis=1) if len(self.ingredient_ids) else np.full(len(self.product_ids), np.inf)
+        return {pid: int(max(m, 0)) for pid, m in zip(self.product_ids, makeable) if np.isfinite(m)}
+
+
+_lock = threading.Lock()
+_compiled = None
+
+
+def recipe_version():
+    """The database's recipe version (one primary key lookup); 0 before any recipe change."""
+    return db.session.query(RecipeVersion.version).filter(RecipeVersion.id == 1).scalar() or 0
+
+
+def compile_recipes(version):
+    rows = db.session.query(
+        ProductIngredient.product_id,
+        ProductIngredient.ingredient_id,
+        ProductIngredient.quantity_needed
+    ).all()
+    product_ids = sorted({r.product_id for r in rows})
+    ingredient_ids = sorted({r.ingredient_id for r in rows})
+    product_index = {pid: i for i, pid in enumerate(product_ids)}
+    ingredient_index = {iid: i for i, iid in enumerate(ingredient_ids)}
+    matrix = np.zeros((len(product_ids), len(ingredient_ids)))
+    for r in rows:
+        matrix[product_index[r.product_id], ingredient_index[r.ingredient_id]] += r.quantity_needed
+    return RecipeMatrix(version, product_ids, ingredient_ids, matrix)
+
+
+def get_recipe_matrix():
+    """Returns the process-wide recipe matrix, compiling it if it is missing or stale.
+
+    Staleness is checked against the database's recipe version on every call,
+    so a recipe edited through another worker process is picked up by the next
+    order here.
+    """
+    global _compiled
+    version = recipe_version()
+    compiled = _compiled
+    if compiled is not None and compiled.version == version:
+        return compiled
+    with _lock:
+        if _compiled is None or _compiled.version != version:
+            _compiled = compile_recipes(version)
+        return _compiled
+
+
+def invalidate_recipes():
+    """Drops this process's matrix so the next lookup recompiles it (e.g. after switching databases)."""
+    global _compiled
+    with _lock:
+        _compiled = None
+
+
+# Recipe rows can change from anywhere (API, seeding, shell); bump the version in the same transaction as the change,
+# so it commits or rolls back with it
+@event.listens_for(Session, 'after_flush')
+def _bump_recipe_version(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ProductIngredient):
+            increment_rows(session.connection(), RecipeVersion, ('id',), [{'id': 1, 'version': 1}])
+            return
@@ -0,0 +1,103 @@
+from extensions import db
+from models import Order, OrderStatusEvent
+from collections import OrderedDict
+from sqlalchemy import func
+import hashlib
+import threading
+
+
+def sales_data_version():
+    """Current (last status event id, last order id).
+
+    Every order creation and status change writes an OrderStatusEvent, and
+    bulk-imported orders get new order ids, so this pair only moves forward
+    when sales data changes - in any process. Both are primary key lookups.
+    """
+    return (db.session.query(func.max(OrderStatusEvent.id)).scalar() or 0,
+            db.session.query(func.max(Order.id)).scalar() or 0)
+
+
+def changed_since(version, start_dt, end_dt):
+    """True if an order created within [start_dt, end_dt] was added or changed status after `version`."""
+    last_event_id, last_order_id = version
+    in_range = (Order.created_at >= start_dt, Order.created_at <= end_dt)
+    event_in_range = db.session.query(OrderStatusEvent.id)\
+        .join(Order, Order.id == OrderStatusEvent.order_id)\
+        .filter(OrderStatusEvent.id > last_event_id, *in_range)
+    order_in_range = db.session.query(Order.id).filter(Order.id > last_order_id, *in_range)
+    return db.session.query(event_in_range.exists()).scalar() or db.session.query(order_in_range.exists()).scalar()
+
+
+class _Entry:
+    __slots__ = ('data', 'etag', 'version')
+
+    def __init__(self, data, etag, version):
+        self.data = data
+        self.etag = etag
+        self.version = version
+
+
+class ReportCache:
+    """LRU cache of report payloads keyed by the normalized (report_type, start, end, ...) key.
+
+    An entry stays valid until a later order creation or status change touches
+    an order inside its range, so closed historical ranges live until they are
+    evicted while ranges that include today follow new sales.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_etag(key, version):
+        return hashlib.sha1(repr((key, version)).encode()).hexdigest()[:20]
+
+    def lookup(self, key, start_dt, end_dt):
+        """Returns the cached (data, etag) if it is still current, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return None
+        if changed_since(entry.version, start_dt, end_dt):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return None
+        return entry.data, entry.etag
+
+    def get_or_build(self, key, start_dt, end_dt, build):
+        """Returns (data, etag), calling build() only when there is no current entry."""
+        cached = self.lookup(key, start_dt, end_dt)
+        if cached is not None:
+            return cached
+        # Read the version before building: a sale landing mid-build invalidates the entry next time
+        version = sales_data_version()
+        data = build()
+        etag = self.make_etag(key, version)
+        with self._lock:
+            self._entries[key] = _Entry(data, etag, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data, etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache_lock = threading.Lock()
+
+
+def get_report_cache(app):
+    """Returns the app's report cache, creating it on first use."""
+    with _cache_lock:
+        cache = app.extensions.get('report_cache')
+        if cache is None:
+            cache = ReportCache(max_entries=app.config.get('REPORT_CACHE_SIZE', 128))
+            app.extensions['report_cache'] = cache
+        return cache
@@ -0,0 +1,128 @@
+from extensions import db
+from flask import Response
+from models import Order, OrderItem, Product, User, Customer
+from sqlalchemy import select, type_coerce
+from datetime import datetime
+import csv
+import io
+import os
+
+# Same layout the legacy sales importer reads, so an export can be imported again
+ORDER_LINE_COLUMNS = ['order_number', 'created_at', 'order_type', 'status', 'payment_method', 'staff',
+                      'customer_phone', 'product', 'quantity', 'price', 'notes', 'tax', 'completed_at']
+EXCEL_MAX_ROWS = 1048576 # Rows per worksheet, including the header
+
+
+def order_lines(start_dt, end_dt, chunk_size=5000):
+    """Yields lists of order line tuples (ORDER_LINE_COLUMNS) for orders created in the range.
+
+    Rows come from a streamed cursor `chunk_size` at a time, so memory does not
+    depend on the size of the range. Lines of one order are consecutive.
+    """
+    stmt = select(Order.order_number, type_coerce(Order.created_at, db.String), Order.order_type, Order.status,
+                  Order.payment_method, User.username, Customer.phone, Product.name, OrderItem.quantity,
+                  OrderItem.price, OrderItem.notes, Order.tax, type_coerce(Order.completed_at, db.String))\
+        .join(OrderItem, OrderItem.order_id == Order.id)\
+        .join(Product, Product.id == OrderItem.product_id)\
+        .join(User, User.id == Order.user_id)\
+        .outerjoin(Customer, Customer.id == Order.customer_id)\
+        .where(Order.created_at >= start_dt, Order.created_at <= end_dt)\
+        .order_by(Order.created_at, Order.id, OrderItem.id)
+    result = db.session.connection().execute(stmt.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield rows
+
+
+def order_lines_csv(start_dt, end_dt, chunk_size=5000):
+    """Yields the CSV export one chunk of lines at a time (header first)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_LINE_COLUMNS)
+    for rows in order_lines(start_dt, end_dt, chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when the range has no orders
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _as_datetime(value):
+    # SQLite hands back the stored text; other databases already return datetimes
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def write_excel_report(path, start_dt, end_dt, report_data, chunk_size=5000):
+    """Writes the report workbook to `path` with openpyxl's write-only mode.
+
+    Sheets: Summary, Order Lines, Top Items, Payment Methods, Staff Performance
+    and Hourly Sales. Order lines are streamed from the database in chunks and
+    written row by row, so neither the rows nor the sheet are held in memory.
+    """
+    from openpyxl import Workbook # Imported on first export; keeps it out of app startup
+    workbook = Workbook(write_only=True)
+
+    summary = workbook.create_sheet('Summary')
+    summary.append(['From', start_dt.date()])
+    summary.append(['To', end_dt.date()])
+    summary.append(['Total Sales', report_data['summary']['total_sales']])
+    summary.append(['Orders', report_data['summary']['orders_count']])
+    summary.append(['Average Order Value', report_data['summary']['avg_order_value']])
+
+    lines = workbook.create_sheet('Order Lines')
+    lines.append(ORDER_LINE_COLUMNS)
+    sheet_rows, part = 1, 1
+    created_at, completed_at = ORDER_LINE_COLUMNS.index('created_at'), ORDER_LINE_COLUMNS.index('completed_at')
+    for rows in order_lines(start_dt, end_dt, chunk_size):
+        for row in rows:
+            if sheet_rows == EXCEL_MAX_ROWS:
+                # Past Excel's sheet limit, carry on in 'Order Lines (2)', ...
+                part += 1
+                lines = workbook.create_sheet(f'Order Lines ({part})')
+                lines.append(ORDER_LINE_COLUMNS)
+                sheet_rows = 1
+            sheet_rows += 1
+            row = list(row)
+            row[created_at] = _as_datetime(row[created_at])
+            row[completed_at] = _as_datetime(row[completed_at])
+            lines.append(row)
+
+    top_items = workbook.create_sheet('Top Items')
+    top_items.append(['Product', 'Quantity', 'Revenue'])
+    for item in report_data['top_items']:
+        top_items.append([item['name'], item['quantity'], item['revenue']])
+
+    payments = workbook.create_sheet('Payment Methods')
+    payments.append(['Method', 'Orders', 'Amount'])
+    for payment in report_data['payment_methods']:
+        payments.append([payment['method'] or 'Unknown', payment['count'], payment['amount']])
+
+    staff = workbook.create_sheet('Staff Performance')
+    staff.append(['Staff', 'Orders', 'Sales'])
+    for member in report_data['staff_performance']:
+        staff.append([member['name'], member['orders'], member['sales']])
+
+    hourly = workbook.create_sheet('Hourly Sales')
+    hourly.append(['Hour', 'Orders', 'Sales'])
+    for hour in report_data['hourly_sales']:
+        hourly.append([f"{hour['hour']}:00", hour['orders'], hour['sales']])
+
+    workbook.save(path)
+
+
+def stream_and_remove(path, mimetype, headers=None, block_size=64 * 1024):
+    """Response streaming a file that deletes the file once the response is closed.
+
+    The cleanup is registered with `call_on_close`, which the server calls after
+    sending, after a client disconnect and when the body is never iterated.
+    """
+    f = open(path, 'rb')
+    response = Response(iter(lambda: f.read(block_size), b''), mimetype=mimetype, headers=headers)
+    response.headers['Content-Length'] = str(os.path.getsize(path))
+
+    def remove():
+        f.close()
+        os.remove(path)
+    response.call_on_close(remove)
+    return response
@@ -0,0 +1,181 @@
+from extensions import db, apply_sqlite_pragmas
+from .reports import build_report
+from .report_export import order_lines_csv, write_excel_report
+from .report_cache import sales_data_version
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import Flask, g
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+ARTIFACT_EXTENSIONS = {'generate': 'json', 'csv': 'csv', 'excel': 'xlsx'}
+# Config the worker processes need to reach the same databases (report queries use the read-only bind)
+WORKER_CONFIG_KEYS = ('SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_ENGINE_OPTIONS', 'SQLALCHEMY_BINDS', 'SQLALCHEMY_TRACK_MODIFICATIONS',
+                      'SQLITE_PRAGMAS', 'READ_ONLY_DATABASE_URL')
+
+
+def _write_meta(path, meta):
+    # Written atomically, so a poll never sees a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+
+def _read_meta(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def run_report_job(config, instance_path, jobs_dir, job_id, kind, params):
+    """Process pool entry point: builds one report artifact into jobs_dir.
+
+    Runs in a separate process, so it sets up a minimal app (database only,
+    no blueprints) from the parent's config instead of importing app.py.
+    """
+    meta_path = os.path.join(jobs_dir, f"{job_id}.meta.json")
+    meta = _read_meta(meta_path) or {}
+    meta.update(status='running', started_at=time.time())
+    _write_meta(meta_path, meta)
+
+    app = Flask('app', instance_path=instance_path)
+    app.config.update(config)
+    db.init_app(app)
+    artifact = os.path.join(jobs_dir, f"{job_id}.{ARTIFACT_EXTENSIONS[kind]}")
+    try:
+        with app.app_context():
+            apply_sqlite_pragmas(db.engine, config.get('SQLITE_PRAGMAS'))
+            if 'read_only' in db.engines:
+                apply_sqlite_pragmas(db.engines['read_only'], dict(config.get('SQLITE_PRAGMAS') or {}, query_only='ON'))
+            g.read_only = True # Report queries run on the read-only engine, like the synchronous report views
+            start_dt = datetime.fromisoformat(params['start'])
+            end_dt = datetime.combine(datetime.fromisoformat(params['end']).date(), datetime.max.time())
+            backend = params.get('backend', 'rollup')
+            if kind == 'csv':
+                with open(artifact, 'w', newline='', encoding='utf-8') as f:
+                    for chunk in order_lines_csv(start_dt, end_dt):
+                        f.write(chunk)
+            elif kind == 'excel':
+                write_excel_report(artifact, start_dt, end_dt, build_report(start_dt, end_dt, backend))
+            else:
+                with open(artifact, 'w') as f:
+                    json.dump(build_report(start_dt, end_dt, backend), f)
+        meta.update(status='done', finished_at=time.time(), artifact=os.path.basename(artifact))
+    except Exception as e:
+        print(f"Report job {job_id} failed: {e}")
+        meta.update(status='failed', finished_at=time.time(), error=str(e))
+        if os.path.exists(artifact):
+            os.remove(artifact)
+    _write_meta(meta_path, meta)
+    return meta['status']
+
+
+class ReportJobRunner:
+    """Runs report and export jobs in a process pool, with job state and artifacts on disk.
+
+    A job id is derived from the job parameters and the current sales data
+    version, so identical requests - from any web worker - share one job, and
+    a finished artifact is reused until new sales touch the data. Finished jobs
+    are deleted `retention_seconds` after they finish.
+    """
+
+    def __init__(self, app, jobs_dir, max_workers=2, retention_seconds=86400, stale_after_seconds=3600):
+        self.config = {key: app.config[key] for key in WORKER_CONFIG_KEYS if key in app.config}
+        self.instance_path = app.instance_path
+        self.jobs_dir = jobs_dir
+        self.retention = retention_seconds
+        self.stale_after = stale_after_seconds
+        os.makedirs(jobs_dir, exist_ok=True)
+        # Spawned (not forked) workers: the web process has threads and open connections
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        self._lock = threading.Lock()
+
+    def meta_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.meta.json")
+
+    def job_id(self, kind, params):
+        # Reading the version needs an app context; it is one primary key lookup per table
+        key = json.dumps({'kind': kind, 'params': params, 'version': sales_data_version()}, sort_keys=True)
+        return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+    def submit(self, kind, params):
+        """Returns the job for these parameters, starting it unless an identical one exists."""
+        self.cleanup()
+        job_id = self.job_id(kind, params)
+        meta_path = self.meta_path(job_id)
+        with self._lock:
+            existing = self.status(job_id)
+            if existing and existing['status'] != 'failed':
+                return existing # Coalesce onto the queued / running / finished job
+            meta = {'id': job_id, 'kind': kind, 'params': params, 'status': 'queued', 'created_at': time.time()}
+            try:
+                # O_EXCL: when two web workers race, only one claims the job
+                fd = os.open(meta_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+            except FileExistsError:
+                if existing is None:
+                    return self.status(job_id) or meta
+            _write_meta(meta_path, meta)
+            future = self._executor.submit(run_report_job, self.config, self.instance_path, self.jobs_dir, job_id, kind, params)
+            future.add_done_callback(lambda f: self._check_crash(job_id, f))
+        return meta
+
+    def _check_crash(self, job_id, future):
+        # The worker process died (or could not start) before recording an outcome
+        if future.exception() is not None:
+            meta = _read_meta(self.meta_path(job_id)) or {'id': job_id}
+            meta.update(status='failed', finished_at=time.time(), error=str(future.exception()))
+            _write_meta(self.meta_path(job_id), meta)
+
+    def status(self, job_id):
+        """Returns the job's metadata, or None if it is unknown or expired."""
+        meta = _read_meta(self.meta_path(job_id))
+        if meta is None:
+            return None
+        if meta['status'] in ('queued', 'running') and time.time() - meta['created_at'] > self.stale_after:
+            # Left behind by a web process that went away mid-job
+            meta.update(status='failed', error='Job did not finish.')
+        return meta
+
+    def artifact_path(self, meta):
+        return os.path.join(self.jobs_dir, meta['artifact'])
+
+    def cleanup(self):
+        """Deletes jobs (metadata and artifact) that finished more than `retention` seconds ago."""
+        cutoff = time.time() - self.retention
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith('.meta.json'):
+                continue
+            meta = _read_meta(os.path.join(self.jobs_dir, name))
+            if not meta or (meta.get('finished_at') or meta.get('created_at', 0)) > cutoff:
+                continue
+            if meta['status'] in ('queued', 'running') and meta['created_at'] > time.time() - self.stale_after:
+                continue
+            for path in (meta.get('artifact'), name):
+                if path and os.path.exists(os.path.join(self.jobs_dir, path)):
+                    os.remove(os.path.join(self.jobs_dir, path))
+
+
+_runner_lock = threading.Lock()
+
+
+def get_report_jobs(app):
+    """Returns the app's report job runner, creating it on first use."""
+    with _runner_lock:
+        runner = app.extensions.get('report_jobs')
+        if runner is None:
+            runner = ReportJobRunner(
+                app,
+                jobs_dir=app.config.get('REPORT_JOB_DIR') or os.path.join(app.instance_path, 'report_jobs'),
+                max_workers=app.config.get('REPORT_JOB_WORKERS', 2),
+                retention_seconds=app.config.get('REPORT_JOB_RETENTION_SECONDS', 86400)
+            )
+            app.extensions['report_jobs'] = runner
+        return runner
@@ -0,0 +1,184 @@
+from extensions import db
+from models import Product, User, Order, OrderItem, SalesRollup, ProductSalesRollup
+from sqlalchemy import func, desc, select, type_coerce
+
+SCAN_COLUMNS = ['order_id', 'created_at', 'payment_method', 'user_id', 'total_amount', 'product_id', 'quantity', 'price']
+
+
+def rollup_report(start_dt, end_dt, status='completed'):
+    """Builds the sales report for [start_dt, end_dt] from the hourly rollup tables.
+
+    Reads a few rows per hour in the range instead of every order. Ranges are
+    expected to start and end on hour boundaries (the report ranges are whole days).
+    """
+    in_range = (SalesRollup.hour >= start_dt, SalesRollup.hour <= end_dt, SalesRollup.status == status)
+    products_in_range = (ProductSalesRollup.hour >= start_dt, ProductSalesRollup.hour <= end_dt,
+                         ProductSalesRollup.status == status)
+
+    # One row per hour with orders: feeds the summary, the daily trend and the hour-of-day chart
+    hours = db.session.query(
+        SalesRollup.hour,
+        func.sum(SalesRollup.order_count),
+        func.sum(SalesRollup.total_sales)
+    ).filter(*in_range).group_by(SalesRollup.hour).order_by(SalesRollup.hour).all()
+
+    total_sales, orders_count = 0, 0
+    daily = {}
+    hourly_sales_dict = {hour: {'orders': 0, 'sales': 0.0} for hour in range(24)}
+    for hour, count, sales in hours:
+        if not count:
+            continue
+        total_sales += sales or 0
+        orders_count += count
+        day = hour.date().isoformat()
+        daily[day] = daily.get(day, 0.0) + (sales or 0)
+        hourly_sales_dict[hour.hour]['orders'] += count
+        hourly_sales_dict[hour.hour]['sales'] += sales or 0
+    avg_order_value = total_sales / orders_count if orders_count > 0 else 0
+
+    # Top Items
+    top_items_query = db.session.query(
+        Product.name,
+        func.sum(ProductSalesRollup.quantity).label('total_quantity'),
+        func.sum(ProductSalesRollup.revenue).label('total_revenue')
+    ).join(ProductSalesRollup, ProductSalesRollup.product_id == Product.id)\
+     .filter(*products_in_range)\
+     .group_by(Product.name)\
+     .having(func.sum(ProductSalesRollup.quantity) > 0)\
+     .order_by(desc('total_revenue'))\
+     .limit(5)
+    top_items = [{'name': i[0], 'quantity': int(i[1]), 'revenue': float(i[2])} for i in top_items_query.all()]
+
+    # Payment Methods
+    payment_methods_query = db.session.query(
+        SalesRollup.payment_method,
+        func.sum(SalesRollup.order_count).label('count'),
+        func.sum(SalesRollup.total_sales).label('total_amount')
+    ).filter(*in_range)\
+     .group_by(SalesRollup.payment_method)\
+     .having(func.sum(SalesRollup.order_count) > 0)\
+     .order_by(desc('total_amount'))
+    payment_methods = [{'method': p[0] or None, 'count': int(p[1]), 'amount': float(p[2])} for p in payment_methods_query.all()]
+
+    # Staff Performance
+    staff_perf_query = db.session.query(
+        User.name,
+        func.sum(SalesRollup.order_count).label('order_count'),
+        func.sum(SalesRollup.total_sales).label('total_sales')
+    ).join(SalesRollup, SalesRollup.user_id == User.id)\
+     .filter(*in_range)\
+     .group_by(User.name)\
+     .having(func.sum(SalesRollup.order_count) > 0)\
+     .order_by(desc('total_sales'))
+    staff_performance = [{'name': s[0], 'orders': int(s[1]), 'sales': float(s[2])} for s in staff_perf_query.all()]
+
+    return {
+        'summary': {
+            'total_sales': total_sales,
+            'orders_count': orders_count,
+            'avg_order_value': avg_order_value,
+        },
+        'top_items': top_items,
+        'payment_methods': payment_methods,
+        'staff_performance': staff_performance,
+        'sales_trend': [{'date': day, 'sales': sales} for day, sales in daily.items()],
+        'hourly_sales': [{'hour': hour, 'orders': data['orders'], 'sales': data['sales']} for hour, data in hourly_sales_dict.items()],
+    }
+
+
+def _scan_chunks(start_dt, end_dt, status, chunk_size):
+    """Yields DataFrames of order/item rows (one row per item) in order id order.
+
+    Rows of the last order in a chunk are held back and sent with the next
+    chunk, so every order arrives in exactly one chunk.
+    """
+    import pandas as pd # Only the scan backend needs pandas; keeps it out of app startup
+    # created_at is read as stored (no per-row datetime objects); pandas parses whole columns at once
+    stmt = select(Order.id, type_coerce(Order.created_at, db.String), Order.payment_method, Order.user_id,
+                  Order.total_amount, OrderItem.product_id, OrderItem.quantity, OrderItem.price)\
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)\
+        .where(Order.created_at >= start_dt, Order.created_at <= end_dt, Order.status == status)\
+        .order_by(Order.id)
+    carry = None
+    # Core rows on the session's connection: skips the ORM row machinery, keeps the transaction
+    result = db.session.connection().execute(stmt.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        frame = pd.DataFrame.from_records(rows, columns=SCAN_COLUMNS)
+        if carry is not None:
+            frame = pd.concat([carry, frame], ignore_index=True)
+        last_order = frame['order_id'].iat[-1]
+        carry = frame[frame['order_id'] == last_order]
+        frame = frame[frame['order_id'] != last_order]
+        if len(frame):
+            yield frame
+    if carry is not None and len(carry):
+        yield carry
+
+
+def scan_report(start_dt, end_dt, status='completed', chunk_size=50000):
+    """Builds the sales report from raw order/item rows in a single streamed scan.
+
+    Same output as rollup_report, for any range and without relying on the
+    rollup tables. Each chunk is reduced with pandas group-bys and only the
+    small partial aggregates are kept, so memory does not grow with the range.
+    """
+    import pandas as pd
+    by_hour, by_payment, by_staff, by_product = [], [], [], []
+    for frame in _scan_chunks(start_dt, end_dt, status, chunk_size):
+        orders = frame.drop_duplicates('order_id')
+        orders = orders.assign(hour=pd.to_datetime(orders['created_at'], format='ISO8601').dt.floor('h'),
+                               payment_method=orders['payment_method'].fillna(''))
+        by_hour.append(orders.groupby('hour')['total_amount'].agg(['count', 'sum']))
+        by_payment.append(orders.groupby('payment_method')['total_amount'].agg(['count', 'sum']))
+        by_staff.append(orders.groupby('user_id')['total_amount'].agg(['count', 'sum']))
+        items = frame.dropna(subset=['product_id'])
+        by_product.append(items.assign(revenue=items['quantity'] * items['price'])
+                          .groupby('product_id')[['quantity', 'revenue']].sum())
+
+    def combine(partials, columns=('count', 'sum')):
+        if not partials:
+            return pd.DataFrame(columns=list(columns))
+        return pd.concat(partials).groupby(level=0).sum()
+
+    hours, payments, staff, products = combine(by_hour), combine(by_payment), combine(by_staff), combine(by_product, ('quantity', 'revenue'))
+
+    total_sales = float(hours['sum'].sum())
+    orders_count = int(hours['count'].sum())
+    avg_order_value = total_sales / orders_count if orders_count > 0 else 0
+
+    daily = hours.groupby(hours.index.strftime('%Y-%m-%d'))['sum'].sum() if len(hours) else pd.Series(dtype=float)
+    hour_of_day = hours.groupby(hours.index.hour).sum() if len(hours) else hours
+    hourly_sales = [{'hour': hour,
+                     'orders': int(hour_of_day['count'].get(hour, 0)),
+                     'sales': float(hour_of_day['sum'].get(hour, 0.0))} for hour in range(24)]
+
+    # Names are resolved after aggregating; grouped by name as the SQL report does
+    product_names = dict(db.session.query(Product.id, Product.name).all())
+    products = products.groupby(products.index.map(lambda i: product_names.get(int(i)))).sum()\
+        .sort_values('revenue', ascending=False).head(5)
+    staff_names = dict(db.session.query(User.id, User.name).all())
+    staff = staff.groupby(staff.index.map(lambda i: staff_names.get(int(i)))).sum().sort_values('sum', ascending=False)
+    payments = payments.sort_values('sum', ascending=False)
+
+    return {
+        'summary': {
+            'total_sales': total_sales,
+            'orders_count': orders_count,
+            'avg_order_value': avg_order_value,
+        },
+        'top_items': [{'name': name, 'quantity': int(row['quantity']), 'revenue': float(row['revenue'])}
+                      for name, row in products.iterrows()],
+        'payment_methods': [{'method': method or None, 'count': int(row['count']), 'amount': float(row['sum'])}
+                            for method, row in payments.iterrows()],
+        'staff_performance': [{'name': name, 'orders': int(row['count']), 'sales': float(row['sum'])}
+                              for name, row in staff.iterrows()],
+        'sales_trend': [{'date': day, 'sales': float(sales)} for day, sales in daily.items()],
+        'hourly_sales': hourly_sales,
+    }
+
+
+def build_report(start_dt, end_dt, backend='rollup'):
+    """Sales report for the range from the configured backend ('rollup' or 'scan')."""
+    if backend == 'scan':
+        return scan_report(start_dt, end_dt)
+    return rollup_report(start_dt, end_dt)
@@ -0,0 +1,254 @@
+from extensions import db
+from models import Product, User, Customer, Order, OrderItem, Ingredient, InventoryLog
+from .recipe_cache import get_recipe_matrix
+from .sales_rollup import RollupBatch, rollup_key
+from .kitchen import completion_deltas, apply_completions
+from datetime import datetime
+from sqlalchemy import insert, update, case
+import csv
+import hashlib
+import json
+import os
+import time
+
+# One input row per order line; order-level columns are repeated on every line of the order
+#   order_number, created_at, order_type, status, payment_method, staff (username),
+#   customer_phone, product (name), quantity, price, notes, tax, completed_at
+REQUIRED_COLUMNS = ('order_number', 'created_at', 'product', 'quantity', 'price')
+FINGERPRINT_BYTES = 64 * 1024 # Hashed from the start of the file to recognise it when resuming
+
+
+def read_rows(path):
+    """Yields (line_number, row dict) from a CSV or JSONL file without loading it into memory."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl') or path.endswith('.ndjson'):
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+        else:
+            # Line 1 is the header
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+
+
+def group_orders(rows):
+    """Groups consecutive lines with the same order_number into (last_line_number, [rows])."""
+    current, lines, last_line = None, [], 0
+    for line_number, row in rows:
+        if row['order_number'] != current and lines:
+            yield last_line, lines
+            lines = []
+        current = row['order_number']
+        lines.append(row)
+        last_line = line_number
+    if lines:
+        yield last_line, lines
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def file_identity(path):
+    """Absolute path, size and a hash of the first bytes: what a checkpoint was written for."""
+    with open(path, 'rb') as f:
+        head = hashlib.sha256(f.read(FINGERPRINT_BYTES)).hexdigest()
+    return {'file': os.path.abspath(path), 'size': os.path.getsize(path), 'head_sha256': head}
+
+
+class SalesImporter:
+    """Streams legacy sales lines into Order / OrderItem in bulk, one chunk of orders per transaction.
+
+    After every committed chunk the last imported line number is written to
+    `checkpoint_path` with the file's identity, so an interrupted import can
+    resume where it stopped; resuming with a different or changed file is refused.
+
+    Orders, items, rollups, kitchen metrics and (optionally) inventory are
+    written; imported orders get no OrderStatusEvent history.
+    """
+
+    def __init__(self, chunk_size=1000, deduct_inventory=False, checkpoint_path=None, echo=print):
+        self.chunk_size = chunk_size
+        self.deduct_inventory = deduct_inventory
+        self.checkpoint_path = checkpoint_path
+        self.echo = echo
+        # Name lookups are resolved once, not per row
+        self.products = dict(db.session.query(Product.name, Product.id).all())
+        self.staff = dict(db.session.query(User.username, User.id).all())
+        self.customers = dict(db.session.query(Customer.phone, Customer.id).filter(Customer.phone.isnot(None)).all())
+        self.default_user_id = db.session.query(User.id).filter_by(role='manager').order_by(User.id).limit(1).scalar()
+        self.stats = {'lines': 0, 'orders': 0, 'skipped': 0}
+
+    def read_checkpoint(self, identity):
+        """Line to resume after; raises ValueError if the checkpoint was written for another file."""
+        if not (self.checkpoint_path and os.path.exists(self.checkpoint_path)):
+            return 0
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        changed = [key for key, value in identity.items() if checkpoint.get(key) != value]
+        if changed:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} was written for {checkpoint.get('file')}, "
+                             f"which differs from {identity['file']} ({', '.join(changed)}); refusing to resume. "
+                             "Remove the checkpoint to import the file from the start.")
+        return checkpoint.get('line', 0)
+
+    def write_checkpoint(self, identity, line_number):
+        if not self.checkpoint_path:
+            return
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(identity, line=line_number, orders=self.stats['orders']), f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, path, resume=False):
+        identity = file_identity(path)
+        start_after = self.read_checkpoint(identity) if resume else 0
+        if start_after:
+            self.echo(f"Resuming after line {start_after}.")
+        rows = ((n, row) for n, row in read_rows(path) if n > start_after)
+
+        started = time.monotonic()
+        chunk, last_line = [], start_after
+        for last_line, lines in group_orders(rows):
+            chunk.append(lines)
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                self.write_checkpoint(identity, last_line)
+                self.report_progress(started)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+            self.write_checkpoint(identity, last_line)
+        self.report_progress(started)
+        return self.stats
+
+    def report_progress(self, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.echo(f"{self.stats['lines']} lines, {self.stats['orders']} orders imported, "
+                  f"{self.stats['skipped']} skipped ({self.stats['lines'] / elapsed:,.0f} rows/sec)")
+
+    def build_order(self, lines):
+        """Returns (order row, [item rows]) for one order's lines, or raises ValueError."""
+        head = lines[0]
+        for column in REQUIRED_COLUMNS:
+            if not head.get(column):
+                raise ValueError(f"missing {column}")
+        items = []
+        for line in lines:
+            product_id = self.products.get(line['product'])
+            if product_id is None:
+                raise ValueError(f"unknown product {line['product']!r}")
+            items.append({
+                'product_id': product_id,
+                'quantity': int(line['quantity']),
+                'price': float(line['price']),
+                'notes': line.get('notes') or None
+            })
+        subtotal = round(sum(i['quantity'] * i['price'] for i in items), 2)
+        tax = round(float(head.get('tax') or 0), 2)
+        status = head.get('status') or 'completed'
+        created_at = _parse_datetime(head['created_at'])
+        order = {
+            'order_number': head['order_number'],
+            'order_type': head.get('order_type') or 'dine-in',
+            'status': status,
+            'user_id': self.staff.get(head.get('staff'), self.default_user_id),
+            'customer_id': self.customers.get(head.get('customer_phone')),
+            'created_at': created_at,
+            'completed_at': _parse_datetime(head.get('completed_at')) or (created_at if status == 'completed' else None),
+            'subtotal': subtotal,
+            'tax': tax,
+            'total_amount': round(subtotal + tax, 2),
+            'payment_method': head.get('payment_method') or None
+        }
+        return order, items
+
+    def import_chunk(self, chunk):
+        orders, items_by_number = [], {}
+        for lines in chunk:
+            self.stats['lines'] += len(lines)
+            try:
+                order, items = self.build_order(lines)
+            except (ValueError, TypeError) as e:
+                self.echo(f"Skipping order {lines[0].get('order_number')}: {e}")
+                self.stats['skipped'] += 1
+                continue
+            orders.append(order)
+            items_by_number[order['order_number']] = items
+
+        # Orders already present (e.g. an earlier run died before writing its checkpoint) are not imported twice
+        numbers = list(items_by_number)
+        existing = {n for (n,) in db.session.query(Order.order_number).filter(Order.order_number.in_(numbers))} if numbers else set()
+        orders = [o for o in orders if o['order_number'] not in existing]
+        self.stats['skipped'] += len(existing)
+        if not orders:
+            return
+
+        try:
+            db.session.execute(insert(Order), orders)
+            ids = dict(db.session.query(Order.order_number, Order.id)
+                       .filter(Order.order_number.in_([o['order_number'] for o in orders])).all())
+            item_rows = []
+            for order in orders:
+                order['id'] = ids[order['order_number']]
+                for item in items_by_number[order['order_number']]:
+                    item_rows.append(dict(item, order_id=order['id']))
+            db.session.execute(insert(OrderItem), item_rows)
+            if self.deduct_inventory:
+                self.deduct(orders, items_by_number)
+            self.update_rollups(orders, items_by_number)
+            self.update_kitchen_metrics(orders)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.stats['orders'] += len(orders)
+
+    def update_rollups(self, orders, items_by_number):
+        """Adds the chunk to the sales rollups; bulk inserts bypass the session listener that normally does."""
+        batch = RollupBatch()
+        for order in orders:
+            products = {}
+            for item in items_by_number[order['order_number']]:
+                quantity, revenue = products.get(item['product_id'], (0, 0.0))
+                products[item['product_id']] = (quantity + item['quantity'], revenue + item['quantity'] * item['price'])
+            key = rollup_key(order['created_at'], order['status'], order['order_type'], order['payment_method'], order['user_id'])
+            batch.add_order(key, order['total_amount'], [(p, q, r) for p, (q, r) in products.items()])
+        batch.write(db.session.connection())
+
+    def update_kitchen_metrics(self, orders):
+        """Adds the chunk's completed orders to the ticket time and throughput tables, as rebuild_metrics() counts them."""
+        apply_completions(db.session.connection(), [
+            completion_deltas(order['created_at'], order['completed_at'], 1)
+            for order in orders if order['status'] == 'completed' and order['completed_at']
+        ])
+
+    def deduct(self, orders, items_by_number):
+        """Applies recipe usage for a chunk with one UPDATE and one bulk log insert.
+
+        Historical usage is applied unconditionally: stock may go negative and
+        should be corrected with a stock count after the import.
+        """
+        recipes = get_recipe_matrix()
+        totals, logs = {}, []
+        for order in orders:
+            if order['status'] == 'cancelled':
+                continue
+            usage = recipes.requirements((i['product_id'], i['quantity']) for i in items_by_number[order['order_number']])
+            for ingredient_id, quantity in usage.items():
+                totals[ingredient_id] = totals.get(ingredient_id, 0) + quantity
+                logs.append({
+                    'ingredient_id': ingredient_id,
+                    'quantity_change': -quantity,
+                    'reason': 'order_usage',
+                    'user_id': order['user_id'],
+                    'order_id': order['id'],
+                    'timestamp': order['created_at']
+                })
+        if totals:
+            used = case(totals, value=Ingredient.id)
+            db.session.execute(update(Ingredient)
+                .where(Ingredient.id.in_(totals))
+                .values(quantity=Ingredient.quantity - used)
+                .execution_options(synchronize_session=False))
+            db.session.execute(insert(InventoryLog), logs)
@@ -0,0 +1,141 @@
+from extensions import db
+from models import Order, OrderItem, SalesRollup, ProductSalesRollup
+from .upsert import increment_rows
+from sqlalchemy import event, inspect, func
+from sqlalchemy.orm import Session
+
+KEY_COLUMNS = ('hour', 'status', 'order_type', 'payment_method', 'user_id')
+# Order attributes that decide which rollup row an order is counted in (or how much it adds)
+TRACKED_ATTRIBUTES = ('created_at', 'status', 'order_type', 'payment_method', 'user_id', 'total_amount')
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(created_at, status, order_type, payment_method, user_id):
+    return (hour_of(created_at), status, order_type, payment_method or '', user_id)
+
+
+class RollupBatch:
+    """Accumulates rollup changes in memory and writes them with one upsert per table."""
+
+    def __init__(self):
+        self.orders = {} # key -> [order_count, total_sales]
+        self.products = {} # key + (product_id,) -> [order_count, quantity, revenue]
+
+    def add_order(self, key, total_amount, items=(), sign=1):
+        """Counts one order (sign=-1 takes it back out); items are (product_id, quantity, revenue) per product."""
+        totals = self.orders.setdefault(key, [0, 0.0])
+        totals[0] += sign
+        totals[1] += sign * (total_amount or 0)
+        for product_id, quantity, revenue in items:
+            self.add_product(key, product_id, quantity, revenue, sign=sign)
+
+    def add_product(self, key, product_id, quantity, revenue, orders=1, sign=1):
+        totals = self.products.setdefault(key + (product_id,), [0, 0, 0.0])
+        totals[0] += sign * orders
+        totals[1] += sign * quantity
+        totals[2] += sign * (revenue or 0)
+
+    def write(self, connection):
+        increment_rows(connection, SalesRollup, KEY_COLUMNS, [
+            dict(zip(KEY_COLUMNS, key), order_count=count, total_sales=sales)
+            for key, (count, sales) in self.orders.items() if count or sales
+        ])
+        increment_rows(connection, ProductSalesRollup, KEY_COLUMNS + ('product_id',), [
+            dict(zip(KEY_COLUMNS + ('product_id',), key), order_count=count, quantity=quantity, revenue=revenue)
+            for key, (count, quantity, revenue) in self.products.items() if count or quantity or revenue
+        ])
+
+
+def items_by_order(order_ids, session=None):
+    """Returns {order_id: [(product_id, quantity, revenue)]} with one grouped query."""
+    items = {}
+    if not order_ids:
+        return items
+    rows = (session or db.session).query(OrderItem.order_id, OrderItem.product_id,
+                            func.sum(OrderItem.quantity), func.sum(OrderItem.quantity * OrderItem.price))\
+        .filter(OrderItem.order_id.in_(order_ids))\
+        .group_by(OrderItem.order_id, OrderItem.product_id).all()
+    for order_id, product_id, quantity, revenue in rows:
+        items.setdefault(order_id, []).append((product_id, quantity, revenue))
+    return items
+
+
+def rebuild_rollups():
+    """Recomputes both rollup tables from orders (one scan of orders, one of order items)."""
+    db.session.query(SalesRollup).delete()
+    db.session.query(ProductSalesRollup).delete()
+    batch = RollupBatch()
+    orders = db.session.query(Order.created_at, Order.status, Order.order_type, Order.payment_method,
+                              Order.user_id, Order.total_amount).execution_options(yield_per=5000)
+    count = 0
+    for created_at, status, order_type, payment_method, user_id, total_amount in orders:
+        batch.add_order(rollup_key(created_at, status, order_type, payment_method, user_id), total_amount)
+        count += 1
+    items = db.session.query(Order.created_at, Order.status, Order.order_type, Order.payment_method, Order.user_id,
+                             OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.quantity * OrderItem.price))\
+        .join(OrderItem, OrderItem.order_id == Order.id)\
+        .group_by(Order.id, OrderItem.product_id)\
+        .execution_options(yield_per=5000)
+    for created_at, status, order_type, payment_method, user_id, product_id, quantity, revenue in items:
+        batch.add_product(rollup_key(created_at, status, order_type, payment_method, user_id), product_id, quantity, revenue)
+    batch.write(db.session.connection())
+    db.session.commit()
+    return count
+
+
+def _order_values(order, previous=False):
+    """Tracked attribute values of an order, as they are now or as they were when loaded."""
+    values = {}
+    state = inspect(order)
+    for name in TRACKED_ATTRIBUTES:
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = getattr(order, name)
+    return values
+
+
+def _key_and_total(values):
+    key = rollup_key(values['created_at'], values['status'], values['order_type'], values['payment_method'], values['user_id'])
+    return key, values['total_amount']
+
+
+# Orders are counted when created and moved between rows when a tracked attribute changes.
+# Items are often bulk-inserted after the order row, so the item side is resolved just before commit.
+@event.listens_for(Session, 'after_flush')
+def _collect_rollup_changes(session, flush_context):
+    changes = session.info.setdefault('sales_rollup', [])
+    for obj in session.new:
+        if isinstance(obj, Order):
+            changes.append((obj.id, None, _key_and_total(_order_values(obj))))
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES):
+                changes.append((obj.id, _key_and_total(_order_values(obj, previous=True)), _key_and_total(_order_values(obj))))
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_rollup_changes(session):
+    session.flush() # Picks up changes made since the last flush
+    changes = session.info.pop('sales_rollup', [])
+    if not changes:
+        return
+    items = items_by_order({order_id for order_id, _, _ in changes}, session)
+    batch = RollupBatch()
+    for order_id, old, new in changes:
+        if old:
+            batch.add_order(*old, items=items.get(order_id, ()), sign=-1)
+        if new:
+            batch.add_order(*new, items=items.get(order_id, ()))
+    batch.write(session.connection())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rollup_changes(session):
+    if not session.in_nested_transaction():
+        session.info.pop('sales_rollup', None)
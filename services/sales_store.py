@@ -0,0 +1,329 @@
+from extensions import db
+from models import Order, OrderItem, OrderStatusEvent, Product, Category, User
+from .report_cache import sales_data_version
+from sqlalchemy import select, func, type_coerce
+from datetime import datetime
+import numpy as np
+import json
+import os
+import threading
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MEASURES = ('revenue', 'quantity', 'lines', 'orders')
+DIMENSIONS = ('hour', 'weekday', 'date', 'status', 'order_type', 'payment_method', 'product', 'category', 'staff')
+# Integer columns kept per order line; string columns are stored as codes into a StringDictionary
+INT_COLUMNS = ('item_id', 'order_id', 'created_at', 'user_id', 'product_id', 'quantity', 'status', 'order_type', 'payment_method')
+ENCODED_COLUMNS = ('status', 'order_type', 'payment_method')
+# Largest rows x columns grid a pivot may return (e.g. 300 products by every day of a year is ~110k)
+MAX_PIVOT_CELLS = 100_000
+
+
+def _epoch_seconds(moment):
+    # Order timestamps are naive UTC, stored as seconds since 1970-01-01
+    return int((moment - datetime(1970, 1, 1)).total_seconds())
+
+
+def _names(model, keys):
+    names = dict(db.session.query(model.id, model.name).filter(model.id.in_(keys)).all()) if keys else {}
+    return [names.get(key) for key in keys]
+
+
+def _distinct(keys):
+    """Distinct values of a nearly sorted int array (a stable sort is close to linear on those)."""
+    keys = np.sort(keys, kind='stable')
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    return keys[first]
+
+
+class StringDictionary:
+    """Dictionary encoding for a low-cardinality string column: value <-> small int code."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode_many(self, values):
+        import pandas as pd # Loaded with the store, not at app startup
+        # Factorize the chunk, then map only its distinct values to codes
+        chunk_codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+        return np.array([self.encode(value) for value in uniques], dtype=np.int64)[chunk_codes]
+
+
+class SalesStore:
+    """Columnar in-memory copy of order lines (OrderItem joined to its Order) for pivots.
+
+    One NumPy array per column, created_at as epoch seconds and strings
+    dictionary-encoded. Arrays grow by doubling, so a refresh only appends the
+    order lines added since the last one and re-reads the status of orders that
+    changed status since then. Refreshes are keyed on sales_data_version(), and
+    the store is rebuilt from scratch if the database has order lines it missed
+    (e.g. one committed late under a lower id). Products' categories and display names are
+    looked up when a pivot runs, so renames and re-categorisation show up
+    without a reload.
+
+    With a `path`, large loads are also saved there as one .npy file per
+    column; a restarted process reads those back and only catches up from
+    their last ids instead of rescanning every order line.
+    """
+
+    def __init__(self, path=None, chunk_size=50000):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.columns = {name: np.empty(0, dtype=np.int64) for name in INT_COLUMNS}
+        self.columns['revenue'] = np.empty(0, dtype=np.float64)
+        self.dictionaries = {name: StringDictionary() for name in ENCODED_COLUMNS}
+        self.last_item_id = 0
+        self.last_event_id = 0
+        self.version = None
+        self._lock = threading.RLock() # Held by pivots too, so a refresh never swaps arrays mid-pivot
+
+    def _append(self, chunk):
+        needed = self.size + len(chunk['item_id'])
+        capacity = len(self.columns['item_id'])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2, 1024)
+            for name, column in self.columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        for name, values in chunk.items():
+            self.columns[name][self.size:needed] = values
+        self.size = needed
+
+    def _load_lines(self):
+        import pandas as pd
+        # Core rows on the session's connection; created_at is parsed per column by pandas, not per row
+        stmt = select(OrderItem.id, OrderItem.order_id, type_coerce(Order.created_at, db.String), Order.user_id,
+                      OrderItem.product_id, OrderItem.quantity, OrderItem.quantity * OrderItem.price,
+                      Order.status, Order.order_type, Order.payment_method)\
+            .join(Order, Order.id == OrderItem.order_id)\
+            .where(OrderItem.id > self.last_item_id)\
+            .order_by(OrderItem.id)
+        result = db.session.connection().execute(stmt.execution_options(yield_per=self.chunk_size))
+        loaded = 0
+        for rows in result.partitions():
+            item_id, order_id, created_at, user_id, product_id, quantity, revenue, status, order_type, payment_method = zip(*rows)
+            self._append({
+                'item_id': item_id,
+                'order_id': order_id,
+                'created_at': pd.to_datetime(pd.Series(created_at), format='ISO8601').values.astype('datetime64[s]').astype(np.int64),
+                'user_id': user_id,
+                'product_id': product_id,
+                'quantity': quantity,
+                'revenue': np.array(revenue, dtype=np.float64),
+                'status': self.dictionaries['status'].encode_many(status),
+                'order_type': self.dictionaries['order_type'].encode_many(order_type),
+                'payment_method': self.dictionaries['payment_method'].encode_many([p or '' for p in payment_method]),
+            })
+            self.last_item_id = item_id[-1]
+            loaded += len(rows)
+        return loaded
+
+    def _reload_statuses(self, last_event_id):
+        # Every status change writes an OrderStatusEvent; only those orders' lines are touched
+        changed = db.session.query(Order.id, Order.status)\
+            .join(OrderStatusEvent, OrderStatusEvent.order_id == Order.id)\
+            .filter(OrderStatusEvent.id > self.last_event_id, OrderStatusEvent.id <= last_event_id)\
+            .distinct().all()
+        if changed:
+            order_ids = np.array([order_id for order_id, _ in changed], dtype=np.int64)
+            codes = np.array([self.dictionaries['status'].encode(status) for _, status in changed], dtype=np.int64)
+            order_column = self.columns['order_id'][:self.size]
+            rows = np.nonzero(np.isin(order_column, order_ids))[0]
+            if len(rows):
+                by_id = np.argsort(order_ids)
+                position = np.searchsorted(order_ids[by_id], order_column[rows])
+                self.columns['status'][rows] = codes[by_id][position]
+        self.last_event_id = last_event_id
+
+    def _save(self):
+        os.makedirs(self.path, exist_ok=True)
+        for name, column in self.columns.items():
+            tmp_path = os.path.join(self.path, f"{name}.tmp.npy")
+            np.save(tmp_path, column[:self.size])
+            os.replace(tmp_path, os.path.join(self.path, f"{name}.npy"))
+        last = self.size - 1
+        meta = {
+            'size': self.size,
+            'last_item_id': int(self.last_item_id),
+            'last_event_id': int(self.last_event_id),
+            'last_line': [int(self.columns['order_id'][last]), int(self.columns['product_id'][last])],
+            'dictionaries': {name: dictionary.values for name, dictionary in self.dictionaries.items()},
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def _load_saved(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                meta = json.load(f)
+            # The saved copy belongs to this database only if its last line is still there, unchanged
+            line = db.session.get(OrderItem, meta['last_item_id'])
+            if line is None or [line.order_id, line.product_id] != meta['last_line']:
+                return
+            columns = {name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r') for name in self.columns}
+        except (OSError, ValueError, KeyError):
+            return
+        if any(len(column) != meta['size'] for column in columns.values()):
+            return
+        for name, values in meta['dictionaries'].items():
+            for value in values:
+                self.dictionaries[name].encode(value)
+        self._append(columns)
+        self.last_item_id = meta['last_item_id']
+        self.last_event_id = meta['last_event_id']
+
+    def _reset(self):
+        self.size = 0
+        self.dictionaries = {name: StringDictionary() for name in ENCODED_COLUMNS}
+        self.last_item_id = 0
+        self.last_event_id = 0
+
+    def refresh(self):
+        """Brings the store up to date with the database (incrementally after the first load)."""
+        with self._lock:
+            if self.path and not self.size:
+                self._load_saved()
+            version = sales_data_version()
+            if version == self.version:
+                return
+            if self.version and any(now < before for now, before in zip(version, self.version)):
+                self._reset() # Orders were deleted, or this is another database
+            # Counted before loading: lines committed meanwhile can only make the store larger
+            expected = db.session.query(func.count(OrderItem.id)).scalar()
+            last_event_id = version[0]
+            # Statuses first: lines appended afterwards are read with their current status anyway
+            if self.size and last_event_id > self.last_event_id:
+                self._reload_statuses(last_event_id)
+            self.last_event_id = last_event_id
+            loaded = self._load_lines()
+            if self.size < expected:
+                # A line committed under an id below last_item_id was never appended
+                self._reset()
+                self.last_event_id = last_event_id
+                loaded = self._load_lines()
+            self.version = version
+            # Only large loads are worth writing out; a few new lines are quicker to re-read
+            if loaded >= self.chunk_size and self.path:
+                self._save()
+
+    def column(self, name):
+        return self.columns[name][:self.size]
+
+    def _dimension(self, name, rows, product_categories):
+        """Returns (int key per selected row, labels(keys) -> display labels) for a dimension."""
+        if name in ('hour', 'weekday', 'date'):
+            seconds = self.column('created_at')[rows]
+            if name == 'hour':
+                return (seconds // 3600) % 24, lambda keys: keys
+            if name == 'weekday':
+                return (seconds // 86400 + 3) % 7, lambda keys: [WEEKDAYS[key] for key in keys] # 1970-01-01 was a Thursday
+            return seconds // 86400, lambda keys: [np.datetime64(key, 'D').item().isoformat() for key in keys]
+        if name in ENCODED_COLUMNS:
+            values = self.dictionaries[name].values
+            return self.column(name)[rows], lambda keys: [values[key] or None for key in keys]
+        if name in ('product', 'category', 'staff'):
+            model = {'product': Product, 'category': Category, 'staff': User}[name]
+            keys = self.column('user_id' if name == 'staff' else 'product_id')[rows]
+            if name == 'category':
+                keys = product_categories[keys]
+            # Names are only looked up for the keys in the result
+            return keys, lambda keys: _names(model, keys)
+        raise ValueError(f'Unknown dimension: {name}')
+
+    def pivot(self, rows_by, columns_by=None, measure='revenue', start_dt=None, end_dt=None, status='completed', filters=None):
+        """Aggregates `measure` over order lines grouped by one or two dimensions.
+
+        `filters` maps dimension names to a key (as returned in a previous
+        pivot's row_keys/column_keys) to drill into, e.g. {'category': 3}.
+        Dimensions: hour, weekday, date, status, order_type, payment_method,
+        product, category, staff.
+        """
+        if measure not in MEASURES:
+            raise ValueError(f'Unknown measure: {measure}')
+        for name in [rows_by, columns_by, *(filters or {})]:
+            if name and name not in DIMENSIONS:
+                raise ValueError(f'Unknown dimension: {name}')
+        with self._lock:
+            self.refresh()
+
+            # Product -> category lookup array, built per call from the (small) product table
+            categories = db.session.query(Product.id, Product.category_id).all()
+            product_categories = np.zeros(max([p for p, _ in categories] + [int(self.column('product_id').max(initial=0))]) + 1, dtype=np.int64)
+            for product_id, category_id in categories:
+                product_categories[product_id] = category_id
+
+            mask = np.ones(self.size, dtype=bool)
+            if start_dt is not None:
+                mask &= self.column('created_at') >= _epoch_seconds(start_dt)
+            if end_dt is not None:
+                mask &= self.column('created_at') <= _epoch_seconds(end_dt)
+            if status:
+                code = self.dictionaries['status'].codes.get(status)
+                mask &= self.column('status') == (code if code is not None else -1)
+            for name, key in (filters or {}).items():
+                keys, _ = self._dimension(name, slice(None), product_categories)
+                mask &= keys == key
+            rows = np.nonzero(mask)[0]
+
+            row_keys, row_label = self._dimension(rows_by, rows, product_categories)
+            if columns_by:
+                column_keys, column_label = self._dimension(columns_by, rows, product_categories)
+            else:
+                column_keys, column_label = np.zeros(len(rows), dtype=np.int64), None
+            # Grid positions are indexes into the keys that occur in the selection, however large or sparse the keys are
+            used_rows, row_index = np.unique(row_keys, return_inverse=True)
+            used_columns, column_index = np.unique(column_keys, return_inverse=True)
+            width = max(len(used_columns), 1)
+            size = len(used_rows) * width
+            if size > MAX_PIVOT_CELLS:
+                raise ValueError(f'The pivot would have {len(used_rows):,} rows x {width:,} columns; '
+                                 f'narrow the date range or drill down to stay under {MAX_PIVOT_CELLS:,} cells.')
+            cells = row_index * width + column_index
+
+            if measure == 'revenue':
+                values = np.bincount(cells, weights=self.column('revenue')[rows], minlength=size)
+            elif measure == 'quantity':
+                values = np.bincount(cells, weights=self.column('quantity')[rows], minlength=size)
+            elif measure == 'lines':
+                values = np.bincount(cells, minlength=size)
+            else:
+                # Distinct orders per cell: count each (cell, order) pair once
+                # Lines are stored in order id order, so order-major keys are nearly sorted
+                pairs = _distinct(self.column('order_id')[rows] * size + cells)
+                values = np.bincount(pairs % size, minlength=size)
+            values = values.reshape(-1, width)
+            return {
+                'rows': rows_by,
+                'columns': columns_by,
+                'measure': measure,
+                'row_keys': used_rows.tolist(),
+                'row_labels': row_label(used_rows.tolist()),
+                'column_keys': used_columns.tolist() if columns_by else [],
+                'column_labels': column_label(used_columns.tolist()) if columns_by else [],
+                'values': values.tolist(),
+                'total': float(values.sum()) if measure != 'orders' else len(_distinct(self.column('order_id')[rows])),
+                'lines_scanned': int(len(rows)),
+            }
+
+
+_store_lock = threading.Lock()
+
+
+def get_sales_store(app):
+    """Returns the app's columnar sales store, creating it on first use (loaded on the first pivot)."""
+    with _store_lock:
+        store = app.extensions.get('sales_store')
+        if store is None:
+            store = SalesStore(path=app.config.get('SALES_STORE_DIR') or os.path.join(app.instance_path, 'sales_store'))
+            app.extensions['sales_store'] = store
+        return store
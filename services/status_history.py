@@ -0,0 +1,29 @@
+from models import Order, OrderStatusEvent
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+
+def _acting_user_id(order):
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return order.user_id
+
+
+# Every order status transition (including creation) is written alongside the change itself
+@event.listens_for(Session, 'before_flush')
+def _record_status_transitions(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, Order):
+            session.add(OrderStatusEvent(order=obj, from_status=None, to_status=obj.status or 'pending',
+                                         user_id=obj.user_id, timestamp=obj.created_at or datetime.utcnow()))
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            history = inspect(obj).attrs.status.history
+            if history.has_changes() and history.added:
+                session.add(OrderStatusEvent(order=obj,
+                                             from_status=history.deleted[0] if history.deleted else None,
+                                             to_status=history.added[0],
+                                             user_id=_acting_user_id(obj)))
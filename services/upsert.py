@@ -0,0 +1,27 @@
+from sqlalchemy.dialects import sqlite, postgresql, mysql
+
+
+def increment_rows(connection, model, key_columns, rows):
+    """Adds counters into rows keyed by `key_columns`, inserting rows that do not exist yet.
+
+    `rows` is a list of dicts holding the key columns plus the amounts to add
+    to every other column. Runs as one INSERT ... ON CONFLICT DO UPDATE
+    (ON DUPLICATE KEY UPDATE on MySQL) executemany, so concurrent writers
+    never lose increments.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    counters = [c for c in rows[0] if c not in key_columns]
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in counters})
+    else:
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={c: table.c[c] + stmt.excluded[c] for c in counters}
+        )
+    connection.execute(stmt, rows)
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from models import User, Category, Product
+from services.recipe_cache import invalidate_recipes
+
+
+@pytest.fixture
+def app():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add_all([
+            User(username='manager', password=generate_password_hash('pw'), name='Manager', role='manager'),
+            User(username='cashier', password=generate_password_hash('pw'), name='Cashier', role='cashier'),
+        ])
+        db.session.commit()
+        invalidate_recipes() # The recipe matrix is per process; recompile it from this test's database
+        yield app
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+def login(client, username):
+    return client.post('/login', data={'username': username, 'password': 'pw'})
+
+
+@pytest.fixture
+def manager_client(app):
+    client = app.test_client()
+    login(client, 'manager')
+    return client
+
+
+@pytest.fixture
+def products(app):
+    """Fifty available products (no recipes, so checkouts need no ingredient stock)."""
+    category = Category(name='Test')
+    db.session.add(category)
+    db.session.flush()
+    items = [Product(name=f'Item {i}', price=100.0, category_id=category.id, available=True) for i in range(50)]
+    db.session.add_all(items)
+    db.session.commit()
+    return items
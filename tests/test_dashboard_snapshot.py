@@ -0,0 +1,61 @@
+from datetime import datetime, time as day_time
+
+import pytest
+
+from extensions import db
+from models import User
+from services import dashboard_snapshot
+from services.dashboard_snapshot import DashboardSnapshots
+from services.order_placement import place_order
+
+
+@pytest.fixture
+def place(products):
+    user_id = User.query.filter_by(username='cashier').one().id
+    cart = {'orderType': 'take-out', 'paymentMethod': 'cash', 'subtotal': 100.0, 'tax': 0.0, 'totalAmount': 100.0,
+            'items': [{'productId': products[0].id, 'quantity': 1, 'price': 100.0}]}
+
+    def place():
+        place_order(cart, user_id)
+        db.session.commit()
+    return place
+
+
+def today():
+    now = datetime.utcnow()
+    return datetime.combine(now.date(), day_time.min), datetime.combine(now.date(), day_time.max)
+
+
+def test_order_committed_while_snapshot_builds_is_counted_once(place, monkeypatch):
+    snapshots = DashboardSnapshots()
+    place()
+    build = dashboard_snapshot.RangeSnapshot
+
+    def build_then_commit(*args):
+        # Committed after the reads: missing from the build, so it must come from the replayed log
+        snapshot = build(*args)
+        place()
+        return snapshot
+    monkeypatch.setattr(dashboard_snapshot, 'RangeSnapshot', build_then_commit)
+    assert snapshots.get('today', *today())['total_orders'] == 2
+    place() # Applied to the installed snapshot directly
+    assert snapshots.get('today', *today())['total_orders'] == 3
+
+
+def test_order_committed_during_snapshot_reads_is_counted_once(place, monkeypatch):
+    snapshots = DashboardSnapshots()
+    read_last_order_id = dashboard_snapshot.last_order_id
+    calls = []
+
+    def commit_after_first_read():
+        # Committed between the build's first and last reads: the build is repeated, and the replay skips it
+        value = read_last_order_id()
+        calls.append(value)
+        if len(calls) == 1:
+            place()
+        return value
+    monkeypatch.setattr(dashboard_snapshot, 'last_order_id', commit_after_first_read)
+    data = snapshots.get('today', *today())
+    assert len(calls) == 4 # Two builds
+    assert data['total_orders'] == 1
+    assert len(data['recent_orders']) == 1
@@ -0,0 +1,18 @@
+from services.idempotency import IdempotencyIndex
+
+
+def test_successful_result_is_replayed():
+    index = IdempotencyIndex()
+    calls = []
+    work = lambda: calls.append(1) or ({'success': True, 'order_number': 'ORD-1'}, 200)
+    assert index.run('key', work) == ({'success': True, 'order_number': 'ORD-1'}, 200)
+    assert index.run('key', work) == ({'success': True, 'order_number': 'ORD-1'}, 200)
+    assert len(calls) == 1
+
+
+def test_rejected_result_is_not_kept():
+    # e.g. out of stock: once restocked, the retry with the same key must be placed
+    index = IdempotencyIndex()
+    results = [({'success': False, 'message': 'Insufficient stock'}, 400), ({'success': True, 'order_number': 'ORD-1'}, 200)]
+    assert index.run('key', lambda: results.pop(0))[1] == 400
+    assert index.run('key', lambda: results.pop(0)) == ({'success': True, 'order_number': 'ORD-1'}, 200)
@@ -0,0 +1,22 @@
+import os
+
+from flask_migrate import upgrade
+
+from app import create_app
+from extensions import db
+from services.index_advisor import advise
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_no_hot_query_scans_a_migrated_schema(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT) # The migrations directory is relative to the working directory
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pos.db'}"})
+    with app.app_context():
+        upgrade() # The schema deployments get from the migrations, not db.create_all()
+        results = advise()
+        db.session.remove()
+        db.engine.dispose()
+
+    assert results
+    assert {name: scans for name, plan, scans in results if scans} == {}
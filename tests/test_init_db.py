@@ -0,0 +1,42 @@
+import os
+
+from flask_migrate import upgrade
+from sqlalchemy import inspect, text
+
+from app import create_app
+from commands import INITIAL_REVISION
+from extensions import db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_init_db_stamps_a_database_created_before_migrations(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT) # The migrations directory is relative to the working directory
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pos.db'}"})
+    with app.app_context():
+        # The initial schema without migration history, as db.create_all() used to leave it
+        upgrade(revision=INITIAL_REVISION)
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP TABLE alembic_version'))
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+
+    assert result.exit_code == 0, result.output
+    assert f'stamped as the initial schema ({INITIAL_REVISION})' in result.output
+    with app.app_context():
+        assert 'ix_order_item_order_id' in {index['name'] for index in inspect(db.engine).get_indexes('order_item')}
+        db.engine.dispose()
+
+
+def test_init_db_refuses_a_database_missing_initial_columns(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pos.db'}"})
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80))'))
+        db.engine.dispose()
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+
+    assert result.exit_code != 0
+    assert 'user.password' in result.output
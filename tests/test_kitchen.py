@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import KitchenThroughput
+from services.kitchen import completed_per_window, window_start
+
+
+def test_completed_per_window_leaves_out_empty_windows(app):
+    start = datetime(2026, 1, 1)
+    db.session.add_all([
+        KitchenThroughput(window_start=start + timedelta(days=200, minutes=15), completed=2),
+        KitchenThroughput(window_start=start + timedelta(hours=9), completed=3),
+        KitchenThroughput(window_start=start + timedelta(hours=10), completed=0), # Emptied by a status change
+        KitchenThroughput(window_start=start - timedelta(minutes=15), completed=7), # Before the range
+    ])
+    db.session.commit()
+    assert completed_per_window(start, start + timedelta(days=365)) == [
+        {'window_start': '2026-01-01T09:00:00', 'completed': 3},
+        {'window_start': '2026-07-20T00:15:00', 'completed': 2},
+    ]
+
+
+def test_kitchen_metrics_for_a_year_only_sends_windows_with_completions(manager_client):
+    now = datetime.utcnow()
+    db.session.add(KitchenThroughput(window_start=window_start(now), completed=4))
+    db.session.commit()
+    data = manager_client.get('/api/kitchen/metrics?range=this_year').get_json()
+    assert data['completed_per_window'] == [{'window_start': window_start(now).isoformat(), 'completed': 4}]
+    assert data['current_window'] == window_start(now).isoformat()
+    assert data['window_minutes'] == 15
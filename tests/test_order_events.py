@@ -0,0 +1,49 @@
+from services.order_events import OrderEventBroker
+
+
+def first_chunks(stream, count):
+    return [next(stream) for _ in range(count)]
+
+
+def test_reconnect_replays_missed_events():
+    broker = OrderEventBroker()
+    first = broker.publish('order_created', {'id': 1})
+    broker.publish('status_changed', {'id': 1})
+    chunk, = first_chunks(broker.stream(broker.event_id(first), heartbeat=0.01), 1)
+    assert chunk.startswith(f'id: {broker.event_id(first + 1)}\nevent: status_changed')
+
+
+def test_id_from_another_process_gets_a_reset_then_new_events():
+    # A restarted worker (or another one) counts from 1 again, under a new epoch
+    old = OrderEventBroker()
+    for _ in range(50):
+        old.publish('order_created', {})
+    broker = OrderEventBroker()
+    stream = broker.stream(old.event_id(50), heartbeat=0.01)
+    assert next(stream) == f'id: {broker.event_id(0)}\nevent: reset\ndata: {{}}\n\n'
+    broker.publish('order_created', {'id': 7})
+    chunks = [next(stream) for _ in range(3)]
+    assert f'id: {broker.event_id(1)}\nevent: order_created\ndata: {{"id": 7}}\n\n' in chunks
+
+
+def test_id_ahead_of_this_broker_gets_a_reset():
+    broker = OrderEventBroker()
+    broker.publish('order_created', {})
+    stream = broker.stream(broker.event_id(40), heartbeat=0.01)
+    assert 'event: reset' in next(stream)
+    broker.publish('order_created', {})
+    assert any(chunk.startswith(f'id: {broker.event_id(2)}\n') for chunk in first_chunks(stream, 3))
+
+
+def test_malformed_id_gets_a_reset():
+    broker = OrderEventBroker()
+    assert 'event: reset' in next(broker.stream('17', heartbeat=0.01))
+
+
+def test_client_behind_the_buffer_gets_a_reset():
+    broker = OrderEventBroker(buffer_size=3)
+    for _ in range(10):
+        broker.publish('order_created', {})
+    chunks = first_chunks(broker.stream(broker.event_id(2), heartbeat=0.01), 2)
+    assert chunks[0] == 'event: reset\ndata: {}\n\n'
+    assert chunks[1].startswith(f'id: {broker.event_id(8)}\n')
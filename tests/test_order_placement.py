@@ -0,0 +1,137 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, func
+
+from extensions import db, begin_savepoint
+from models import Ingredient, ProductIngredient, Order, OrderItem, InventoryLog, User, SalesRollup
+from services import place_order, get_recipe_matrix, sync_orders
+from services.dashboard_snapshot import DashboardSnapshots
+from commands import _benchmark_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def recipes(products):
+    """Every product uses two of three shared ingredients, with plenty of stock."""
+    ingredients = [Ingredient(name=f'Ingredient {i}', quantity=1_000_000, unit='pcs') for i in range(3)]
+    db.session.add_all(ingredients)
+    db.session.flush()
+    for i, product in enumerate(products):
+        for ingredient in (ingredients[i % 3], ingredients[(i + 1) % 3]):
+            db.session.add(ProductIngredient(product_id=product.id, ingredient_id=ingredient.id, quantity_needed=1))
+    db.session.commit()
+    get_recipe_matrix() # Compiled once per recipe change, not per checkout
+    return ingredients
+
+
+def cart(products, lines):
+    # Plain data, read before counting (committed ORM objects would reload on attribute access)
+    items = [{'productId': p.id, 'quantity': 2, 'price': p.price, 'notes': ''} for p in products[:lines]]
+    subtotal = sum(item['price'] * item['quantity'] for item in items)
+    return {'orderType': 'dine-in', 'paymentMethod': 'cash', 'items': items,
+            'subtotal': subtotal, 'tax': 0, 'totalAmount': subtotal}
+
+
+def count_statements(work):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        work()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements)
+
+
+def test_checkout_statement_count_does_not_grow_with_cart(app, products, recipes):
+    user_id = User.query.filter_by(username='cashier').one().id
+
+    carts = {lines: cart(products, lines) for lines in (1, 10, 50)}
+
+    def checkout(lines):
+        place_order(carts[lines], user_id)
+        db.session.commit()
+
+    checkout(1) # Warm up anything loaded once per process
+    counts = {lines: count_statements(lambda: checkout(lines)) for lines in (1, 10, 50)}
+
+    assert counts[1] == counts[10] == counts[50], counts
+    assert Order.query.count() == 4
+    assert OrderItem.query.count() == 1 + 1 + 10 + 50
+    assert InventoryLog.query.count() == 2 * (1 + 1 + 10 + 50)
+
+
+def test_sync_reports_a_database_error_for_that_order_only(recipes, products):
+    user_id = User.query.filter_by(username='cashier').one().id
+    snapshots = DashboardSnapshots()
+    snapshots.get('all', datetime(2000, 1, 1), datetime(2100, 1, 1))
+    broken = dict(cart(products, 2), subtotal=None, idempotencyKey='b') # NOT NULL violation when flushed
+    orders = [dict(cart(products, 1), idempotencyKey='a'), broken, dict(cart(products, 3), idempotencyKey='c')]
+
+    results = sync_orders(orders, user_id)
+
+    assert [r['status'] for r in results] == ['accepted', 'error', 'accepted']
+    assert Order.query.count() == 2
+    assert OrderItem.query.count() == 4
+    assert db.session.get(Ingredient, recipes[0].id).quantity < 1_000_000
+    # The listeners kept the first order's changes through the second order's rollback, and dropped the second's
+    assert db.session.query(func.sum(SalesRollup.order_count)).scalar() == 2
+    assert snapshots.get('all', datetime(2000, 1, 1), datetime(2100, 1, 1))['total_orders'] == 2
+
+
+def test_savepoint_changes_are_applied_with_the_real_commit(recipes, products):
+    user_id = User.query.filter_by(username='cashier').one().id
+    snapshots = DashboardSnapshots()
+    everything = ('all', datetime(2000, 1, 1), datetime(2100, 1, 1))
+    snapshots.get(*everything)
+
+    with begin_savepoint(db.session):
+        place_order(cart(products, 1), user_id)
+    assert snapshots.get(*everything)['total_orders'] == 0 # Released, but not committed yet
+    db.session.rollback()
+    assert snapshots.get(*everything)['total_orders'] == 0
+    assert Order.query.count() == 0
+
+    with begin_savepoint(db.session):
+        place_order(cart(products, 1), user_id)
+    db.session.commit()
+    assert snapshots.get(*everything)['total_orders'] == 1
+    assert db.session.query(func.sum(SalesRollup.order_count)).scalar() == 1
+
+
+# Run by a separate Python process: sets product 1's recipe to 5 units of ingredient 1
+EDIT_RECIPE = """
+import sys
+from app import create_app
+from extensions import db
+from models import ProductIngredient
+with create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{sys.argv[1]}'}).app_context():
+    ProductIngredient.query.filter_by(product_id=1, ingredient_id=1).one().quantity_needed = 5
+    db.session.commit()
+"""
+
+
+def test_recipe_edit_from_another_process_changes_the_next_deduction(tmp_path):
+    path = tmp_path / 'pos.db'
+    bench_app = _benchmark_app(path) # Product 1 uses 1 unit of ingredient 1 ('Stock')
+    with bench_app.app_context():
+        db.session.get(Ingredient, 1).quantity = 100
+        db.session.commit()
+        order = {'orderType': 'dine-in', 'paymentMethod': 'cash', 'subtotal': 100, 'tax': 0, 'totalAmount': 100,
+                 'items': [{'productId': 1, 'quantity': 1, 'price': 100, 'notes': ''}]}
+        place_order(order, 1)
+        db.session.commit()
+        assert db.session.get(Ingredient, 1).quantity == 99
+
+        subprocess.run([sys.executable, '-c', EDIT_RECIPE, str(path)], cwd=ROOT, check=True)
+
+        place_order(order, 1)
+        db.session.commit()
+        assert db.session.get(Ingredient, 1).quantity == 94
+        db.session.remove()
+        db.engine.dispose()
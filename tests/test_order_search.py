@@ -0,0 +1,87 @@
+import os
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app
+from extensions import db
+from models import User, Customer, Order
+from services.order_search import search_orders, has_search_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_order(number, customer=None):
+    user = User.query.first()
+    order = Order(order_number=number, order_type='dine-in', user_id=user.id, subtotal=100, tax=0, total_amount=100,
+                  customer_id=customer.id if customer else None)
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def numbers(query):
+    return [result['order_number'] for result in search_orders(query)]
+
+
+@pytest.fixture
+def migrated(tmp_path, monkeypatch):
+    """An app on a SQLite file built by the migrations, so it has the order_search table and its triggers."""
+    monkeypatch.chdir(ROOT) # The migrations directory is relative to the working directory
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pos.db'}", 'TESTING': True})
+    with app.app_context():
+        upgrade()
+        db.session.add(User(username='cashier', password='-', name='Cashier', role='cashier'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_search_finds_orders_by_number_and_customer_name(migrated):
+    tanaka = Customer(name='Hiroshi Tanaka', phone='09171234567')
+    db.session.add(tanaka)
+    db.session.commit()
+    add_order('ORD-20261018-0042', tanaka)
+    add_order('ORD-20261018-0043')
+
+    assert has_search_index()
+    assert numbers('0042') == ['ORD-20261018-0042']
+    assert numbers('tanaka') == ['ORD-20261018-0042']
+    assert numbers('1234') == ['ORD-20261018-0042']
+    assert sorted(numbers('20261018')) == ['ORD-20261018-0042', 'ORD-20261018-0043']
+
+
+def test_triggers_keep_the_index_current(migrated):
+    customer = Customer(name='Hiroshi Tanaka')
+    db.session.add(customer)
+    db.session.commit()
+    order = add_order('ORD-20261018-0042', customer)
+
+    customer.name = 'Hiroshi Sato'
+    db.session.commit()
+    assert numbers('tanaka') == []
+    assert numbers('sato') == ['ORD-20261018-0042']
+
+    order.order_number = 'ORD-20261018-0099'
+    db.session.commit()
+    assert numbers('0042') == []
+    assert numbers('0099') == ['ORD-20261018-0099']
+
+    db.session.delete(order)
+    db.session.commit()
+    assert numbers('sato') == []
+
+
+def test_search_falls_back_to_like_without_the_fts_table(app, manager_client):
+    # The app fixture builds its schema with db.create_all(), which has no order_search table
+    customer = Customer(name='Hiroshi Tanaka')
+    db.session.add(customer)
+    db.session.commit()
+    add_order('ORD-20261018-0042', customer)
+
+    response = manager_client.get('/api/orders/search?q=tanaka')
+
+    assert response.status_code == 200
+    assert [r['order_number'] for r in response.get_json()['results']] == ['ORD-20261018-0042']
+    assert not has_search_index()
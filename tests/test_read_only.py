@@ -0,0 +1,12 @@
+from extensions import db
+
+
+def test_in_memory_app_has_no_read_only_bind(app):
+    # A second connection to sqlite:// would open a new, empty database
+    assert 'read_only' not in db.engines
+
+
+def test_read_only_view_uses_primary_when_in_memory(manager_client):
+    response = manager_client.get('/orders/')
+    assert response.status_code == 200
+    assert b'Orders' in response.data
@@ -0,0 +1,34 @@
+from services.report_export import stream_and_remove
+
+
+def test_export_rejects_unknown_format_before_reading_filters(manager_client):
+    # A bad range would be reported first if the filters were parsed (and the report built) before the format check
+    response = manager_client.post('/api/reports/export/docx', data={'date_range': 'custom', 'date_start': 'x'})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid export format'
+
+
+def test_excel_export_streams_a_workbook(manager_client):
+    response = manager_client.post('/api/reports/export/excel', data={'date_range': 'today'})
+    assert response.status_code == 200
+    assert response.data[:2] == b'PK' # xlsx is a zip
+    assert int(response.headers['Content-Length']) == len(response.data)
+    response.close()
+
+
+def test_stream_and_remove_deletes_file_once_sent(app, tmp_path):
+    path = tmp_path / 'export.bin'
+    path.write_bytes(b'x' * 100000)
+    response = stream_and_remove(str(path), 'application/octet-stream', block_size=4096)
+    assert b''.join(response.response) == b'x' * 100000
+    assert path.exists()
+    response.close()
+    assert not path.exists()
+
+
+def test_stream_and_remove_deletes_file_when_never_sent(app, tmp_path):
+    # e.g. the client disconnected before the body was read
+    path = tmp_path / 'export.bin'
+    path.write_bytes(b'x')
+    stream_and_remove(str(path), 'application/octet-stream').close()
+    assert not path.exists()
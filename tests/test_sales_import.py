@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+from extensions import db
+from models import Order, KitchenThroughput, TicketTimeBucket
+from services.kitchen import rebuild_metrics
+from services.sales_import import SalesImporter
+
+HEADER = 'order_number,created_at,order_type,status,payment_method,staff,customer_phone,product,quantity,price,notes,tax,completed_at\n'
+
+
+def sales_file(tmp_path, orders):
+    path = tmp_path / 'sales.csv'
+    path.write_text(HEADER + ''.join(
+        f'LEG-{i},2025-01-0{i}T12:00:00,dine-in,completed,cash,manager,,Item 0,1,100.0,,0,\n' for i in range(1, orders + 1)))
+    return str(path)
+
+
+def test_resume_continues_after_the_checkpoint(products, tmp_path):
+    path = sales_file(tmp_path, 3)
+    SalesImporter(chunk_size=2, checkpoint_path=path + '.checkpoint', echo=lambda message: None).run(path)
+    stats = SalesImporter(checkpoint_path=path + '.checkpoint', echo=lambda message: None).run(path, resume=True)
+    assert stats['lines'] == 0
+    assert Order.query.count() == 3
+
+
+def test_resume_refuses_a_checkpoint_of_another_file(products, tmp_path):
+    path = sales_file(tmp_path, 3)
+    SalesImporter(checkpoint_path=path + '.checkpoint', echo=lambda message: None).run(path)
+    sales_file(tmp_path, 5) # Same name, different contents: line numbers no longer match
+    with pytest.raises(ValueError, match='refusing to resume'):
+        SalesImporter(checkpoint_path=path + '.checkpoint', echo=lambda message: None).run(path, resume=True)
+    assert Order.query.count() == 3
+
+
+def test_import_updates_the_kitchen_metrics(app, products, tmp_path):
+    path = tmp_path / 'sales.csv'
+    path.write_text(HEADER
+        + 'LEG-1,2025-01-01T12:00:00,dine-in,completed,cash,manager,,Item 0,1,100.0,,0,2025-01-01T12:10:00\n'
+        + 'LEG-2,2025-01-01T12:05:00,dine-in,completed,cash,manager,,Item 0,1,100.0,,0,2025-01-01T12:20:00\n'
+        + 'LEG-3,2025-01-01T12:06:00,dine-in,cancelled,cash,manager,,Item 0,1,100.0,,0,\n')
+
+    result = app.test_cli_runner().invoke(args=['import-sales', str(path), '--chunk-size', '1'])
+
+    assert result.exit_code == 0, result.output
+    assert 'rebuild-kitchen-metrics' not in result.output
+    throughput = {row.window_start: row.completed for row in KitchenThroughput.query}
+    assert throughput == {datetime(2025, 1, 1, 12, 0): 1, datetime(2025, 1, 1, 12, 15): 1}
+    assert db.session.query(func.sum(TicketTimeBucket.count)).scalar() == 2
+    # The same tables a full rebuild produces
+    buckets = {(row.day, row.bucket): row.count for row in TicketTimeBucket.query}
+    rebuild_metrics()
+    assert {(row.day, row.bucket): row.count for row in TicketTimeBucket.query} == buckets
+    assert {row.window_start: row.completed for row in KitchenThroughput.query} == throughput
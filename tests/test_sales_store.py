@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from extensions import db
+from models import Order, OrderItem, User
+from services import sales_store
+from services.sales_store import SalesStore
+
+
+def add_order(number, created_at, product, item_id=None, price=100.0):
+    user = User.query.filter_by(username='cashier').one()
+    order = Order(order_number=number, order_type='dine-in', status='completed', user_id=user.id, created_at=created_at,
+                  completed_at=created_at, subtotal=price, tax=0, total_amount=price, payment_method='cash')
+    order.items.append(OrderItem(id=item_id, product_id=product.id, quantity=1, price=price))
+    db.session.add(order)
+    db.session.commit()
+
+
+def test_date_pivot_grid_only_spans_the_days_present(products):
+    add_order('A', datetime(2001, 1, 1, 12), products[0])
+    add_order('B', datetime(2026, 10, 1, 12), products[1])
+
+    result = SalesStore().pivot('date', 'product')
+
+    assert result['row_labels'] == ['2001-01-01', '2026-10-01']
+    assert result['column_labels'] == ['Item 0', 'Item 1']
+    assert result['values'] == [[100.0, 0.0], [0.0, 100.0]]
+
+
+def test_pivot_above_the_cell_cap_is_rejected(app, manager_client, products, tmp_path, monkeypatch):
+    app.config['SALES_STORE_DIR'] = str(tmp_path)
+    monkeypatch.setattr(sales_store, 'MAX_PIVOT_CELLS', 3)
+    for day in (1, 2):
+        for product in products[:2]:
+            add_order(f'{day}-{product.id}', datetime(2026, 10, day, 12), product)
+
+    response = manager_client.get('/api/reports/pivot?rows=date&columns=product&status=&date_range=custom'
+                                  '&date_start=2026-10-01&date_end=2026-10-02')
+
+    assert response.status_code == 400
+    assert '2 rows x 2 columns' in response.get_json()['message']
+
+
+def test_refresh_rebuilds_when_a_line_was_committed_under_a_lower_id(products):
+    store = SalesStore()
+    add_order('A', datetime(2026, 10, 1, 12), products[0], item_id=10)
+    add_order('B', datetime(2026, 10, 1, 12), products[0], item_id=20)
+    assert store.pivot('product')['total'] == 200.0
+
+    # Committed after the store read item 20, e.g. a slower concurrent checkout on PostgreSQL
+    add_order('C', datetime(2026, 10, 1, 12), products[0], item_id=15)
+
+    assert store.pivot('product')['total'] == 300.0
+    assert store.size == 3